@@ -0,0 +1,8 @@
+"""
+Benchmarks de rendimiento de la capa core.
+
+Se ejecutan desde la raíz del proyecto, por ejemplo:
+    python -m benchmarks.bench_connections
+
+Cada script trabaja sobre una base temporal: nunca toca ~/CerveceriaPOS.
+"""
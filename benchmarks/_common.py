@@ -0,0 +1,112 @@
+# benchmarks/_common.py
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from core import db_manager
+from core.rollup_service import rebuild_rollups
+
+
+@contextmanager
+def temp_database():
+    """Apunta db_manager a una base temporal recién creada y la borra al final."""
+    original = db_manager.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager.DB_PATH = os.path.join(tmp, "bench.db")
+        try:
+            db_manager.bootstrap()
+            yield db_manager.DB_PATH
+        finally:
+            db_manager.close_all()
+            db_manager.DB_PATH = original
+
+
+def ops_per_sec(fn: Callable[[], None], repeat: int) -> float:
+    """Ejecuta fn 'repeat' veces y devuelve operaciones por segundo."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - start
+    return repeat / elapsed if elapsed > 0 else float("inf")
+
+
+def report(title: str, before: float, after: float, unit: str = "ops/s") -> None:
+    """Imprime una fila antes/después con el factor de mejora (en 'ms'/'µs', menos es mejor)."""
+    if unit in ("ms", "µs"):
+        factor = before / after if after else float("inf")
+    else:
+        factor = after / before if before else float("inf")
+    print(f"{title:<40} antes: {before:>10.1f} {unit}   después: {after:>10.1f} {unit}   x{factor:.1f}")
+
+
+def seed_products(con, count: int = 200, seed: int = 1234) -> None:
+    """Inserta 'count' productos sintéticos con nombre, precios y código de barras únicos."""
+    import random
+
+    rnd = random.Random(seed)
+    styles = ("IPA", "APA", "Stout", "Porter", "Pilsner", "Amber Ale", "Lager", "Sour")
+    formats = ("Lata 473ml", "Botella 330ml", "Schop 500ml", "Growler 1L")
+    rows = []
+    for i in range(count):
+        sale = rnd.randrange(1500, 9000, 100)
+        name = f"{rnd.choice(styles)} {rnd.choice(formats)} #{i:05d}"
+        rows.append((name, sale, int(sale * rnd.uniform(0.35, 0.7)), f"78{i:011d}"))
+    con.executemany("""
+        INSERT INTO products (name, sale_price, purchase_price, barcode)
+        VALUES (?, ?, ?, ?)
+    """, rows)
+    con.commit()
+
+
+def seed_sales_history(
+    con,
+    start: str = "2022-01-01",
+    days: int = 3 * 365,
+    sales_per_day: int = 40,
+    lines_per_sale: int = 3,
+    seed: int = 1234,
+) -> int:
+    """
+    Inserta ventas sintéticas (con sus sale_items) directamente por SQL.
+    Usa los productos existentes y deja ~10% de líneas con gain_per_unit
+    (como los productos comunes). Al final recalcula los rollups.
+    Devuelve la cantidad de líneas creadas.
+    """
+    import random
+    from datetime import date, timedelta
+
+    rnd = random.Random(seed)
+    products = con.execute("SELECT id, sale_price FROM products WHERE sale_price > 0").fetchall()
+    first_day = date.fromisoformat(start)
+    sale_id = (con.execute("SELECT IFNULL(MAX(id), 0) FROM sales").fetchone()[0] or 0)
+
+    sales_rows, item_rows = [], []
+    for d in range(days):
+        day = (first_day + timedelta(days=d)).isoformat()
+        for _ in range(sales_per_day):
+            sale_id += 1
+            hour = rnd.randint(12, 23)
+            created_at = f"{day} {hour:02d}:{rnd.randint(0, 59):02d}:{rnd.randint(0, 59):02d}"
+            total = 0
+            for _ in range(lines_per_sale):
+                pid, price = rnd.choice(products)
+                qty = rnd.randint(1, 4)
+                gain = rnd.randint(100, 900) if rnd.random() < 0.1 else 0
+                total += qty * price
+                item_rows.append((sale_id, pid, qty, price, qty * price, gain))
+            pay = rnd.choice(("efectivo", "debito", "credito", "transferencia"))
+            sales_rows.append((sale_id, total, total, pay, created_at, day, hour))
+
+    con.executemany("""
+        INSERT INTO sales (id, subtotal, total, pay_method, status, created_at, sale_date, sale_hour)
+        VALUES (?, ?, ?, ?, 'pagada', ?, ?, ?)
+    """, sales_rows)
+    con.executemany("""
+        INSERT INTO sale_items (sale_id, product_id, qty, unit_price, line_total, gain_per_unit)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, item_rows)
+    con.commit()
+    rebuild_rollups(con)
+    return len(item_rows)
@@ -0,0 +1,71 @@
+# benchmarks/bench_catalog.py
+"""
+Búsqueda de productos con 20.000 SKUs:
+- list_products(q)[:30] (LIKE '%q%' sin índice, ordena todo y corta en Python)
+  contra search_products(q, limit=30) (FTS5 por prefijo, LIMIT en la consulta).
+- get_product por SQL contra get_product desde el catálogo en memoria, con
+  el catálogo ya cargado (la carga en frío se informa aparte).
+- Un producto insertado por fuera (otra terminal) se encuentra igual.
+Las semánticas difieren (contiene vs. prefijo de palabra), así que solo se
+comprueba que cada consulta encuentre algo.
+"""
+import time
+
+from core import db_manager, product_catalog
+from core import product_service as ps
+from benchmarks._common import temp_database, seed_products, ops_per_sec, report
+
+QUERIES = ["i", "ip", "ipa", "ipa l", "lata", "78000000012", "stout 001"]
+
+
+def _legacy_get_product(product_id: int):
+    with db_manager.get_conn() as con:
+        r = con.execute("""
+            SELECT id, name, sale_price, purchase_price, barcode
+            FROM products WHERE id=?
+        """, (product_id,)).fetchone()
+        return dict(zip(("id", "name", "sale_price", "purchase_price", "barcode"), r)) if r else None
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con, count=20000)
+
+        for q in QUERIES:
+            if not ps.search_products(q, limit=30):
+                raise SystemExit(f"Sin resultados para {q!r}")
+
+        def typing(search):
+            def run():
+                for q in QUERIES:
+                    search(q)
+            return run
+
+        before = ops_per_sec(typing(lambda q: ps.list_products(q)[:30]), 10)
+        after = ops_per_sec(typing(lambda q: ps.search_products(q, limit=30)), 10)
+        report(f"Búsqueda de {len(QUERIES)} teclas", before, after)
+
+        ids = [p["id"] for p in ps.search_products("", limit=500)]
+        product_catalog.invalidate()
+        start = time.perf_counter()
+        ps.get_product(ids[0])
+        print(f"  -> carga del catálogo en frío: {(time.perf_counter() - start) * 1000:.1f} ms")
+        before = ops_per_sec(lambda: [_legacy_get_product(i) for i in ids], 10)
+        after = ops_per_sec(lambda: [ps.get_product(i) for i in ids], 10)
+        report(f"get_product x{len(ids)} (catálogo cargado)", before, after)
+
+        # Alta desde otro proceso: no pasa por invalidate()
+        with db_manager.get_conn() as con:
+            cur = con.execute("""
+                INSERT INTO products (name, sale_price, purchase_price, barcode)
+                VALUES ('Alta externa', 1000, 500, '7899999999999')
+            """)
+            con.commit()
+        if (ps.get_product(cur.lastrowid) or {}).get("name") != "Alta externa":
+            raise SystemExit("get_product no encontró el producto creado por fuera")
+        print("  -> producto creado por fuera encontrado en la BD y agregado al catálogo")
+
+
+if __name__ == "__main__":
+    main()
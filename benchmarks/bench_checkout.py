@@ -0,0 +1,122 @@
+# benchmarks/bench_checkout.py
+"""
+Cobro de tickets (tickets/s) con 5, 50 y 500 líneas:
+- Antes: lectura de ítems + segundo SUM + un INSERT por línea en Python.
+- Después: cobrar_ticket con INSERT ... SELECT y un solo agregado, en una
+  transacción IMMEDIATE.
+Verifica que ambas versiones dejen las mismas ventas y líneas.
+"""
+import time
+
+from core import db_manager
+from core import product_service as ps
+from core import sales_service as ss
+from core.rollup_service import apply_sale
+from core.time_utils import now_local_str
+from benchmarks._common import temp_database, seed_products, report
+
+
+def legacy_cobrar_ticket(ticket_id: int) -> int:
+    """Réplica de cobrar_ticket original (detalle fila por fila)."""
+    with db_manager.get_conn() as con:
+        cur = con.cursor()
+        cur.execute("""
+            SELECT id, COALESCE(pay_method,''), COALESCE(pending_total,0)
+            FROM open_tickets WHERE id=?
+        """, (ticket_id,))
+        _, pay_method, _ = cur.fetchone()
+        cur.execute("""
+            SELECT i.product_id, i.qty, i.unit_price, i.gain_per_unit
+            FROM open_ticket_items i
+            WHERE i.ticket_id=?
+        """, (ticket_id,))
+        items = cur.fetchall()
+        cur.execute("""
+            SELECT IFNULL(SUM(qty * unit_price), 0)
+            FROM open_ticket_items
+            WHERE ticket_id=?
+        """, (ticket_id,))
+        subtotal = cur.fetchone()[0] or 0
+        created_at = now_local_str()
+        cur.execute("""
+            INSERT INTO sales (subtotal, total, pay_method, status, created_at, sale_date, sale_hour)
+            VALUES (?, ?, ?, 'pagada', ?, ?, ?)
+        """, (subtotal, subtotal, (pay_method or "efectivo"), created_at,
+              created_at[:10], int(created_at[11:13])))
+        sale_id = cur.lastrowid
+        for (product_id, qty, unit_price, gain_per_unit) in items:
+            cur.execute("""
+                INSERT INTO sale_items (sale_id, product_id, qty, unit_price, line_total, gain_per_unit)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (sale_id, product_id, int(qty), int(unit_price),
+                  int(qty) * int(unit_price), int(gain_per_unit or 0)))
+        apply_sale(con, sale_id)
+        cur.execute("DELETE FROM open_tickets WHERE id=?", (ticket_id,))
+        con.commit()
+        return sale_id
+
+
+def _make_tickets(count: int, lines: int, products) -> list:
+    """Crea 'count' tickets de 'lines' líneas directamente por SQL (fuera de la medición)."""
+    ids = []
+    with db_manager.get_conn() as con:
+        for n in range(count):
+            now = now_local_str()
+            tid = con.execute("""
+                INSERT INTO open_tickets (name, created_at, updated_at, pay_method, pending_total)
+                VALUES (?, ?, ?, 'efectivo', 0)
+            """, (f"Bench {n}", now, now)).lastrowid
+            rows = [
+                (tid, p["id"], 1 + (i % 3), p["sale_price"], (p["sale_price"] // 10) if i % 4 == 0 else 0)
+                for i, p in enumerate(products[:lines])
+            ]
+            con.executemany("""
+                INSERT INTO open_ticket_items (ticket_id, product_id, qty, unit_price, gain_per_unit)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            con.execute("""
+                UPDATE open_tickets
+                   SET pending_total = (SELECT SUM(qty * unit_price) FROM open_ticket_items WHERE ticket_id=?)
+                 WHERE id=?
+            """, (tid, tid))
+            ids.append(tid)
+        con.commit()
+    return ids
+
+
+def _sale_lines(sale_id: int):
+    with db_manager.get_conn() as con:
+        return con.execute("""
+            SELECT product_id, qty, unit_price, line_total, gain_per_unit
+            FROM sale_items WHERE sale_id=? ORDER BY id
+        """, (sale_id,)).fetchall()
+
+
+def _tickets_per_sec(fn, ticket_ids) -> float:
+    start = time.perf_counter()
+    for tid in ticket_ids:
+        fn(tid)
+    return len(ticket_ids) / (time.perf_counter() - start)
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con, count=600)
+        products = ps.search_products("", limit=600)
+
+        # Mismo resultado con ambas versiones
+        a, b = _make_tickets(2, 50, products)
+        old_id = legacy_cobrar_ticket(a)
+        new = ss.cobrar_ticket(b)
+        if _sale_lines(old_id) != _sale_lines(new["sale_id"]):
+            raise SystemExit("Las líneas de venta no coinciden")
+
+        for lines, count in ((5, 400), (50, 200), (500, 40)):
+            before = _tickets_per_sec(legacy_cobrar_ticket, _make_tickets(count, lines, products))
+            after = _tickets_per_sec(ss.cobrar_ticket, _make_tickets(count, lines, products))
+            report(f"Cobro de tickets de {lines} líneas", before, after, unit="tickets/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_connections.py
+"""
+Compara abrir una conexión por llamada (get_conn antiguo) contra las
+conexiones persistentes de ConnectionManager, usando el flujo de una
+pulsación de "+" en el POS:
+    update_item_qty, get_ticket, list_items, calc_ticket_totals, list_open_tickets
+"""
+import sqlite3
+from contextlib import contextmanager
+from unittest import mock
+
+from core import db_manager
+from core import product_service as ps
+from core import ticket_service as ts
+from benchmarks._common import temp_database, seed_products, ops_per_sec, report
+
+REPEAT = 300
+
+
+@contextmanager
+def _legacy_get_conn():
+    """Réplica del get_conn original: conexión nueva + PRAGMA en cada llamada."""
+    con = sqlite3.connect(db_manager.DB_PATH)
+    con.execute("PRAGMA journal_mode=WAL;")
+    con.execute("PRAGMA synchronous=NORMAL;")
+    con.execute("PRAGMA foreign_keys=ON;")
+    try:
+        with con:
+            yield con
+    finally:
+        con.close()
+
+
+def _plus_keypress(ticket_id: int, line_id: int, state: dict):
+    state["qty"] += 1
+    ts.update_item_qty(line_id, state["qty"])
+    ts.get_ticket(ticket_id)
+    ts.list_items(ticket_id)
+    ts.calc_ticket_totals(ticket_id)
+    ts.list_open_tickets()
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con, count=6)
+        products = ps.list_products("#")
+        ticket_id = ts.create_ticket("Bench")
+        for p in products:
+            ts.add_item(ticket_id, p["id"], qty=1, unit_price=p["sale_price"])
+        line_id = ts.list_items(ticket_id)[0]["id"]
+        state = {"qty": 1}
+
+        with mock.patch.object(ts, "get_conn", _legacy_get_conn):
+            before = ops_per_sec(lambda: _plus_keypress(ticket_id, line_id, state), REPEAT)
+
+        after = ops_per_sec(lambda: _plus_keypress(ticket_id, line_id, state), REPEAT)
+
+        report("Pulsación '+' (5 llamadas a servicios)", before, after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_export.py
+"""
+Exportación de un año de líneas de venta a CSV:
+- Antes: fetchall() de todo el rango y después escribir el archivo.
+- Después: export_service.export_sale_lines (fetchmany + escritura en streaming).
+Se mide el tiempo y el pico de memoria de Python (tracemalloc), y se
+verifica que ambos archivos sean idénticos. También comprueba que
+export_products_csv siga escribiendo lo mismo que antes.
+"""
+import csv
+import filecmp
+import os
+import time
+import tracemalloc
+
+from core import db_manager
+from core import export_service as es
+from core import product_backup_service as pbs
+from benchmarks._common import temp_database, seed_products, seed_sales_history, report
+
+YEAR = ("2024-01-01", "2024-12-31")
+
+
+def legacy_export_sale_lines(path: str, d1: str, d2: str) -> None:
+    with db_manager.get_conn() as con:
+        rows = con.execute("""
+            SELECT s.id, s.created_at, COALESCE(s.pay_method, ''),
+                   COALESCE(p.name, ''), si.qty, si.unit_price, si.line_total
+            FROM sales s
+            JOIN sale_items si ON si.sale_id = s.id
+            LEFT JOIN products p ON p.id = si.product_id
+            WHERE s.sale_date BETWEEN ? AND ?
+            ORDER BY s.sale_date, s.id, si.id
+        """, (d1, d2)).fetchall()
+    with open(path, "w", newline="", encoding="latin-1") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["Venta", "Fecha", "Medio de pago", "Producto", "Cantidad", "PrecioUnit", "Total"])
+        w.writerows(rows)
+
+
+def legacy_export_products(path: str) -> None:
+    with db_manager.get_conn() as con:
+        rows = con.execute("""
+            SELECT name, COALESCE(sale_price, 0), COALESCE(purchase_price, 0), COALESCE(barcode, '')
+            FROM products
+            ORDER BY name COLLATE NOCASE
+        """).fetchall()
+    with open(path, "w", newline="", encoding="latin-1") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["Nombre", "PrecioVenta", "PrecioCompra", "CodigoBarra"])
+        for name, sale, purchase, barcode in rows:
+            w.writerow([name or "", int(sale or 0), int(purchase or 0), barcode or ""])
+
+
+def _measure(fn, *args):
+    """Tiempo (ms, sin tracemalloc) y pico de memoria (MB, en una segunda corrida)."""
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = (time.perf_counter() - start) * 1000
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    with temp_database() as db_path:
+        tmp = os.path.dirname(db_path)
+        with db_manager.get_conn() as con:
+            seed_products(con)
+            lines = seed_sales_history(con, sales_per_day=150)
+        print(f"Historial sintético: {lines} líneas de venta\n")
+
+        old_path, new_path = os.path.join(tmp, "antes.csv"), os.path.join(tmp, "despues.csv")
+        before_ms, before_mb = _measure(legacy_export_sale_lines, old_path, *YEAR)
+        after_ms, after_mb = _measure(es.export_sale_lines, new_path, *YEAR)
+        if not filecmp.cmp(old_path, new_path, shallow=False):
+            raise SystemExit("Los archivos de líneas de venta difieren")
+        with open(new_path, encoding="latin-1") as f:
+            exported = sum(1 for _ in f) - 1
+        report(f"Líneas de venta 2024 ({exported} filas)", before_ms, after_ms, unit="ms")
+        print(f"  -> pico de memoria: {before_mb:.1f} MB antes, {after_mb:.1f} MB después")
+
+        legacy_export_products(old_path)
+        pbs.export_products_csv(new_path)
+        if not filecmp.cmp(old_path, new_path, shallow=False):
+            raise SystemExit("export_products_csv cambió el archivo")
+        for name in es.REPORT_EXPORTS:
+            es.export_report(new_path, name, *YEAR)
+        print("  -> archivos idénticos; productos y reportes exportados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# benchmarks/bench_import.py
+"""
+import_products_csv sobre una lista de precios de 20.000 filas contra una
+BD con 5.000 productos:
+- Antes: list(reader) y hasta dos SELECT (por código y por nombre, este
+  último sin índice) más un UPDATE/INSERT por fila.
+- Después: lectura en streaming, índices en memoria y executemany por lotes.
+La lista mezcla actualizaciones por código y por nombre, cambios de código,
+filas repetidas, filas vacías, filas con precios inválidos y productos nuevos.
+Verifica que ambas versiones dejen la tabla products idéntica (ids incluidos)
+y devuelvan los mismos contadores, y que la vista previa
+(preview_import_products_csv) anticipe exactamente lo que cambió.
+"""
+import csv
+import os
+import random
+import tempfile
+import time
+
+from core import db_manager
+from core import product_backup_service as pbs
+from core.db_manager import get_conn
+from benchmarks._common import temp_database, seed_products, report
+
+EXISTING = 5000
+ROWS = 20000
+
+
+def legacy_import_products_csv(path: str):
+    """import_products_csv tal como estaba (fila a fila, con SELECT por fila)."""
+    created = updated = skipped = 0
+    with open(path, "r", newline="", encoding="latin-1") as f:
+        rows = list(csv.reader(f, delimiter=";"))
+    if not rows:
+        return {"created": 0, "updated": 0, "skipped": 0}
+    start_index = 0
+    header = [c.strip().lower() for c in rows[0]]
+    if header and "nombre" in header[0]:
+        start_index = 1
+
+    with get_conn() as con:
+        cur = con.cursor()
+        for row in rows[start_index:]:
+            if not row or all(not c.strip() for c in row):
+                continue
+            name = (row[0] or "").strip()
+            if not name:
+                skipped += 1
+                continue
+            sale_price = purchase_price = 0
+            barcode = None
+            try:
+                if len(row) > 1:
+                    sale_price = int((row[1] or "0").strip() or 0)
+                if len(row) > 2:
+                    purchase_price = int((row[2] or "0").strip() or 0)
+                if len(row) > 3:
+                    barcode = (row[3] or "").strip() or None
+            except Exception:
+                skipped += 1
+                continue
+
+            product_id = None
+            if barcode:
+                r = cur.execute("SELECT id FROM products WHERE barcode=?", (barcode,)).fetchone()
+                if r:
+                    product_id = r[0]
+            if not product_id:
+                r = cur.execute("SELECT id FROM products WHERE name=?", (name,)).fetchone()
+                if r:
+                    product_id = r[0]
+            if product_id:
+                cur.execute("""
+                    UPDATE products
+                    SET name = ?, sale_price = ?, purchase_price = ?, barcode = ?
+                    WHERE id = ?
+                """, (name, sale_price, purchase_price, barcode, product_id))
+                updated += 1
+            else:
+                cur.execute("""
+                    INSERT INTO products (name, sale_price, purchase_price, barcode)
+                    VALUES (?, ?, ?, ?)
+                """, (name, sale_price, purchase_price, barcode))
+                created += 1
+        con.commit()
+    return {"created": created, "updated": updated, "skipped": skipped}
+
+
+def _write_price_list(path: str) -> None:
+    with get_conn() as con:
+        existing = con.execute("SELECT name, barcode FROM products ORDER BY id").fetchall()
+    rnd = random.Random(99)
+    with open(path, "w", newline="", encoding="latin-1") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["Nombre", "PrecioVenta", "PrecioCompra", "CodigoBarra"])
+        for i in range(ROWS):
+            kind = rnd.random()
+            name, barcode = rnd.choice(existing)
+            price = rnd.randrange(1500, 9000, 100)
+            if kind < 0.25:     # actualiza por código
+                w.writerow([name, price, price // 2, barcode])
+            elif kind < 0.35:   # actualiza por nombre, sin código (lo borra)
+                w.writerow([name, price, price // 2, ""])
+            elif kind < 0.40:   # por nombre y con código nuevo (cambia el código)
+                w.writerow([name, price, price // 2, f"55{i:011d}"])
+            elif kind < 0.43:   # fila vacía o con precio inválido
+                w.writerow([] if i % 2 else [name, "abc", "", barcode])
+            elif kind < 0.46:   # repite un producto nuevo anterior de la lista
+                j = rnd.randrange(max(i, 1))
+                w.writerow([f"Nuevo {j:05d}", price, 0, f"99{j:011d}" if j % 3 else ""])
+            else:               # producto nuevo
+                w.writerow([f"Nuevo {i:05d}", price, price // 3, f"99{i:011d}" if i % 3 else ""])
+
+
+def _check_preview(path: str, before_table, after_table) -> float:
+    """Compara la vista previa (calculada sobre before_table) con el resultado real."""
+    start = time.perf_counter()
+    preview = pbs.preview_import_products_csv(path)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    old = {r[0]: r[1:] for r in before_table}
+    new = {r[0]: r[1:] for r in after_table}
+    created = {(p["name"], p["sale_price"], p["purchase_price"], p["barcode"]) for p in preview["new"]}
+    if created != {v for pid, v in new.items() if pid not in old}:
+        raise SystemExit("La vista previa no anticipa los productos nuevos")
+    changed = {p["id"]: (p["name"], p["sale_price"], p["purchase_price"], p["barcode"])
+               for p in preview["changed"]}
+    if changed != {pid: v for pid, v in new.items() if pid in old and old[pid] != v}:
+        raise SystemExit("La vista previa no anticipa los cambios")
+    print(f"  -> vista previa en {elapsed:.1f} ms: {len(preview['new'])} nuevos,"
+          f" {len(preview['changed'])} con cambios, {preview['unchanged']} iguales,"
+          f" {len(preview['skipped'])} omitidas, {len(preview['barcode_collisions'])}"
+          f" colisiones de código, {len(preview['duplicate_names'])} nombres repetidos")
+    return elapsed
+
+
+def _table():
+    with db_manager.get_conn() as con:
+        return con.execute("""
+            SELECT id, name, sale_price, purchase_price, barcode FROM products ORDER BY id
+        """).fetchall()
+
+
+def _run(importer, path: str, preview: bool = False):
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con, count=EXISTING)
+        before_table = _table() if preview else None
+        start = time.perf_counter()
+        counts = importer(path)
+        elapsed = (time.perf_counter() - start) * 1000
+        table = _table()
+        with db_manager.get_conn() as con:
+            con.execute("INSERT INTO products_fts(products_fts) VALUES ('integrity-check')")
+        if preview:
+            # La vista previa se calcula sobre la BD de antes: se restaura y se compara
+            with db_manager.get_conn() as con:
+                con.execute("DELETE FROM products")
+                con.executemany("INSERT INTO products VALUES (?, ?, ?, ?, ?)", before_table)
+                con.commit()
+            _check_preview(path, before_table, table)
+    return elapsed, counts, table
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lista.csv")
+        with temp_database():
+            with db_manager.get_conn() as con:
+                seed_products(con, count=EXISTING)
+            _write_price_list(path)
+
+        before, old_counts, old_table = _run(legacy_import_products_csv, path)
+        after, new_counts, new_table = _run(pbs.import_products_csv, path, preview=True)
+
+    new_counts.pop("cancelled")
+    if old_counts != new_counts:
+        raise SystemExit(f"Contadores distintos: {old_counts} / {new_counts}")
+    if old_table != new_table:
+        raise SystemExit("La tabla products quedó distinta")
+    report(f"Import {ROWS} filas sobre {EXISTING}", before, after, unit="ms")
+    print(f"  -> {new_counts}; tabla products idéntica")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# benchmarks/bench_parallel_import.py
+"""
+Parseo en paralelo por rangos de bytes (core/csv_chunks.py):
+- Historial de ventas de ~400.000 líneas (sales_import_service): fase de
+  parseo/validación con 1 proceso contra uno por CPU, e importación completa.
+- Lista de precios de bench_import forzando el camino paralelo.
+Verifica que con y sin procesos se obtengan los mismos errores (misma
+línea y mensaje) y la misma BD (ventas, líneas, rollups y productos), y que
+los rollups coincidan con rebuild_rollups().
+La ganancia depende de tener más de un núcleo.
+"""
+import csv
+import os
+import random
+import tempfile
+import time
+
+from core import csv_chunks, db_manager
+from core import product_backup_service as pbs
+from core import sales_import_service as sis
+from core.rollup_service import ROLLUP_TABLES, rebuild_rollups
+from benchmarks import bench_import
+from benchmarks._common import temp_database, seed_products, report
+
+SALES = 120000
+BAD_LINES = {17, 50000, 250001}
+
+
+def _write_history(path: str) -> None:
+    with db_manager.get_conn() as con:
+        products = con.execute("SELECT name, barcode, sale_price FROM products").fetchall()
+    rnd = random.Random(7)
+    line = 1
+    with open(path, "w", newline="", encoding="latin-1") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["Venta", "FechaHora", "Producto", "CodigoBarra", "Cantidad", "PrecioUnit", "MedioPago"])
+        for sale in range(SALES):
+            when = f"2021-{sale % 12 + 1:02d}-{sale % 28 + 1:02d} {8 + sale % 14:02d}:{sale % 60:02d}:00"
+            pay = rnd.choice(("efectivo", "tarjeta", ""))
+            for _ in range(rnd.randint(1, 6)):
+                line += 1
+                name, barcode, price = rnd.choice(products)
+                if rnd.random() < 0.02:   # producto que no existe en la BD
+                    name, barcode = f"Antiguo {rnd.randrange(300)}", ""
+                qty = "x" if line in BAD_LINES else rnd.randint(1, 4)
+                w.writerow([f"V{sale}", when, name, barcode or "", qty, price, pay])
+
+
+def _db_state():
+    with db_manager.get_conn() as con:
+        state = [con.execute(f"SELECT * FROM {t} ORDER BY 1, 2").fetchall() for t in ROLLUP_TABLES]
+        for sql in ("SELECT * FROM sales ORDER BY id", "SELECT * FROM sale_items ORDER BY id",
+                    "SELECT * FROM products ORDER BY id"):
+            state.append(con.execute(sql).fetchall())
+    return state
+
+
+def _import(path: str, workers: int):
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con, count=500)
+        start = time.perf_counter()
+        result = sis.import_sales_csv(path, workers=workers)
+        elapsed = (time.perf_counter() - start) * 1000
+        state = _db_state()
+        rebuild_rollups()
+        if _db_state() != state:
+            raise SystemExit("Los rollups importados no coinciden con rebuild_rollups()")
+    return elapsed, result, state
+
+
+def _parse_ms(path: str, workers: int) -> float:
+    start = time.perf_counter()
+    for _ in csv_chunks.parse_file(path, sis._parse_sales_chunk, workers):
+        pass
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    workers = max(2, os.cpu_count() or 1)
+    print(f"CPUs: {os.cpu_count()}; procesos en paralelo: {workers}\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "historial.csv")
+        with temp_database():
+            with db_manager.get_conn() as con:
+                seed_products(con, count=500)
+            _write_history(path)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        report(f"Parseo historial ({size_mb:.0f} MB)", _parse_ms(path, 1), _parse_ms(path, workers), unit="ms")
+
+        before, serial, serial_state = _import(path, 1)
+        after, parallel, parallel_state = _import(path, workers)
+        if serial != parallel or serial_state != parallel_state:
+            raise SystemExit("El import en paralelo no coincide con el secuencial")
+        expected = sorted(BAD_LINES)
+        if [line for line, _ in parallel["errors"]] != expected:
+            raise SystemExit(f"Errores en otras líneas: {parallel['errors']}")
+        report("Import historial completo", before, after, unit="ms")
+        print(f"  -> {parallel['sales']} ventas, {parallel['lines']} líneas,"
+              f" {parallel['products_created']} productos nuevos,"
+              f" {parallel['skipped_sales']} ventas omitidas; errores: {parallel['errors']}")
+
+        # Lista de precios: mismo resultado por el camino paralelo
+        prices = os.path.join(tmp, "lista.csv")
+        with temp_database():
+            with db_manager.get_conn() as con:
+                seed_products(con, count=bench_import.EXISTING)
+            bench_import._write_price_list(prices)
+        _, streamed, streamed_table = bench_import._run(pbs.import_products_csv, prices)
+        csv_chunks.PARALLEL_MIN_BYTES = 0
+        _, chunked, chunked_table = bench_import._run(
+            lambda p: pbs.import_products_csv(p, workers=workers), prices
+        )
+        if streamed != chunked or streamed_table != chunked_table:
+            raise SystemExit("Import de productos en paralelo distinto al streaming")
+        print(f"  -> lista de precios en paralelo: {chunked}; tabla idéntica")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_report_cache.py
+"""
+Caché de report_service al volver a la pestaña de reportes (load_report con
+el mismo rango "Todo el historial"):
+- Antes: cada visita recalcula resumen y top.
+- Después: la segunda visita en adelante sale del caché.
+Luego se registra una venta de hoy y se comprueba que:
+- el período cerrado (termina antes de hoy) sigue en caché;
+- un rango que incluye hoy se recalcula y ve la venta nueva;
+- cambiar el precio de compra de un producto invalida también lo cerrado;
+- rebuild_rollups() también invalida lo cerrado.
+"""
+import time
+
+from core import db_manager
+from core import report_service as rs
+from core import sales_service as ss
+from core import ticket_service as ts
+from core.rollup_service import rebuild_rollups
+from core.time_utils import today_local_str
+from benchmarks._common import temp_database, seed_products, seed_sales_history, report
+
+CLOSED = ("2022-01-01", "2024-12-31")
+VISITS = 20
+
+
+def _visits(clear: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(VISITS):
+        if clear:
+            rs.clear_cache()
+        rs.load_report(*CLOSED)
+    return (time.perf_counter() - start) * 1000 / VISITS
+
+
+def _sell_today() -> int:
+    with db_manager.get_conn() as con:
+        pid, price = con.execute("SELECT id, sale_price FROM products WHERE sale_price > 0 LIMIT 1").fetchone()
+    ticket = ts.create_ticket("bench")
+    ts.add_item(ticket, pid, 1, price)
+    ss.cobrar_ticket(ticket)
+    return pid
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con)
+            lines = seed_sales_history(con, sales_per_day=150)
+        print(f"Historial sintético: {lines} líneas de venta\n")
+
+        fresh = rs.load_report(*CLOSED)
+        before = _visits(clear=True)
+        after = _visits(clear=False)
+        if rs.load_report(*CLOSED) != fresh:
+            raise SystemExit("El caché devolvió otro resultado")
+        report(f"Volver a Reportes ({VISITS} visitas, c/u)", before, after, unit="ms")
+
+        today = today_local_str()
+        open_before = rs.summary(CLOSED[0], today)
+        hits = rs.cache_stats["hits"]
+        pid = _sell_today()
+
+        rs.load_report(*CLOSED)
+        if rs.cache_stats["hits"] != hits + 2:
+            raise SystemExit("Una venta de hoy invalidó un período cerrado")
+        open_after = rs.summary(CLOSED[0], today)
+        if open_after["tickets"] != open_before["tickets"] + 1:
+            raise SystemExit("El rango con hoy no vio la venta nueva")
+
+        with db_manager.get_conn() as con:
+            con.execute("UPDATE products SET purchase_price = purchase_price + 1 WHERE id=?", (pid,))
+            con.commit()
+        misses = rs.cache_stats["misses"]
+        cached = rs.load_report(*CLOSED)
+        rs.clear_cache()
+        if rs.cache_stats["misses"] != misses + 2 or cached != rs.load_report(*CLOSED):
+            raise SystemExit("Cambio de precio de compra no invalidó el caché")
+
+        misses = rs.cache_stats["misses"]
+        rebuild_rollups()
+        rs.load_report(*CLOSED)
+        if rs.cache_stats["misses"] != misses + 2:
+            raise SystemExit("rebuild_rollups no invalidó el caché")
+        print("  -> venta de hoy: período cerrado sigue en caché, rango con hoy recalculado;"
+              " precio de compra y rebuild_rollups: invalidan")
+
+
+if __name__ == "__main__":
+    main()
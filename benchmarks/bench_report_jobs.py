@@ -0,0 +1,93 @@
+# benchmarks/bench_report_jobs.py
+"""
+Carga de reportes como la hace ReportsView (sin Qt: mismas consultas, mismo
+hilo de lectura y la misma cancelación por get_read_conn(cancel=...)):
+- Cinco clics rápidos de rango (cada 30 ms): antes cada clic calculaba su
+  reporte completo en el hilo de la UI; después cada clic lanza un trabajo
+  (load_report: resumen y top de una misma foto WAL) y cancela el anterior.
+  Se mide cuánto tarda en verse el último rango desde el último clic.
+Verifica que el último reporte coincida con summary/top_products calculados
+por separado.
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import db_manager
+from core import report_service as rs
+from benchmarks._common import temp_database, seed_products, seed_sales_history, report
+
+ALL = ("2022-01-01", "2024-12-31")
+CLICKS = [("2024-01-01", "2024-12-31"), ALL, ("2024-06-01", "2024-06-30"), ALL, ALL]
+TOP_LIMIT = 10
+
+
+def _job(d1, d2, cancel):
+    if cancel.is_set():
+        return None
+    try:
+        with db_manager.get_read_conn(cancel=cancel):
+            return rs.load_report(d1, d2, top_limit=TOP_LIMIT)
+    except sqlite3.OperationalError:
+        if cancel.is_set():
+            return None
+        raise
+
+
+def sequential(d1, d2):
+    rs.clear_cache()   # se mide el cálculo, no el caché de report_service
+    return {"summary": rs.summary(d1, d2), "top": rs.top_products(d1, d2, limit=TOP_LIMIT)}
+
+
+def clicks_before():
+    """Cada clic bloquea la UI hasta terminar su reporte; devuelve el bloqueo total (ms)."""
+    start = time.perf_counter()
+    for d1, d2 in CLICKS:
+        sequential(d1, d2)
+    return (time.perf_counter() - start) * 1000
+
+
+def clicks_after(pool):
+    """Clics cada 30 ms cancelando lo anterior; ms desde el último clic hasta verse el reporte."""
+    current = None
+    cancelled = 0
+    for d1, d2 in CLICKS:
+        if current is not None:
+            future, cancel = current
+            cancel.set()
+            cancelled += 1 if future.cancel() else 0
+        rs.clear_cache()
+        cancel = threading.Event()
+        current = pool.submit(_job, d1, d2, cancel), cancel
+        last_click = time.perf_counter()
+        time.sleep(0.03)
+    future, _ = current
+    result = future.result()
+    return (time.perf_counter() - last_click) * 1000 - 30, result, cancelled
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con)
+            lines = seed_sales_history(con, sales_per_day=150)
+        print(f"Historial sintético: {lines} líneas de venta\n")
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            expected = sequential(*ALL)
+
+            # Antes: los clics quedan en cola con la UI congelada y el último rango
+            # se ve recién cuando terminan todos los reportes anteriores.
+            blocked = clicks_before()
+            before = blocked - 30 * (len(CLICKS) - 1)
+            wait, result, cancelled = clicks_after(pool)
+            if result != expected:
+                raise SystemExit("El último reporte no coincide")
+            report(f"{len(CLICKS)} clics: último rango visible", before, wait, unit="ms")
+            print(f"  -> UI congelada antes: {blocked:.1f} ms; después: 0 ms"
+                  f" ({cancelled} trabajos descartados sin correr, el resto interrumpidos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# benchmarks/bench_report_reads.py
+"""
+Cobros mientras se recalcula el reporte "Todo el historial" sin parar:
+- Antes: reporte y cobro comparten el hilo (y la conexión) de la UI; un
+  cobro pedido a mitad de un reporte espera a que éste termine.
+- Después: el reporte corre en un hilo de trabajo con conexión de solo
+  lectura (load_report, foto WAL) y el cobro en el hilo escritor.
+Se mide la latencia pedido -> venta registrada de cada cobro, y se verifica
+que load_report devuelva lo mismo que summary/top_products por separado.
+"""
+import queue
+import random
+import statistics
+import threading
+import time
+
+from core import db_manager, db_writer
+from core import report_service as rs
+from core import sales_service as ss
+from core import ticket_service as ts
+from benchmarks._common import temp_database, seed_products, seed_sales_history, report
+
+RANGE = ("2022-01-01", "2024-12-31")
+CHECKOUTS = 20
+
+
+def _prepare_tickets(count: int):
+    with db_manager.get_conn() as con:
+        products = con.execute("SELECT id, sale_price FROM products LIMIT 3").fetchall()
+    ids = []
+    for i in range(count):
+        tid = ts.create_ticket(f"bench {i}")
+        ts.add_items(tid, [(pid, 1, price) for pid, price in products])
+        ids.append(tid)
+    return ids
+
+
+def _requests(tickets, out: queue.Queue, seed: int) -> None:
+    """Pide un cobro cada 20-80 ms (como una cajera), anotando la hora del pedido."""
+    rnd = random.Random(seed)
+    for tid in tickets:
+        time.sleep(rnd.uniform(0.02, 0.08))
+        out.put((tid, time.perf_counter()))
+    out.put(None)
+
+
+def _report_once() -> None:
+    rs.clear_cache()   # se mide el cálculo, no el caché de report_service
+    rs.summary(*RANGE)
+    rs.top_products(*RANGE, limit=10)
+
+
+def single_thread(tickets):
+    """Antes: un solo hilo alterna reportes y cobros pendientes."""
+    pending = queue.Queue()
+    threading.Thread(target=_requests, args=(tickets, pending, 1), daemon=True).start()
+    latencies, done = [], False
+    while not done:
+        _report_once()
+        while True:
+            try:
+                req = pending.get_nowait()
+            except queue.Empty:
+                break
+            if req is None:
+                done = True
+                break
+            tid, asked = req
+            ss.cobrar_ticket(tid)
+            latencies.append((time.perf_counter() - asked) * 1000)
+    return latencies
+
+
+def split_threads(tickets):
+    """Después: reportes en un hilo de trabajo, cobros por el hilo escritor."""
+    writer = db_writer.get_writer()
+    stop = threading.Event()
+
+    def reports():
+        while not stop.is_set():
+            rs.clear_cache()
+            rs.load_report(*RANGE)
+
+    worker = threading.Thread(target=reports, daemon=True)
+    worker.start()
+
+    pending = queue.Queue()
+    threading.Thread(target=_requests, args=(tickets, pending, 1), daemon=True).start()
+    latencies = []
+    while True:
+        req = pending.get()
+        if req is None:
+            break
+        tid, asked = req
+        writer.call(ss.cobrar_ticket, tid)
+        latencies.append((time.perf_counter() - asked) * 1000)
+    stop.set()
+    worker.join()
+    return latencies
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con)
+            lines = seed_sales_history(con, sales_per_day=150)
+        print(f"Historial sintético: {lines} líneas de venta")
+
+        start = time.perf_counter()
+        _report_once()
+        print(f"Un reporte 'Todo el historial': {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+        both = rs.load_report(*RANGE)
+        if both != {"summary": rs.summary(*RANGE), "top": rs.top_products(*RANGE, limit=10)}:
+            raise SystemExit("load_report no coincide con summary/top_products")
+
+        try:
+            before = single_thread(_prepare_tickets(CHECKOUTS))
+            after = split_threads(_prepare_tickets(CHECKOUTS))
+        finally:
+            db_writer.shutdown()
+
+        if len(before) != CHECKOUTS or len(after) != CHECKOUTS:
+            raise SystemExit("No se registraron todos los cobros")
+        report("Cobro durante reporte (mediana)", statistics.median(before), statistics.median(after), unit="ms")
+        report("Cobro durante reporte (peor)", max(before), max(after), unit="ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# benchmarks/bench_reports.py
+"""
+Reportes sobre 3 años de historial sintético:
+- Verifica con EXPLAIN QUERY PLAN que cada consulta de report_service y
+  sales_service usa el índice idx_sales_sale_date (falla si alguna no lo usa).
+- Compara las consultas antiguas (filtro date(created_at) BETWEEN ... sobre
+  las tablas crudas) contra las actuales (sale_date indexado y rollups)
+  para el rango "Año actual".
+"""
+import re
+import time
+
+from core import db_manager
+from core import report_service as rs
+from core import sales_service as ss
+from benchmarks._common import temp_database, seed_products, seed_sales_history, report
+
+YEAR_FROM, YEAR_TO = "2024-01-01", "2024-12-31"
+
+# Consultas antiguas (baseline) para comparar contra las funciones actuales
+LEGACY_DAILY = """
+    SELECT date(created_at) AS d, IFNULL(SUM(total),0) AS t
+    FROM sales
+    WHERE date(created_at) BETWEEN ? AND ?
+    GROUP BY date(created_at)
+    ORDER BY d ASC
+"""
+LEGACY_SUMMARY_LINES = """
+    SELECT si.qty, si.unit_price, COALESCE(p.purchase_price, 0), COALESCE(si.gain_per_unit, 0)
+    FROM sales s
+    JOIN sale_items si ON si.sale_id = s.id
+    JOIN products p ON p.id = si.product_id
+    WHERE date(s.created_at) BETWEEN ? AND ?
+"""
+LEGACY_TOP_PRODUCTS = """
+    SELECT p.name, SUM(si.qty) AS total_qty, SUM(si.qty*si.unit_price) AS revenue
+    FROM sale_items si
+    JOIN sales    s ON s.id = si.sale_id
+    JOIN products p ON p.id = si.product_id
+    WHERE date(s.created_at) BETWEEN ? AND ?
+    GROUP BY p.id, p.name
+    ORDER BY revenue DESC
+    LIMIT 10
+"""
+NEW_SUMMARY_LINES = LEGACY_SUMMARY_LINES.replace("date(s.created_at)", "s.sale_date")
+
+
+def _captured_selects(fn, *args):
+    """Ejecuta fn y devuelve los SELECT (con parámetros ya expandidos) que lanzó."""
+    statements = []
+    fn = getattr(fn, "__wrapped__", fn)   # sin el caché de report_service
+    with db_manager.get_read_conn() as con:   # la misma conexión que usará fn
+        con.set_trace_callback(statements.append)
+        try:
+            fn(*args)
+        finally:
+            con.set_trace_callback(None)
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+def check_query_plans() -> None:
+    calls = [
+        (rs.list_sales, YEAR_FROM, YEAR_TO),
+        (rs.summary, YEAR_FROM, YEAR_TO),
+        (rs.top_products, YEAR_FROM, YEAR_TO),
+        (rs.daily_totals, YEAR_FROM, YEAR_TO),
+        (rs.hourly_totals, "2024-06-01"),
+        (rs.monthly_totals, YEAR_FROM, YEAR_TO),
+        (ss.ventas_del_dia, "2024-06-01"),
+        (ss.ventas_por_rango, YEAR_FROM, YEAR_TO),
+    ]
+    failures = []
+    with db_manager.get_conn() as con:
+        for fn, *args in calls:
+            for sql in _captured_selects(fn, *args):
+                plan = " | ".join(r[3] for r in con.execute("EXPLAIN QUERY PLAN " + sql))
+                # Las consultas sobre rollups (sales_daily, ...) no tocan la tabla sales
+                if not re.search(r"\bsales\b", sql) or "idx_sales_sale_date" in plan:
+                    status = "OK "
+                else:
+                    status = "MAL"
+                    failures.append(fn.__name__)
+                print(f"[{status}] {fn.__module__}.{fn.__name__}: {plan}")
+    if failures:
+        raise SystemExit(f"Consultas sin índice idx_sales_sale_date: {', '.join(failures)}")
+
+
+def _time(fn, repeat: int = 5) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con)
+            lines = seed_sales_history(con)
+        print(f"Historial sintético: {lines} líneas de venta\n")
+
+        check_query_plans()
+        print()
+
+        with db_manager.get_conn() as con:
+            def run(sql):
+                return lambda: con.execute(sql, (YEAR_FROM, YEAR_TO)).fetchall()
+
+            before = _time(run(LEGACY_DAILY))
+            after = _time(lambda: rs.daily_totals.__wrapped__(YEAR_FROM, YEAR_TO))
+            report("daily_totals (año)", before, after, unit="ms")
+
+            before = _time(run(LEGACY_TOP_PRODUCTS))
+            after = _time(lambda: rs.top_products.__wrapped__(YEAR_FROM, YEAR_TO))
+            report("top_products (año, rollup)", before, after, unit="ms")
+
+            before = _time(run(LEGACY_SUMMARY_LINES))
+            after = _time(run(NEW_SUMMARY_LINES))
+            report("líneas de summary (año)", before, after, unit="ms")
+
+
+if __name__ == "__main__":
+    main()
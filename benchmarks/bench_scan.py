@@ -0,0 +1,60 @@
+# benchmarks/bench_scan.py
+"""
+Camino "escaneo -> fila en el ticket" (parte de servicios, sin Qt) con 20.000
+productos, por cada código leído:
+- Antes: una consulta de sugerencias por dígito (13) + búsqueda por texto
+  para resolver el código + add_item + list_items.
+- Después: búsqueda exacta del código en el catálogo (sin sugerencias durante
+  la ráfaga) + add_item + list_items.
+"""
+import random
+import time
+
+from core import db_manager
+from core import product_service as ps
+from core import ticket_service as ts
+from benchmarks._common import temp_database, seed_products, report
+
+PRODUCTS = 20000
+SCANS = 200
+
+
+def _legacy_scan(ticket_id: int, code: str) -> None:
+    for i in range(1, len(code) + 1):
+        ps.list_products(code[:i])[:30]
+    pid = ps.list_products(code)[0]["id"]
+    ts.add_item(ticket_id, pid, qty=1, unit_price=ps.get_product(pid)["sale_price"])
+    ts.list_items(ticket_id)
+
+
+def _scan(ticket_id: int, code: str) -> None:
+    prod = ps.get_product_by_barcode(code)
+    ts.add_item(ticket_id, prod["id"], qty=1, unit_price=prod["sale_price"])
+    ts.list_items(ticket_id)
+
+
+def _avg_ms(fn, codes) -> float:
+    ticket_id = ts.create_ticket("Bench")
+    start = time.perf_counter()
+    for code in codes:
+        fn(ticket_id, code)
+    elapsed = (time.perf_counter() - start) * 1000
+    ts.delete_ticket(ticket_id)
+    return elapsed / len(codes)
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con, count=PRODUCTS)
+        rnd = random.Random(7)
+        codes = [f"78{rnd.randrange(PRODUCTS):011d}" for _ in range(SCANS)]
+        ps.get_product_by_barcode(codes[0])   # carga del catálogo fuera de la medición
+
+        before = _avg_ms(_legacy_scan, codes)
+        after = _avg_ms(_scan, codes)
+        report("Escaneo -> fila (promedio por código)", before, after, unit="ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_sidebar.py
+"""
+Datos para la lista de tickets abiertos con 100 tickets, tras cambiar uno
+(lo normal después de un +/- o de agregar un producto):
+- Antes: list_open_tickets() completa en cada acción.
+- Después: list_open_tickets_since(versión) -> orden de ids + el ticket cambiado.
+- Sin cambios: list_open_tickets_since(versión actual) -> una lectura del contador.
+"""
+from core import db_manager
+from core import product_service as ps
+from core import ticket_service as ts
+from benchmarks._common import temp_database, seed_products, ops_per_sec, report
+
+TICKETS = 100
+REPEAT = 2000
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con, count=50)
+        products = ps.search_products("", limit=50)
+        ticket_ids = []
+        for n in range(TICKETS):
+            tid = ts.create_ticket(f"Mesa {n + 1}")
+            for p in products[n % 10:n % 10 + 3]:
+                ts.add_item(tid, p["id"], qty=1, unit_price=p["sale_price"])
+            ticket_ids.append(tid)
+        line_id = ts.list_items(ticket_ids[0])[0]["id"]
+        state = {"qty": 1, "version": ts.open_tickets_version()}
+
+        def touch():
+            state["qty"] += 1
+            ts.update_item_qty(line_id, state["qty"])
+
+        def legacy():
+            touch()
+            ts.list_open_tickets()
+
+        def delta():
+            touch()
+            d = ts.list_open_tickets_since(state["version"])
+            if len(d["changed"]) != 1:
+                raise SystemExit(f"Se esperaba 1 ticket cambiado, llegaron {len(d['changed'])}")
+            state["version"] = d["version"]
+
+        before = ops_per_sec(legacy, REPEAT)
+        after = ops_per_sec(delta, REPEAT)
+        report(f"Cambio + lista ({TICKETS} tickets)", before, after)
+
+        version = ts.open_tickets_version()
+        before = ops_per_sec(ts.list_open_tickets, REPEAT)
+        after = ops_per_sec(lambda: ts.list_open_tickets_since(version), REPEAT)
+        report("Lista sin cambios", before, after)
+
+
+if __name__ == "__main__":
+    main()
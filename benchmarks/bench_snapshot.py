@@ -0,0 +1,76 @@
+# benchmarks/bench_snapshot.py
+"""
+Lecturas que hace el POS tras cada acción (agregar, +/-, borrar línea),
+con 15 tickets abiertos y un ticket actual de 10 u 80 líneas:
+- Antes: load_ticket (get_ticket + list_items + calc_ticket_totals) +
+  _refresh_tickets_sidebar (list_open_tickets), que al re-seleccionar el
+  ticket actual disparaba otro load_ticket: siete lecturas separadas.
+- Después: get_ticket_snapshot(tickets_since=0), una transacción (con
+  tickets_since=0 trae la lista completa: el peor caso para la barra lateral).
+"""
+import time
+
+from core import db_manager
+from core import product_service as ps
+from core import ticket_service as ts
+from benchmarks._common import temp_database, seed_products, report
+
+REPEAT = 2000
+
+
+def _legacy_reads(ticket_id: int) -> None:
+    ts.get_ticket(ticket_id)
+    ts.list_items(ticket_id)
+    ts.calc_ticket_totals(ticket_id)
+    ts.list_open_tickets()
+    # load_ticket repetido por itemSelectionChanged de la lista
+    ts.get_ticket(ticket_id)
+    ts.list_items(ticket_id)
+    ts.calc_ticket_totals(ticket_id)
+
+
+def _snapshot_reads(ticket_id: int) -> None:
+    ts.get_ticket_snapshot(ticket_id, tickets_since=0)
+
+
+def _avg_us(fn, ticket_id: int) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(ticket_id)
+    return (time.perf_counter() - start) * 1_000_000 / REPEAT
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con, count=200)
+        products = ps.search_products("", limit=200)
+        for n in range(14):
+            tid = ts.create_ticket(f"Mesa {n + 1}")
+            ts.add_item(tid, products[n]["id"], qty=1, unit_price=products[n]["sale_price"])
+
+        for lines in (10, 80):
+            ticket_id = ts.create_ticket(f"Grupo {lines}")
+            for p in products[:lines]:
+                ts.add_item(ticket_id, p["id"], qty=2, unit_price=p["sale_price"])
+
+            snap = ts.get_ticket_snapshot(ticket_id, tickets_since=0)
+            open_tickets = ts.list_open_tickets()
+            if (
+                snap["ticket"] != ts.get_ticket(ticket_id)
+                or snap["items"] != ts.list_items(ticket_id)
+                or snap["total"] != ts.calc_ticket_totals(ticket_id)[2]
+                or snap["tickets"]["ids"] != [t["id"] for t in open_tickets]
+                or sorted(snap["tickets"]["changed"], key=lambda t: t["id"])
+                   != sorted(open_tickets, key=lambda t: t["id"])
+            ):
+                raise SystemExit("El snapshot no coincide con las lecturas separadas")
+
+            before = _avg_us(_legacy_reads, ticket_id)
+            after = _avg_us(_snapshot_reads, ticket_id)
+            report(f"Lecturas por acción ({lines} líneas)", before, after, unit="µs")
+            ts.delete_ticket(ticket_id)
+
+
+if __name__ == "__main__":
+    main()
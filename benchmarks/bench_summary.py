@@ -0,0 +1,98 @@
+# benchmarks/bench_summary.py
+"""
+report_service.summary sobre ~1M líneas de venta sintéticas:
+- Compara el loop Python original (una fila por línea de venta) contra la
+  consulta única sobre los rollups.
+- Verifica que total, ganancia y margen promedio sean los mismos, también
+  después de cambiar precios de compra (la ganancia usa el precio actual).
+"""
+import time
+
+from core import db_manager
+from core import report_service as rs
+from benchmarks._common import temp_database, seed_products, seed_sales_history, report
+
+RANGES = [
+    ("Año 2024", "2024-01-01", "2024-12-31"),
+    ("Todo el historial", "2022-01-01", "2024-12-31"),
+    ("Un día", "2023-06-15", "2023-06-15"),
+]
+
+
+def legacy_summary(date_from: str, date_to: str) -> dict:
+    """Réplica de summary() original: trae cada línea y acumula en Python."""
+    with db_manager.get_conn() as con:
+        cur = con.cursor()
+        cur.execute("""
+            SELECT si.qty, si.unit_price,
+                   COALESCE(p.purchase_price, 0), COALESCE(si.gain_per_unit, 0)
+            FROM sales s
+            JOIN sale_items si ON si.sale_id = s.id
+            JOIN products p ON p.id = si.product_id
+            WHERE date(s.created_at) BETWEEN ? AND ?
+        """, (date_from, date_to))
+
+        total_revenue = 0
+        total_profit = 0
+        margins_sum = 0.0
+        margin_count = 0
+        for qty, unit_price, purchase_price, gain_per_unit in cur.fetchall():
+            qty = int(qty or 0)
+            unit_price = int(unit_price or 0)
+            purchase_price = int(purchase_price or 0)
+            gain_per_unit = int(gain_per_unit or 0)
+
+            line_revenue = qty * unit_price
+            total_revenue += line_revenue
+            if gain_per_unit != 0:
+                line_profit = qty * gain_per_unit
+            else:
+                line_profit = qty * (unit_price - purchase_price)
+            total_profit += line_profit
+            if line_revenue > 0:
+                margins_sum += line_profit / line_revenue
+                margin_count += 1
+
+        avg_margin = (margins_sum / margin_count) if margin_count > 0 else 0.0
+        return {"total": total_revenue, "profit": total_profit, "avg_margin": avg_margin}
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def compare(label: str) -> None:
+    for title, d1, d2 in RANGES:
+        old, old_ms = _timed(legacy_summary, d1, d2)
+        new, new_ms = _timed(rs.summary, d1, d2)
+        same = (
+            old["total"] == new["total"]
+            and old["profit"] == new["profit"]
+            and abs(old["avg_margin"] - new["avg_margin"]) < 1e-9
+        )
+        if not same:
+            raise SystemExit(f"[{label}] {title}: resultados distintos\n  antes:   {old}\n  después: {new}")
+        report(f"summary {title} ({label})", old_ms, new_ms, unit="ms")
+    print(f"  -> resultados idénticos; tickets={new['tickets']} avg_ticket={new['avg_ticket']}")
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con)
+            lines = seed_sales_history(con, sales_per_day=305)
+        print(f"Historial sintético: {lines} líneas de venta\n")
+
+        compare("precios originales")
+
+        # La ganancia debe seguir el purchase_price actual, igual que antes
+        with db_manager.get_conn() as con:
+            con.execute("UPDATE products SET purchase_price = purchase_price + 137 WHERE id % 3 = 0")
+            con.commit()
+        compare("precios de compra cambiados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_ticket_totals.py
+"""
+Pulsación "+" en tickets grandes (10, 80 y 300 líneas):
+update_item_qty + calc_ticket_totals.
+- Antes: SUM(qty*unit_price) de todas las líneas en cada cambio, y
+  calc_ticket_totals recalculando + UPDATE + commit.
+- Después: pending_total por diferencias y calc_ticket_totals de solo lectura.
+Al final verifica con check_ticket_totals que no haya descuadres.
+"""
+import random
+
+from core import db_manager
+from core import product_service as ps
+from core import ticket_service as ts
+from core.time_utils import now_local_str
+from benchmarks._common import temp_database, seed_products, ops_per_sec, report
+
+REPEAT = 500
+
+
+def _legacy_recalc(con, ticket_id: int) -> int:
+    total = con.execute("""
+        SELECT IFNULL(SUM(qty * unit_price), 0)
+        FROM open_ticket_items
+        WHERE ticket_id=?
+    """, (ticket_id,)).fetchone()[0] or 0
+    con.execute("""
+        UPDATE open_tickets SET pending_total=?, updated_at=? WHERE id=?
+    """, (total, now_local_str(), ticket_id))
+    return total
+
+
+def _legacy_plus(ticket_id: int, line_id: int, state: dict) -> None:
+    state["qty"] += 1
+    with db_manager.get_conn() as con:
+        con.execute("UPDATE open_ticket_items SET qty=? WHERE id=?", (state["qty"], line_id))
+        _legacy_recalc(con, ticket_id)
+        con.commit()
+    with db_manager.get_conn() as con:
+        _legacy_recalc(con, ticket_id)
+        con.commit()
+
+
+def _plus(ticket_id: int, line_id: int, state: dict) -> None:
+    state["qty"] += 1
+    ts.update_item_qty(line_id, state["qty"])
+    ts.calc_ticket_totals(ticket_id)
+
+
+def main():
+    with temp_database():
+        with db_manager.get_conn() as con:
+            seed_products(con, count=400)
+        products = ps.search_products("", limit=400)
+        rnd = random.Random(3)
+
+        for lines in (10, 80, 300):
+            ticket_id = ts.create_ticket(f"Mesa {lines}")
+            for p in products[:lines]:
+                ts.add_item(ticket_id, p["id"], qty=rnd.randint(1, 4), unit_price=p["sale_price"])
+            line_id = ts.list_items(ticket_id)[-1]["id"]
+            state = {"qty": 1}
+
+            before = ops_per_sec(lambda: _legacy_plus(ticket_id, line_id, state), REPEAT)
+            after = ops_per_sec(lambda: _plus(ticket_id, line_id, state), REPEAT)
+            report(f"'+' en ticket de {lines} líneas", before, after)
+
+        # Mezcla aleatoria de operaciones y verificación contra el recálculo completo
+        ticket_id = ts.create_ticket("Mezcla")
+        for _ in range(2000):
+            items = ts.list_items(ticket_id)
+            op = rnd.random()
+            if op < 0.5 or not items:
+                p = rnd.choice(products)
+                ts.add_item(ticket_id, p["id"], qty=rnd.randint(1, 3), unit_price=p["sale_price"])
+            elif op < 0.6:
+                ts.add_common_item(ticket_id, "Varios", rnd.randint(1, 3), rnd.randint(100, 5000))
+            elif op < 0.8:
+                ts.update_item_qty(rnd.choice(items)["id"], rnd.randint(-1, 6))
+            else:
+                ts.remove_item(rnd.choice(items)["id"])
+        bad = ts.check_ticket_totals()
+        if bad:
+            raise SystemExit(f"Descuadres: {bad}")
+        print("  -> check_ticket_totals: sin descuadres")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# benchmarks/bench_writer.py
+"""
+Escritor único (core.db_writer) contra escribir desde el hilo de la UI:
+- Diez "+" seguidos sobre una línea: tiempo que el hilo llamador queda
+  bloqueado y cuántos comandos llegan a ejecutarse (se combinan en cola).
+- Importación de 20.000 productos por CSV: el "hilo de la UI" simula un
+  cuadro cada 16 ms y se mide el mayor hueco entre cuadros.
+- Durante esa importación la cajera pulsa "Nuevo", escanea y cobra (F12):
+  esperando cada escritura (db_writer.call, como antes) contra encolarlas
+  con on_done (como el POS ahora); se mide el peor hueco entre cuadros.
+Comprueba que la cantidad final, los productos importados y la venta sean
+los mismos.
+"""
+import csv
+import os
+import time
+
+from core import db_manager, db_writer
+from core import product_backup_service as pbs
+from core import sales_service as ss
+from core import ticket_service as ts
+from benchmarks._common import temp_database, seed_products, report
+
+PRESSES = 10
+IMPORT_ROWS = 20000
+FRAME_S = 0.016
+
+
+def _write_csv(path: str, count: int) -> None:
+    with open(path, "w", newline="", encoding="latin-1") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["Nombre", "PrecioVenta", "PrecioCompra", "CodigoBarra"])
+        for i in range(count):
+            w.writerow([f"Importado {i:05d}", 2000 + i % 500, 900, f"99{i:011d}"])
+
+
+def _frames_while(future, action=None) -> float:
+    """
+    Simula el loop de la UI mientras 'future' no termina; devuelve el peor
+    hueco (ms). 'action' corre dentro del tercer cuadro (una pulsación).
+    """
+    worst = 0.0
+    frame = 0
+    last = time.perf_counter()
+    while not future.done():
+        time.sleep(FRAME_S)
+        frame += 1
+        if frame == 3 and action is not None:
+            action()
+        now = time.perf_counter()
+        worst = max(worst, (now - last - FRAME_S) * 1000)
+        last = now
+    future.result()
+    return worst
+
+
+def _delete_imported() -> None:
+    with db_manager.get_conn() as con:
+        con.execute("DELETE FROM products WHERE barcode LIKE '99%'")
+        con.commit()
+
+
+def bench_presses(writer) -> None:
+    with db_manager.get_conn() as con:
+        pid, price = con.execute("SELECT id, sale_price FROM products LIMIT 1").fetchone()
+    ticket = ts.create_ticket("bench")
+    line = ts.add_item(ticket, pid, 1, price)
+
+    start = time.perf_counter()
+    for _ in range(PRESSES):
+        qty = ts.list_items(ticket)[0]["qty"]
+        ts.update_item_qty(line, qty + 1)
+    before = (time.perf_counter() - start) * 1000
+
+    executed = writer.stats["executed"]
+    start = time.perf_counter()
+    futures = [
+        writer.submit(
+            ts.change_item_qty, line, +1,
+            key=("qty", line), merge=lambda old, new: (old[0], old[1] + new[1]),
+        )
+        for _ in range(PRESSES)
+    ]
+    after = (time.perf_counter() - start) * 1000
+    for f in futures:
+        f.result()
+    runs = writer.stats["executed"] - executed
+
+    qty = ts.list_items(ticket)[0]["qty"]
+    if qty != 1 + 2 * PRESSES or ts.check_ticket_totals():
+        raise SystemExit(f"Cantidad o total incorrectos: qty={qty}")
+    report(f"{PRESSES} '+' (hilo llamador bloqueado)", before, after, unit="ms")
+    print(f"  -> {PRESSES} pulsaciones, {runs} comandos ejecutados en el escritor")
+
+
+def bench_import(writer, tmp: str) -> None:
+    path = os.path.join(tmp, "productos.csv")
+    _write_csv(path, IMPORT_ROWS)
+
+    start = time.perf_counter()
+    direct = pbs.import_products_csv(path)
+    before = (time.perf_counter() - start) * 1000   # la UI no dibuja mientras dura
+
+    _delete_imported()
+
+    after = _frames_while(writer.submit(pbs.import_products_csv, path))
+    with db_manager.get_conn() as con:
+        (count,) = con.execute("SELECT COUNT(*) FROM products WHERE barcode LIKE '99%'").fetchone()
+    if count != IMPORT_ROWS or direct["created"] != IMPORT_ROWS:
+        raise SystemExit(f"Importación incompleta: {count} / {direct}")
+    report(f"Import {IMPORT_ROWS} (peor hueco de la UI)", before, after, unit="ms")
+
+    # Nuevo ticket + escaneo + cobro con la importación en la cola
+    with db_manager.get_conn() as con:
+        pid, price = con.execute("SELECT id, sale_price FROM products LIMIT 1").fetchone()
+
+    def waiting():
+        tid = writer.call(ts.create_ticket, None)
+        writer.call(ts.add_item, tid, pid, 1, price)
+        writer.call(ts.calc_ticket_totals, tid)
+        writer.call(ss.cobrar_ticket, tid)
+
+    results = []
+
+    def queued():
+        # Como el POS: cada paso sigue en el callback del anterior (on_done)
+        def charged(future):
+            results.append(future.result())
+
+        def created(future):
+            tid = future.result()
+            writer.submit(ts.add_item, tid, pid, 1, price)
+            writer.submit(ts.calc_ticket_totals, tid)
+            writer.submit(ss.cobrar_ticket, tid).add_done_callback(charged)
+
+        writer.submit(ts.create_ticket, None).add_done_callback(created)
+
+    _delete_imported()
+    before = _frames_while(writer.submit(pbs.import_products_csv, path), waiting)
+    _delete_imported()
+    after = _frames_while(writer.submit(pbs.import_products_csv, path), queued)
+    writer.flush()
+    if len(results) != 1 or results[0]["total"] != price:
+        raise SystemExit(f"Cobro durante la importación incorrecto: {results}")
+    report("Nuevo+escaneo+F12 durante el import", before, after, unit="ms")
+
+
+def main():
+    with temp_database() as db_path:
+        with db_manager.get_conn() as con:
+            seed_products(con, count=200)
+        writer = db_writer.get_writer()
+        try:
+            bench_presses(writer)
+            bench_import(writer, os.path.dirname(db_path))
+        finally:
+            db_writer.shutdown()
+
+
+if __name__ == "__main__":
+    main()
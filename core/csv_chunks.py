@@ -0,0 +1,165 @@
+# core/csv_chunks.py
+"""
+Parseo de CSV grandes en paralelo, por rangos de bytes.
+
+El archivo se corta en trozos que terminan en un salto de línea y cada
+trozo se parsea/valida en un proceso aparte (ProcessPoolExecutor). Los
+resultados se juntan en el orden del archivo con el número de línea real:
+cada trozo informa cuántas líneas tenía y el total acumulado da el
+desplazamiento del siguiente. Así los errores salen siempre con la misma
+línea, sin importar cuántos procesos se usen.
+
+Las funciones de trozo reciben (path, start, end) y devuelven
+(items, líneas_del_trozo), con items = [(línea_local, resultado), ...];
+deben estar definidas a nivel de módulo (se envían a otro proceso). Las
+líneas son físicas (cuentan también las que quedan dentro de un campo
+entre comillas): la de cada fila sale de numbered() y las del trozo, de
+reader.line_num.
+Archivos chicos, o workers=1, se parsean en el mismo proceso con la misma
+función, trozo a trozo. En ambos casos los trozos se consumen en orden y a
+medida que llegan (nunca hay más de unos pocos en memoria), y parse_file
+puede cortarse entre un trozo y otro (cancel).
+
+Un campo entre comillas puede contener saltos de línea: split_ranges lleva
+la cuenta de comillas y solo corta donde la cuenta es par. Si el archivo
+tiene comillas sueltas (un total impar) se parsea en un solo trozo.
+"""
+import csv
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+# Por debajo de este tamaño no conviene levantar procesos
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+# Tamaño mínimo de cada trozo
+MIN_CHUNK_BYTES = 1024 * 1024
+
+
+def split_ranges(path: str, parts: int) -> List[Tuple[int, int]]:
+    """
+    Divide el archivo en hasta 'parts' rangos [start, end) que terminan en un
+    salto de línea fuera de comillas.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    parts = max(1, min(parts, size // MIN_CHUNK_BYTES or 1))
+    if parts == 1:
+        return [(0, size)]
+    step = size // parts
+    ranges = []
+    start = 0
+    quotes = 0      # comillas en [0, start)
+    with open(path, "rb") as f:
+        while start < size:
+            end = start + step
+            if end >= size or len(ranges) == parts - 1:
+                end = size
+            else:
+                f.seek(end)
+                f.readline()            # avanzar hasta el fin de la línea en curso
+                end = min(f.tell(), size)
+            f.seek(start)
+            quotes += f.read(end - start).count(b'"')
+            # Cuenta impar: el corte cae dentro de un campo entre comillas que
+            # sigue en la línea siguiente; se corre hasta que el campo cierre
+            while quotes % 2 and end < size:
+                quotes += f.readline().count(b'"')
+                end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    if quotes % 2:
+        # Comillas sueltas: la cuenta no dice dónde termina cada registro
+        return [(0, size)]
+    return ranges
+
+
+def read_rows(path: str, start: int, end: int, encoding: str = "latin-1"):
+    """
+    csv.reader (';') sobre el rango [start, end) del archivo.
+    reader.line_num da la línea dentro del trozo (1 = primera).
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    return csv.reader(io.StringIO(text, newline=""), delimiter=";")
+
+
+def numbered(reader) -> Iterator[Tuple[int, List[str]]]:
+    """
+    (línea donde empieza, fila) para cada fila de read_rows: un registro con
+    saltos de línea entre comillas ocupa varias líneas y reader.line_num
+    queda en la última.
+    """
+    line = 0
+    for row in reader:
+        yield line + 1, row
+        line = reader.line_num
+
+
+def use_parallel(path: str, workers: Optional[int]) -> bool:
+    """Conviene usar procesos: archivo grande y más de un proceso (None = uno por CPU)."""
+    workers = workers or os.cpu_count() or 1
+    return workers > 1 and os.path.getsize(path) >= PARALLEL_MIN_BYTES
+
+
+def _map_in_order(pool, parse_chunk, path, ranges, window):
+    """parse_chunk sobre cada rango en 'pool', en orden, con hasta 'window' trozos en vuelo."""
+    pending = deque()
+    try:
+        for start, end in ranges:
+            pending.append(pool.submit(parse_chunk, path, start, end))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Si se dejó de consumir (cancel o error), los que no empezaron no corren
+        for future in pending:
+            future.cancel()
+
+
+def parse_file(
+    path: str,
+    parse_chunk: Callable[[str, int, int], Tuple[List[Tuple[int, Any]], int]],
+    workers: Optional[int] = None,
+    cancel=None,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Parsea el archivo con parse_chunk y produce (línea, resultado) en orden.
+    workers=None usa un proceso por CPU; 1 (o archivo chico) parsea aquí mismo.
+
+    Después de cada trozo llama a progress(bytes_leídos) y, si el
+    threading.Event 'cancel' está activo, termina sin leer el resto.
+    """
+    size = os.path.getsize(path)
+    parallel = use_parallel(path, workers)
+    workers = workers or os.cpu_count() or 1
+    # Trozos de ~MIN_CHUNK_BYTES y, en paralelo, varios por proceso: reparte
+    # mejor si unos tardan más que otros
+    ranges = split_ranges(path, max(workers * 4 if parallel else 1, size // MIN_CHUNK_BYTES))
+
+    pool = None
+    if parallel and len(ranges) > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        chunks = _map_in_order(pool, parse_chunk, path, ranges, workers * 2)
+    else:
+        chunks = (parse_chunk(path, start, end) for start, end in ranges)
+
+    try:
+        offset = 0
+        for (_, end), (items, lines) in zip(ranges, chunks):
+            for line, result in items:
+                yield offset + line, result
+            offset += lines
+            if progress is not None:
+                progress(end)
+            if cancel is not None and cancel.is_set():
+                return
+    finally:
+        chunks.close()
+        if pool is not None:
+            pool.shutdown()
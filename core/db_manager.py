@@ -1,6 +1,9 @@
 # core/db_manager.py
 import sqlite3
 import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
 
 # === Carpeta del usuario donde se guardarán los datos ===
 USER_DATA_DIR = os.path.join(os.path.expanduser("~"), "CerveceriaPOS")
@@ -67,66 +70,316 @@ CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items(sale_id);
 CREATE INDEX IF NOT EXISTS idx_open_ticket_items_ticket ON open_ticket_items(ticket_id);
 """
 
+# Conexiones que puede haber prestadas a la vez a hilos de trabajo.
+POOL_SIZE = 4
+
+# Conexiones de solo lectura (reportes, consultas) que puede haber prestadas a la vez.
+READ_POOL_SIZE = 3
+
+# Cada cuántas instrucciones de SQLite se revisa si una lectura fue cancelada.
+CANCEL_CHECK_STEPS = 1000
+
+# Segundos que SQLite espera un lock de escritura antes de fallar.
+BUSY_TIMEOUT = 10.0
+
+
+class ConnectionManager:
+    """
+    Administra las conexiones SQLite de la aplicación.
+
+    - El hilo principal (GUI) y los hilos "fijados" con pin_thread() tienen
+      una conexión persistente propia, que se reutiliza en cada llamada.
+    - Los demás hilos (workers) piden prestada una conexión de un pool acotado
+      a 'pool_size'; si están todas en uso, esperan a que se libere una.
+    - Los PRAGMA se aplican una sola vez, al crear cada conexión.
+    - read_connection() entrega conexiones de solo lectura (PRAGMA query_only)
+      de un pool aparte, para reportes y diálogos de consulta; opcionalmente
+      dentro de una transacción de lectura (todas ven la misma foto WAL).
+    - close_all() cierra todo al salir de la aplicación.
+
+    connection() y read_connection() son reentrantes: si el hilo ya tiene una conexión en uso,
+    se reutiliza la misma en vez de pedir otra.
+    """
+
+    def __init__(self, db_path: str, pool_size: int = POOL_SIZE, read_pool_size: int = READ_POOL_SIZE):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._idle: List[sqlite3.Connection] = []
+        self._read_slots = threading.BoundedSemaphore(read_pool_size)
+        self._read_idle: List[sqlite3.Connection] = []
+        self._persistent: List[sqlite3.Connection] = []
+        self._main_con: Optional[sqlite3.Connection] = None
+
+    # -------- Creación --------
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # check_same_thread=False: las conexiones del pool pasan de un worker a otro
+        # (nunca se usan desde dos hilos a la vez) y close_all() las cierra desde el principal.
+        con = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute("PRAGMA synchronous=NORMAL;")
+        con.execute("PRAGMA foreign_keys=ON;")
+        if read_only:
+            # Cualquier INSERT/UPDATE/DELETE en esta conexión falla
+            con.execute("PRAGMA query_only=ON;")
+        return con
+
+    def _persistent_con(self) -> Optional[sqlite3.Connection]:
+        """Conexión propia del hilo actual (principal o fijado), si corresponde."""
+        con = getattr(self._local, "pinned", None)
+        if con is not None:
+            return con
+        if threading.current_thread() is threading.main_thread():
+            with self._lock:
+                if self._main_con is None:
+                    self._main_con = self._connect()
+                    self._persistent.append(self._main_con)
+                return self._main_con
+        return None
+
+    # -------- Préstamo --------
+    def _acquire(self) -> sqlite3.Connection:
+        self._slots.acquire()
+        try:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, con: sqlite3.Connection) -> None:
+        try:
+            if con.in_transaction:
+                con.rollback()
+            with self._lock:
+                self._idle.append(con)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Entrega una conexión para el hilo actual.
+        Igual que 'with sqlite3.connect(...)': confirma al salir sin errores
+        y hace rollback si hubo una excepción.
+        """
+        local = self._local
+        con = getattr(local, "current", None)
+        borrowed = False
+        if con is None:
+            con = self._persistent_con()
+            if con is None:
+                con = self._acquire()
+                borrowed = True
+            local.current = con
+            local.depth = 0
+
+        local.depth += 1
+        try:
+            with con:
+                yield con
+        finally:
+            local.depth -= 1
+            if local.depth == 0:
+                local.current = None
+                if borrowed:
+                    self._release(con)
+
+    # -------- Solo lectura --------
+    def _acquire_read(self) -> sqlite3.Connection:
+        self._read_slots.acquire()
+        try:
+            with self._lock:
+                if self._read_idle:
+                    return self._read_idle.pop()
+            return self._connect(read_only=True)
+        except Exception:
+            self._read_slots.release()
+            raise
+
+    def _release_read(self, con: sqlite3.Connection) -> None:
+        try:
+            if con.in_transaction:
+                con.rollback()
+            with self._lock:
+                self._read_idle.append(con)
+        finally:
+            self._read_slots.release()
+
+    @contextmanager
+    def read_connection(
+        self, snapshot: bool = False, cancel: Optional[threading.Event] = None
+    ) -> Iterator[sqlite3.Connection]:
+        """
+        Conexión de solo lectura para el hilo actual (de su propio pool, así
+        un reporte largo no ocupa la conexión del hilo ni las de escritura).
+        Con snapshot=True el bloque corre en una transacción de lectura: todas
+        sus consultas, incluidas las de funciones que a su vez pidan
+        get_read_conn(), ven la misma foto de la BD aunque entre una venta.
+        Con 'cancel', la consulta en curso se aborta (sqlite3.OperationalError
+        "interrupted") en cuanto se activa el evento, aunque vaya a la mitad.
+        """
+        local = self._local
+        con = getattr(local, "read_current", None)
+        borrowed = con is None
+        if borrowed:
+            con = self._acquire_read()
+            local.read_current = con
+
+        began = False
+        watch = cancel is not None and borrowed     # el bloque externo manda
+        if watch:
+            con.set_progress_handler(lambda: 1 if cancel.is_set() else 0, CANCEL_CHECK_STEPS)
+        try:
+            if snapshot and not con.in_transaction:
+                con.execute("BEGIN")
+                # En WAL la foto se fija con la primera lectura de la transacción
+                con.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+                began = True
+            yield con
+        finally:
+            if began and con.in_transaction:
+                con.rollback()
+            if watch:
+                con.set_progress_handler(None, 0)
+            if borrowed:
+                local.read_current = None
+                self._release_read(con)
+
+    # -------- Hilos con conexión propia --------
+    def pin_thread(self) -> sqlite3.Connection:
+        """Asigna al hilo actual una conexión persistente (para hilos de larga vida)."""
+        con = getattr(self._local, "pinned", None)
+        if con is None:
+            con = self._connect()
+            self._local.pinned = con
+            with self._lock:
+                self._persistent.append(con)
+        return con
+
+    def unpin_thread(self) -> None:
+        """Cierra la conexión persistente del hilo actual, si la tiene."""
+        con = getattr(self._local, "pinned", None)
+        if con is None:
+            return
+        self._local.pinned = None
+        with self._lock:
+            if con in self._persistent:
+                self._persistent.remove(con)
+        con.close()
+
+    # -------- Cierre --------
+    def close_all(self) -> None:
+        """Cierra todas las conexiones abiertas (persistentes y del pool)."""
+        with self._lock:
+            conns = self._persistent + self._idle + self._read_idle
+            self._persistent = []
+            self._idle = []
+            self._read_idle = []
+            self._main_con = None
+        for con in conns:
+            try:
+                if con.in_transaction:
+                    con.rollback()
+                con.close()
+            except sqlite3.Error:
+                pass
+
+
+_manager: Optional[ConnectionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_manager() -> ConnectionManager:
+    """Devuelve el administrador de conexiones (se recrea si cambia DB_PATH)."""
+    global _manager
+    with _manager_lock:
+        if _manager is None or _manager.db_path != DB_PATH:
+            if _manager is not None:
+                _manager.close_all()
+            _manager = ConnectionManager(DB_PATH)
+        return _manager
+
+
 def get_conn():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    con = sqlite3.connect(DB_PATH)
-    con.execute("PRAGMA journal_mode=WAL;")
-    con.execute("PRAGMA synchronous=NORMAL;")
-    con.execute("PRAGMA foreign_keys=ON;")
-    return con
+    """
+    Conexión para usar con 'with get_conn() as con:'.
+    Reutiliza la conexión del hilo (o una del pool) en vez de abrir una nueva.
+    """
+    return get_manager().connection()
+
+
+def get_read_conn(snapshot: bool = False, cancel: Optional[threading.Event] = None):
+    """
+    Conexión de solo lectura para 'with get_read_conn() as con:' (reportes y
+    consultas). Con snapshot=True, todo lo leído dentro del bloque sale de
+    la misma foto de la BD; con 'cancel' (threading.Event), las consultas
+    del bloque se interrumpen al activarlo.
+    """
+    return get_manager().read_connection(snapshot=snapshot, cancel=cancel)
+
+
+def close_all():
+    """Cierra todas las conexiones. Se llama al cerrar la aplicación."""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close_all()
+            _manager = None
 
 def _table_has_column(con, table, column) -> bool:
     cur = con.execute(f"PRAGMA table_info({table})")
     return any(row[1] == column for row in cur.fetchall())
 
-def migrate_products_strip_format_active():
+def _apply_base_schema(con):
+    """Crea la estructura base (tablas e índices) si no existe."""
+    con.executescript(DDL)
+
+def migrate_products_strip_format_active(con):
     """Elimina columnas antiguas 'format' y 'active' de products si existieran."""
-    with get_conn() as con:
-        has_format = _table_has_column(con, "products", "format")
-        has_active = _table_has_column(con, "products", "active")
-        if not (has_format or has_active):
-            return
-        con.execute("PRAGMA foreign_keys=OFF;")
-        con.executescript("""
-        BEGIN TRANSACTION;
-        CREATE TABLE IF NOT EXISTS products_new (
-          id INTEGER PRIMARY KEY,
-          name TEXT NOT NULL,
-          sale_price INTEGER NOT NULL,
-          purchase_price INTEGER NOT NULL DEFAULT 0,
-          barcode TEXT UNIQUE
-        );
-        INSERT INTO products_new (id, name, sale_price, purchase_price, barcode)
-          SELECT id, name,
-                 COALESCE(sale_price,0),
-                 COALESCE(purchase_price,0),
-                 barcode
-          FROM products;
-        DROP TABLE products;
-        ALTER TABLE products_new RENAME TO products;
-        COMMIT;
-        """)
-        con.execute("PRAGMA foreign_keys=ON;")
-        con.commit()
+    has_format = _table_has_column(con, "products", "format")
+    has_active = _table_has_column(con, "products", "active")
+    if not (has_format or has_active):
+        return
+    con.execute("PRAGMA foreign_keys=OFF;")
+    con.executescript("""
+    BEGIN TRANSACTION;
+    CREATE TABLE IF NOT EXISTS products_new (
+      id INTEGER PRIMARY KEY,
+      name TEXT NOT NULL,
+      sale_price INTEGER NOT NULL,
+      purchase_price INTEGER NOT NULL DEFAULT 0,
+      barcode TEXT UNIQUE
+    );
+    INSERT INTO products_new (id, name, sale_price, purchase_price, barcode)
+      SELECT id, name,
+             COALESCE(sale_price,0),
+             COALESCE(purchase_price,0),
+             barcode
+      FROM products;
+    DROP TABLE products;
+    ALTER TABLE products_new RENAME TO products;
+    COMMIT;
+    """)
+    con.execute("PRAGMA foreign_keys=ON;")
 
 def _column_exists(con, table: str, col: str) -> bool:
     cur = con.cursor()
     cur.execute(f"PRAGMA table_info({table})")
     return any(r[1].lower() == col.lower() for r in cur.fetchall())
 
-def migrate_sales_add_created_at_if_missing():
+def migrate_sales_add_created_at_if_missing(con):
     """
     Añade 'created_at' a 'sales' sin default no-constante, rellena datos existentes
     desde 'datetime' (si existe) o datetime('now'), crea trigger para futuras inserciones
     y un índice para mejorar filtros por fecha.
     """
-    with get_conn() as con:
-        if _column_exists(con, "sales", "created_at"):
-            # Asegura índice y trigger aunque la columna ya exista.
-            _ensure_sales_created_at_trigger_and_index(con)
-            con.commit()
-            return
-
+    if not _column_exists(con, "sales", "created_at"):
         con.executescript("""
         BEGIN IMMEDIATE;
 
@@ -145,42 +398,43 @@ def migrate_sales_add_created_at_if_missing():
 
         COMMIT;
         """)
-        # 3) Trigger e índice
-        _ensure_sales_created_at_trigger_and_index(con)
-        con.commit()
-        
-        
+    # 3) Trigger e índice (también si la columna ya existía)
+    _ensure_sales_created_at_trigger_and_index(con)
+
+
+def _ensure_common_product(con) -> int:
+    cur = con.cursor()
+    cur.execute("SELECT id FROM products WHERE name='Producto común' LIMIT 1;")
+    row = cur.fetchone()
+    if row:
+        return row[0]
+
+    # Si no existe, lo creamos con precios 0 (el unit_price real se guarda en el ticket)
+    cur.execute("""
+        INSERT INTO products (name, sale_price, purchase_price, barcode)
+        VALUES ('Producto común', 0, 0, NULL)
+    """)
+    return cur.lastrowid
+
 def ensure_common_product_exists() -> int:
     """
     Crea un producto 'Producto común' si no existe y devuelve su ID.
     Se usa para los ítems de producto común en los tickets.
     """
     with get_conn() as con:
-        cur = con.cursor()
-        cur.execute("SELECT id FROM products WHERE name='Producto común' LIMIT 1;")
-        row = cur.fetchone()
-        if row:
-            return row[0]
-        
-        # Si no existe, lo creamos con precios 0 (el unit_price real se guarda en el ticket)
-        cur.execute("""
-            INSERT INTO products (name, sale_price, purchase_price, barcode)
-            VALUES ('Producto común', 0, 0, NULL)
-        """)
+        product_id = _ensure_common_product(con)
         con.commit()
-        return cur.lastrowid
+        return product_id
 
-def migrate_open_ticket_items_add_display_name_if_missing():
+def migrate_open_ticket_items_add_display_name_if_missing(con):
     """
     Añade la columna display_name a open_ticket_items si no existe.
     No toca nada más (ni constraints ni datos).
     """
-    with get_conn() as con:
-        if _column_exists(con, "open_ticket_items", "display_name"):
-            return
+    if _column_exists(con, "open_ticket_items", "display_name"):
+        return
 
-        con.execute("ALTER TABLE open_ticket_items ADD COLUMN display_name TEXT;")
-        con.commit()
+    con.execute("ALTER TABLE open_ticket_items ADD COLUMN display_name TEXT;")
 
 def _ensure_sales_created_at_trigger_and_index(con):
     cur = con.cursor()
@@ -198,33 +452,336 @@ def _ensure_sales_created_at_trigger_and_index(con):
     cur.execute("CREATE INDEX IF NOT EXISTS idx_sales_created_at ON sales(created_at);")
 
 
-def migrate_open_ticket_items_add_gain_per_unit_if_missing():
+def migrate_open_ticket_items_add_gain_per_unit_if_missing(con):
     """Añade gain_per_unit a open_ticket_items si no existe."""
-    with get_conn() as con:
-        if _column_exists(con, "open_ticket_items", "gain_per_unit"):
-            return
-        con.execute("ALTER TABLE open_ticket_items ADD COLUMN gain_per_unit INTEGER NOT NULL DEFAULT 0;")
-        con.commit()
+    if _column_exists(con, "open_ticket_items", "gain_per_unit"):
+        return
+    con.execute("ALTER TABLE open_ticket_items ADD COLUMN gain_per_unit INTEGER NOT NULL DEFAULT 0;")
 
 
-def migrate_sale_items_add_gain_per_unit_if_missing():
+def migrate_sale_items_add_gain_per_unit_if_missing(con):
     """Añade gain_per_unit a sale_items si no existe."""
-    with get_conn() as con:
-        if _column_exists(con, "sale_items", "gain_per_unit"):
-            return
-        con.execute("ALTER TABLE sale_items ADD COLUMN gain_per_unit INTEGER NOT NULL DEFAULT 0;")
-        con.commit()
+    if _column_exists(con, "sale_items", "gain_per_unit"):
+        return
+    con.execute("ALTER TABLE sale_items ADD COLUMN gain_per_unit INTEGER NOT NULL DEFAULT 0;")
+
+
+def migrate_sales_add_sale_date_hour(con):
+    """
+    Añade 'sale_date' (YYYY-MM-DD local) y 'sale_hour' (0..23) a 'sales', con índice.
+    Permiten filtrar por rango de fechas sin envolver created_at en date(), que
+    impedía usar el índice. Se rellenan las ventas existentes y un trigger cubre
+    los INSERT que no los informen (cobrar_ticket sí los informa).
+    """
+    if not _column_exists(con, "sales", "sale_date"):
+        con.execute("ALTER TABLE sales ADD COLUMN sale_date TEXT;")
+    if not _column_exists(con, "sales", "sale_hour"):
+        con.execute("ALTER TABLE sales ADD COLUMN sale_hour INTEGER;")
+
+    con.execute("""
+        UPDATE sales
+           SET sale_date = date(created_at),
+               sale_hour = CAST(strftime('%H', created_at) AS INTEGER)
+         WHERE sale_date IS NULL AND created_at IS NOT NULL
+    """)
+    con.executescript("""
+    CREATE TRIGGER IF NOT EXISTS trg_sales_sale_date
+    AFTER INSERT ON sales
+    FOR EACH ROW
+    WHEN NEW.sale_date IS NULL
+    BEGIN
+        UPDATE sales
+           SET sale_date = date(COALESCE(NEW.created_at, datetime('now'))),
+               sale_hour = CAST(strftime('%H', COALESCE(NEW.created_at, datetime('now'))) AS INTEGER)
+         WHERE id = NEW.id;
+    END;
+
+    CREATE INDEX IF NOT EXISTS idx_sales_sale_date ON sales(sale_date, sale_hour);
+    """)
+
+
+def migrate_create_sales_rollups(con):
+    """
+    Crea las tablas resumen de ventas (por día, día×hora, día×producto y
+    día×medio de pago). Ver core/rollup_service.py.
+    Se llenan desde el historial en la migración 10, ya con todas sus columnas.
+    """
+    con.executescript("""
+    CREATE TABLE IF NOT EXISTS sales_daily (
+      sale_date TEXT PRIMARY KEY,
+      tickets INTEGER NOT NULL DEFAULT 0,
+      total INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS sales_hourly (
+      sale_date TEXT NOT NULL,
+      sale_hour INTEGER NOT NULL,
+      tickets INTEGER NOT NULL DEFAULT 0,
+      total INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (sale_date, sale_hour)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS sales_daily_products (
+      sale_date TEXT NOT NULL,
+      product_id INTEGER NOT NULL,
+      qty INTEGER NOT NULL DEFAULT 0,
+      revenue INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (sale_date, product_id)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS sales_daily_pay_methods (
+      sale_date TEXT NOT NULL,
+      pay_method TEXT NOT NULL,
+      tickets INTEGER NOT NULL DEFAULT 0,
+      total INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (sale_date, pay_method)
+    ) WITHOUT ROWID;
+    """)
+
+
+def migrate_sales_daily_products_add_profit_columns(con):
+    """
+    Añade a sales_daily_products las bases para calcular ganancia y margen
+    con el purchase_price actual (ver core/rollup_service.py) y recalcula los rollups.
+    """
+    columns = (
+        ("gain_profit", "INTEGER NOT NULL DEFAULT 0"),
+        ("cost_qty", "INTEGER NOT NULL DEFAULT 0"),
+        ("cost_revenue", "INTEGER NOT NULL DEFAULT 0"),
+        ("margin_lines", "INTEGER NOT NULL DEFAULT 0"),
+        ("gain_margin_sum", "REAL NOT NULL DEFAULT 0"),
+        ("cost_margin_lines", "INTEGER NOT NULL DEFAULT 0"),
+        ("cost_inv_price_sum", "REAL NOT NULL DEFAULT 0"),
+    )
+    for name, decl in columns:
+        if not _column_exists(con, "sales_daily_products", name):
+            con.execute(f"ALTER TABLE sales_daily_products ADD COLUMN {name} {decl};")
+
+    # Import local: rollup_service importa este módulo
+    from core.rollup_service import rebuild_rollups
+    rebuild_rollups(con)
+
+
+def migrate_create_products_fts(con):
+    """
+    Índice de búsqueda FTS5 sobre nombre y código de barras de products.
+    - unicode61 remove_diacritics: "comun" encuentra "Producto común".
+    - prefix='2 3': acelera las búsquedas por prefijo cortas (autocompletar).
+    Tabla de contenido externo (no duplica datos): los triggers la mantienen
+    sincronizada con products.
+    """
+    con.executescript("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+      name,
+      barcode,
+      content='products',
+      content_rowid='id',
+      tokenize='unicode61 remove_diacritics 2',
+      prefix='2 3'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_ai
+    AFTER INSERT ON products
+    BEGIN
+        INSERT INTO products_fts(rowid, name, barcode)
+        VALUES (NEW.id, NEW.name, NEW.barcode);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_ad
+    AFTER DELETE ON products
+    BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, barcode)
+        VALUES ('delete', OLD.id, OLD.name, OLD.barcode);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_fts_au
+    AFTER UPDATE OF name, barcode ON products
+    BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, barcode)
+        VALUES ('delete', OLD.id, OLD.name, OLD.barcode);
+        INSERT INTO products_fts(rowid, name, barcode)
+        VALUES (NEW.id, NEW.name, NEW.barcode);
+    END;
+
+    -- Relevancia: una coincidencia en el nombre pesa más que en el código
+    INSERT INTO products_fts(products_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)');
+    INSERT INTO products_fts(products_fts) VALUES ('rebuild');
+    """)
+
+
+def migrate_open_tickets_add_rev(con):
+    """
+    Versionado de open_tickets para que el POS pida solo lo que cambió:
+    - change_counters('open_tickets') sube con cada alta, cambio o baja.
+    - open_tickets.rev guarda el valor del contador en su último cambio.
+    Ver ticket_service.list_open_tickets_since().
+    """
+    con.executescript("""
+    CREATE TABLE IF NOT EXISTS change_counters (
+      name  TEXT PRIMARY KEY,
+      value INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO change_counters (name, value) VALUES ('open_tickets', 1);
+    """)
+    if not _column_exists(con, "open_tickets", "rev"):
+        con.execute("ALTER TABLE open_tickets ADD COLUMN rev INTEGER NOT NULL DEFAULT 1;")
+
+    con.executescript("""
+    CREATE TRIGGER IF NOT EXISTS trg_open_tickets_rev_ai
+    AFTER INSERT ON open_tickets
+    BEGIN
+        UPDATE change_counters SET value = value + 1 WHERE name = 'open_tickets';
+        UPDATE open_tickets
+           SET rev = (SELECT value FROM change_counters WHERE name = 'open_tickets')
+         WHERE id = NEW.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_open_tickets_rev_au
+    AFTER UPDATE OF name, created_at, updated_at, pay_method, pending_total ON open_tickets
+    BEGIN
+        UPDATE change_counters SET value = value + 1 WHERE name = 'open_tickets';
+        UPDATE open_tickets
+           SET rev = (SELECT value FROM change_counters WHERE name = 'open_tickets')
+         WHERE id = NEW.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_open_tickets_rev_ad
+    AFTER DELETE ON open_tickets
+    BEGIN
+        UPDATE change_counters SET value = value + 1 WHERE name = 'open_tickets';
+    END;
+    """)
+
+
+def migrate_open_ticket_items_unique_line(con):
+    """
+    Una sola línea por (ticket, producto, precio) para productos normales
+    (display_name NULL; las de Producto común pueden repetirse).
+    Primero junta las líneas duplicadas que ya existan sumando cantidades y
+    luego crea el índice único parcial que usa el UPSERT de ticket_service.add_items.
+    """
+    groups = con.execute("""
+        SELECT MIN(id), SUM(qty), ticket_id, product_id, unit_price
+          FROM open_ticket_items
+         WHERE display_name IS NULL
+      GROUP BY ticket_id, product_id, unit_price
+        HAVING COUNT(*) > 1
+    """).fetchall()
+    for keep_id, qty, ticket_id, product_id, unit_price in groups:
+        con.execute("UPDATE open_ticket_items SET qty=? WHERE id=?", (qty, keep_id))
+        con.execute("""
+            DELETE FROM open_ticket_items
+             WHERE ticket_id=? AND product_id=? AND unit_price=?
+               AND display_name IS NULL AND id<>?
+        """, (ticket_id, product_id, unit_price, keep_id))
+
+    con.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_open_ticket_items_line
+            ON open_ticket_items(ticket_id, product_id, unit_price)
+         WHERE display_name IS NULL
+    """)
+
+
+def migrate_sales_change_counters(con):
+    """
+    Versiones de los datos de ventas para el caché de reportes (report_service):
+    - 'sales' sube con cada venta nueva y con cualquier cambio de historial.
+    - 'sales_history' sube solo con lo que puede cambiar días ya cerrados:
+      ventas con fecha anterior a hoy (p. ej. importadas), ediciones o
+      borrados de ventas y líneas, y cambios de nombre o precio de compra de
+      productos (la ganancia usa el precio de compra actual).
+    Un reporte de un período cerrado sigue válido mientras no cambie 'sales_history'.
+    """
+    con.executescript("""
+    INSERT OR IGNORE INTO change_counters (name, value) VALUES ('sales', 1);
+    INSERT OR IGNORE INTO change_counters (name, value) VALUES ('sales_history', 1);
+
+    CREATE TRIGGER IF NOT EXISTS trg_sales_version_ai
+    AFTER INSERT ON sales
+    BEGIN
+        UPDATE change_counters SET value = value + 1
+         WHERE name = 'sales'
+            OR (name = 'sales_history'
+                AND (NEW.sale_date IS NULL OR NEW.sale_date < date('now', 'localtime')));
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_sales_version_au
+    AFTER UPDATE ON sales
+    BEGIN
+        UPDATE change_counters SET value = value + 1 WHERE name IN ('sales', 'sales_history');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_sales_version_ad
+    AFTER DELETE ON sales
+    BEGIN
+        UPDATE change_counters SET value = value + 1 WHERE name IN ('sales', 'sales_history');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_sale_items_version_au
+    AFTER UPDATE ON sale_items
+    BEGIN
+        UPDATE change_counters SET value = value + 1 WHERE name IN ('sales', 'sales_history');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_sale_items_version_ad
+    AFTER DELETE ON sale_items
+    BEGIN
+        UPDATE change_counters SET value = value + 1 WHERE name IN ('sales', 'sales_history');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_products_sales_version_au
+    AFTER UPDATE OF name, purchase_price ON products
+    WHEN OLD.name IS NOT NEW.name OR OLD.purchase_price IS NOT NEW.purchase_price
+    BEGIN
+        UPDATE change_counters SET value = value + 1 WHERE name IN ('sales', 'sales_history');
+    END;
+    """)
+
+
+# === Registro de migraciones ===
+# Cada entrada es (versión, función(con)). La versión aplicada se guarda en
+# PRAGMA user_version, así que cada paso corre una sola vez por base de datos.
+# Las funciones siguen siendo idempotentes: una BD anterior a este registro
+# (user_version=0) las ejecuta todas sin romper lo que ya tenía.
+# Para cambiar el esquema: agregar una entrada nueva al final, nunca editar las previas.
+MIGRATIONS = [
+    (1, _apply_base_schema),
+    (2, migrate_products_strip_format_active),
+    (3, migrate_sales_add_created_at_if_missing),
+    (4, migrate_open_ticket_items_add_display_name_if_missing),
+    (5, migrate_open_ticket_items_add_gain_per_unit_if_missing),
+    (6, migrate_sale_items_add_gain_per_unit_if_missing),
+    (7, _ensure_common_product),
+    (8, migrate_sales_add_sale_date_hour),
+    (9, migrate_create_sales_rollups),
+    (10, migrate_sales_daily_products_add_profit_columns),
+    (11, migrate_create_products_fts),
+    (12, migrate_open_tickets_add_rev),
+    (13, migrate_open_ticket_items_unique_line),
+    (14, migrate_sales_change_counters),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(con) -> int:
+    return int(con.execute("PRAGMA user_version").fetchone()[0])
 
 
 def bootstrap():
-    # Crear estructura base
+    """
+    Deja la BD al día. Con una BD ya migrada cuesta una sola lectura
+    (PRAGMA user_version); si no, aplica en orden las migraciones pendientes.
+    """
     with get_conn() as con:
-        con.executescript(DDL)
-        con.commit()
-    # Migraciones idempotentes
-    migrate_products_strip_format_active()
-    migrate_sales_add_created_at_if_missing()
-    migrate_open_ticket_items_add_display_name_if_missing()
-    migrate_open_ticket_items_add_gain_per_unit_if_missing()
-    migrate_sale_items_add_gain_per_unit_if_missing()
-    ensure_common_product_exists()
+        current = get_schema_version(con)
+        if current >= SCHEMA_VERSION:
+            return
+
+        for version, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            migrate(con)
+            # Si el proceso se corta antes de este PRAGMA, el paso se repite sin daño (es idempotente)
+            con.execute(f"PRAGMA user_version={int(version)}")
+            con.commit()
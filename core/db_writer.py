@@ -0,0 +1,185 @@
+# core/db_writer.py
+"""
+Escritor único de la BD.
+
+Un hilo en segundo plano, con su propia conexión (pin_thread), ejecuta en
+orden de llegada las funciones de escritura que le envían la UI u otros
+hilos. Así el hilo de la interfaz nunca espera el lock de escritura de
+SQLite.
+
+- submit(fn, *args, **kwargs) encola la llamada y devuelve un
+  concurrent.futures.Future con el resultado (o la excepción).
+- call(...) encola y espera el resultado (scripts y benchmarks). La UI no
+  lo usa: detrás puede haber un comando largo (una importación) y la
+  ventana quedaría congelada; encadena con submit() y un callback.
+- Comandos seguidos con la misma 'key' y una función 'merge' se combinan
+  mientras esperan: diez "+" sobre la misma línea terminan en un solo
+  change_item_qty(line_id, 10). Solo se combina con el último comando de la
+  cola, así el orden relativo de las escrituras nunca cambia.
+- Hay una sola cola y un solo hilo: las escrituras de un mismo ticket se
+  aplican en el orden en que se pidieron.
+
+Los servicios de core no cambian: se ejecutan tal cual en el hilo escritor,
+donde get_conn() entrega la conexión fijada del hilo.
+"""
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from core import db_manager
+
+
+def _run_into(future: Future, fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> None:
+    try:
+        result = fn(*args, **kwargs)
+    except BaseException as e:
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+
+
+class _Command:
+    __slots__ = ("fn", "args", "kwargs", "key", "merge", "future")
+
+    def __init__(self, fn, args, kwargs, key, merge):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.merge = merge
+        self.future = Future()
+
+
+class DbWriter:
+    """Cola FIFO de escrituras atendida por un único hilo con conexión propia."""
+
+    def __init__(self, name: str = "db-writer"):
+        self.name = name
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._busy = False
+        self._stopping = False
+        self.stats = {"submitted": 0, "executed": 0, "coalesced": 0}
+
+    # -------- Ciclo de vida --------
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Termina lo ya encolado y detiene el hilo."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def in_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    # -------- Envío --------
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        key: Optional[Hashable] = None,
+        merge: Optional[Callable[[Tuple, Tuple], Tuple]] = None,
+        **kwargs,
+    ) -> Future:
+        """
+        Encola fn(*args, **kwargs) y devuelve su Future.
+        Si el último comando en espera tiene la misma 'key' y la misma función,
+        sus argumentos posicionales pasan a ser merge(args_previos, args) y se
+        devuelve el mismo Future (ambos llamadores ven el resultado combinado).
+        """
+        if self.in_writer_thread():
+            # Llamado desde un comando en curso: encolar lo dejaría esperando para siempre
+            future = Future()
+            _run_into(future, fn, args, kwargs)
+            return future
+
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("El escritor de la base de datos está detenido.")
+            self.stats["submitted"] += 1
+            if key is not None and merge is not None and self._queue:
+                tail = self._queue[-1]
+                if tail.key == key and tail.fn is fn and tail.kwargs == kwargs:
+                    tail.args = merge(tail.args, args)
+                    self.stats["coalesced"] += 1
+                    return tail.future
+            cmd = _Command(fn, args, kwargs, key, merge)
+            self._queue.append(cmd)
+            self._cond.notify_all()
+        self.start()
+        return cmd.future
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Como submit(), pero espera y devuelve el resultado (o relanza el error)."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def pending(self) -> int:
+        """Comandos encolados más el que se está ejecutando."""
+        with self._cond:
+            return len(self._queue) + (1 if self._busy else 0)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que la cola quede vacía. Devuelve False si venció 'timeout'."""
+        if self.in_writer_thread():
+            return True
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    # -------- Hilo escritor --------
+    def _run(self) -> None:
+        manager = db_manager.get_manager()
+        manager.pin_thread()
+        try:
+            while True:
+                with self._cond:
+                    while not self._queue and not self._stopping:
+                        self._cond.wait()
+                    if not self._queue:
+                        return
+                    cmd = self._queue.popleft()
+                    self._busy = True
+                try:
+                    # Un Future cancelado antes de empezar no se ejecuta
+                    if cmd.future.set_running_or_notify_cancel():
+                        _run_into(cmd.future, cmd.fn, cmd.args, cmd.kwargs)
+                finally:
+                    with self._cond:
+                        self._busy = False
+                        self.stats["executed"] += 1
+                        self._cond.notify_all()
+        finally:
+            manager.unpin_thread()
+
+
+_writer: Optional[DbWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> DbWriter:
+    """Escritor compartido por toda la aplicación (el hilo arranca con el primer comando)."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DbWriter()
+        return _writer
+
+
+def shutdown(timeout: Optional[float] = None) -> None:
+    """Vacía la cola y detiene el hilo escritor. Se llama al cerrar la aplicación."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop(timeout)
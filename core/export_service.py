@@ -0,0 +1,147 @@
+# core/export_service.py
+"""
+Exportaciones a CSV o Excel (.xlsx) en streaming.
+
+Las filas salen del cursor de a EXPORT_CHUNK (fetchmany) y se escriben a
+medida que llegan: exportar un año de líneas de venta no necesita el año
+entero en memoria. El formato se elige por la extensión del archivo; el
+.xlsx usa openpyxl en modo write-only (las filas no quedan en memoria).
+
+Todas las consultas corren en una conexión de solo lectura con foto fija
+(get_read_conn(snapshot=True)): un cobro durante la exportación no la
+descuadra.
+"""
+import csv
+from typing import Any, Dict, Iterable, Iterator, Sequence
+
+from core.db_manager import get_read_conn
+
+EXPORT_CHUNK = 2000
+
+PRODUCTS_HEADER = ["Nombre", "PrecioVenta", "PrecioCompra", "CodigoBarra"]
+
+# Reportes exportables desde los rollups: nombre -> (hoja, cabecera, SQL con :d1/:d2)
+REPORT_EXPORTS: Dict[str, Any] = {
+    "daily": ("Por día", ["Fecha", "Ventas", "Total"], """
+        SELECT sale_date, tickets, total
+        FROM sales_daily
+        WHERE sale_date BETWEEN :d1 AND :d2
+        ORDER BY sale_date
+    """),
+    "monthly": ("Por mes", ["Mes", "Ventas", "Total"], """
+        SELECT substr(sale_date, 1, 7) AS ym, SUM(tickets), SUM(total)
+        FROM sales_daily
+        WHERE sale_date BETWEEN :d1 AND :d2
+        GROUP BY ym
+        ORDER BY ym
+    """),
+    "products": ("Por producto", ["Fecha", "Producto", "Cantidad", "Total"], """
+        SELECT r.sale_date, COALESCE(p.name, ''), r.qty, r.revenue
+        FROM sales_daily_products r
+        LEFT JOIN products p ON p.id = r.product_id
+        WHERE r.sale_date BETWEEN :d1 AND :d2
+        ORDER BY r.sale_date, p.name
+    """),
+    "pay_methods": ("Por medio de pago", ["Fecha", "Medio de pago", "Ventas", "Total"], """
+        SELECT sale_date, pay_method, tickets, total
+        FROM sales_daily_pay_methods
+        WHERE sale_date BETWEEN :d1 AND :d2
+        ORDER BY sale_date, pay_method
+    """),
+}
+
+
+def _to_date_str(d) -> str:
+    """Acepta QDate o str y devuelve 'YYYY-MM-DD'."""
+    if hasattr(d, "toString"):
+        return d.toString("yyyy-MM-dd")
+    return str(d)
+
+
+def _fetch_iter(con, sql: str, params=()) -> Iterator[Sequence[Any]]:
+    """Filas de la consulta de a EXPORT_CHUNK, sin fetchall()."""
+    cur = con.execute(sql, params)
+    while True:
+        chunk = cur.fetchmany(EXPORT_CHUNK)
+        if not chunk:
+            return
+        yield from chunk
+
+
+def _write_csv(path: str, header: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    # Mismo formato que el resto de la app: ';' y latin-1 (amigable para Excel)
+    count = 0
+    with open(path, "w", newline="", encoding="latin-1") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _write_xlsx(path: str, sheet: str, header: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ValueError("Para exportar a Excel se necesita el paquete openpyxl.")
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet)
+    ws.append(list(header))
+    count = 0
+    for row in rows:
+        ws.append(list(row))
+        count += 1
+    wb.save(path)
+    return count
+
+
+def _export(path: str, sheet: str, header: Sequence[str], sql: str, params=()) -> int:
+    """Escribe la consulta en 'path' (.xlsx o CSV). Devuelve las filas escritas."""
+    with get_read_conn(snapshot=True) as con:
+        rows = _fetch_iter(con, sql, params)
+        if path.lower().endswith(".xlsx"):
+            return _write_xlsx(path, sheet, header, rows)
+        return _write_csv(path, header, rows)
+
+
+def export_products(path: str) -> int:
+    """Productos con las columnas que espera import_products_csv."""
+    return _export(path, "Productos", PRODUCTS_HEADER, """
+        SELECT name,
+               COALESCE(sale_price, 0),
+               COALESCE(purchase_price, 0),
+               COALESCE(barcode, '')
+        FROM products
+        ORDER BY name COLLATE NOCASE
+    """)
+
+
+def export_sale_lines(path: str, date_from, date_to) -> int:
+    """Detalle de ventas (una fila por línea vendida) del rango, por fecha y venta."""
+    d1, d2 = _to_date_str(date_from), _to_date_str(date_to)
+    return _export(
+        path,
+        "Ventas",
+        ["Venta", "Fecha", "Medio de pago", "Producto", "Cantidad", "PrecioUnit", "Total"],
+        """
+        SELECT s.id, s.created_at, COALESCE(s.pay_method, ''),
+               COALESCE(p.name, ''), si.qty, si.unit_price, si.line_total
+        FROM sales s
+        JOIN sale_items si ON si.sale_id = s.id
+        LEFT JOIN products p ON p.id = si.product_id
+        WHERE s.sale_date BETWEEN ? AND ?
+        ORDER BY s.sale_date, s.id, si.id   -- sigue idx_sales_sale_date: solo ordena dentro de cada día
+        """,
+        (d1, d2),
+    )
+
+
+def export_report(path: str, report: str, date_from, date_to) -> int:
+    """Un reporte de REPORT_EXPORTS ('daily', 'monthly', 'products', 'pay_methods') del rango."""
+    if report not in REPORT_EXPORTS:
+        raise ValueError(f"Reporte desconocido: {report}")
+    sheet, header, sql = REPORT_EXPORTS[report]
+    d1, d2 = _to_date_str(date_from), _to_date_str(date_to)
+    return _export(path, sheet, header, sql, {"d1": d1, "d2": d2})
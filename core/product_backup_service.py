@@ -1,7 +1,7 @@
 # core/product_backup_service.py
 import os
-import csv
-from core.db_manager import get_conn
+from core import csv_chunks, export_service, product_catalog
+from core.db_manager import get_conn, get_read_conn
 
 
 def export_products_csv(path: str):
@@ -9,34 +9,230 @@ def export_products_csv(path: str):
     Exporta la tabla de productos a un CSV.
     Formato columnas:
         Nombre;PrecioVenta;PrecioCompra;CodigoBarra
+    Se escribe en streaming (ver core/export_service.py).
     """
-    # Leemos los productos desde la BD
+    export_service.export_products(path)
+
+
+# Filas por executemany al importar
+IMPORT_CHUNK = 1000
+
+_INSERT_SQL = """
+    INSERT INTO products (id, name, sale_price, purchase_price, barcode)
+    VALUES (?, ?, ?, ?, ?)
+"""
+_UPDATE_SQL = """
+    UPDATE products
+    SET name = ?, sale_price = ?, purchase_price = ?, barcode = ?
+    WHERE id = ?
+"""
+
+
+def _is_header(row) -> bool:
+    header = [c.strip().lower() for c in row]
+    return bool(header and "nombre" in header[0])
+
+
+def _parse_row(row):
+    """
+    Convierte una fila en (name, sale_price, purchase_price, barcode).
+    Devuelve None si la fila está vacía y False si hay que omitirla por error.
+    """
+    if not row or all(not c.strip() for c in row):
+        return None
+
+    name = (row[0] or "").strip()
+    if not name:
+        return False
+
+    sale_price = 0
+    purchase_price = 0
+    barcode = None
+    try:
+        if len(row) > 1:
+            sale_price = int((row[1] or "0").strip() or 0)
+        if len(row) > 2:
+            purchase_price = int((row[2] or "0").strip() or 0)
+        if len(row) > 3:
+            bc = (row[3] or "").strip()
+            barcode = bc if bc else None
+    except Exception:
+        # si hay valores no numéricos, se salta la fila
+        return False
+    return name, sale_price, purchase_price, barcode
+
+
+def _parse_products_chunk(path: str, start: int, end: int):
+    """Trozo del CSV para csv_chunks.parse_file: [(línea, _parse_row(fila))], sin las vacías."""
+    reader = csv_chunks.read_rows(path, start, end)
+    items = []
+    for line, row in csv_chunks.numbered(reader):
+        if start == 0 and line == 1 and _is_header(row):
+            continue
+        parsed = _parse_row(row)
+        if parsed is not None:
+            items.append((line, parsed))
+    return items, reader.line_num
+
+
+class ProductIndex:
+    """
+    Códigos y nombres de products en memoria, para resolver cada fila sin
+    consultar la BD. Se mantiene al día con lo que la importación va
+    escribiendo, así cada fila ve lo que dejaron las anteriores (como antes).
+    """
+
+    def __init__(self, products):
+        """'products': filas (id, name, barcode) de la tabla products."""
+        self.by_barcode = {}
+        self.by_name = {}
+        self.current = {}
+        self.next_id = 1
+        for pid, name, barcode in products:
+            self._add(pid, name, barcode)
+            self.next_id = max(self.next_id, pid + 1)
+
+    def _add(self, pid, name, barcode):
+        self.current[pid] = (name, barcode)
+        self.by_name.setdefault(name, set()).add(pid)
+        if barcode is not None:
+            self.by_barcode[barcode] = pid
+
+    def _remove(self, pid):
+        name, barcode = self.current.pop(pid)
+        ids = self.by_name[name]
+        ids.discard(pid)
+        if not ids:
+            del self.by_name[name]
+        if barcode is not None and self.by_barcode.get(barcode) == pid:
+            del self.by_barcode[barcode]
+
+    def find(self, name, barcode):
+        """Primero por código y después por nombre (el de menor id, como el SELECT original)."""
+        if barcode and barcode in self.by_barcode:
+            return self.by_barcode[barcode]
+        ids = self.by_name.get(name)
+        return min(ids) if ids else None
+
+    def update(self, pid, name, barcode):
+        self._remove(pid)
+        self._add(pid, name, barcode)
+
+    def insert(self, name, barcode) -> int:
+        """Reserva el id del producto nuevo (no hay otros escritores: BEGIN IMMEDIATE)."""
+        pid = self.next_id
+        self.next_id += 1
+        self._add(pid, name, barcode)
+        return pid
+
+
+def read_products_csv(path: str, workers=None, progress=None, cancel=None):
+    """
+    Lee y valida el CSV de productos sin tocar la BD (se puede llamar desde
+    cualquier hilo, sin el lock de escritura). Un archivo grande se parsea en
+    paralelo con hasta 'workers' procesos (ver core/csv_chunks.py).
+
+    Devuelve la lista de filas en el orden del archivo, como (línea,
+    _parse_row(fila)) (False = fila a omitir), o None si se activó el
+    threading.Event 'cancel' (se revisa entre trozos del archivo).
+    Tras cada trozo llama a progress(filas, bytes_leídos, bytes_totales).
+    """
+    rows = []
+    total_bytes = os.path.getsize(path)
+
+    def chunk_done(done_bytes):
+        if progress is not None:
+            progress(len(rows), done_bytes, total_bytes)
+
+    for item in csv_chunks.parse_file(path, _parse_products_chunk, workers,
+                                      cancel=cancel, progress=chunk_done):
+        rows.append(item)
+    if cancel is not None and cancel.is_set():
+        return None
+    return rows
+
+
+def import_parsed_products(rows, chunk_size: int = IMPORT_CHUNK, progress=None, cancel=None):
+    """
+    Escribe las filas de read_products_csv con la regla de import_products_csv.
+
+    Las filas se resuelven contra índices en memoria (ProductIndex); las
+    escrituras van en lotes de executemany de hasta 'chunk_size' filas, todo
+    en una transacción (si algo falla no queda una importación a medias).
+
+    Cada 'chunk_size' filas:
+      - llama a progress(filas, filas, filas_totales) si se indicó;
+      - si el threading.Event 'cancel' está activo, deshace todo lo importado.
+
+    Devuelve los contadores de import_products_csv.
+    No se puede llamar con una transacción abierta en la conexión del hilo:
+    no confirma trabajo ajeno (RuntimeError).
+    """
+    created = 0
+    updated = 0
+    skipped = 0
+    n = 0
+
     with get_conn() as con:
-        cur = con.cursor()
-        cur.execute("""
-            SELECT name,
-                   COALESCE(sale_price, 0),
-                   COALESCE(purchase_price, 0),
-                   COALESCE(barcode, '')
-            FROM products
-            ORDER BY name COLLATE NOCASE
-        """)
-        rows = cur.fetchall()
-
-    # Escribimos CSV en codificación amigable para Excel
-    with open(path, "w", newline="", encoding="latin-1") as f:
-        writer = csv.writer(f, delimiter=";")
-        writer.writerow(["Nombre", "PrecioVenta", "PrecioCompra", "CodigoBarra"])
-        for name, sale_price, purchase_price, barcode in rows:
-            writer.writerow([
-                name or "",
-                int(sale_price or 0),
-                int(purchase_price or 0),
-                barcode or ""
-            ])
-
-
-def import_products_csv(path: str):
+        if con.in_transaction:
+            raise RuntimeError("import_parsed_products necesita su propia transacción; hay otra abierta.")
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            index = ProductIndex(con.execute("SELECT id, name, barcode FROM products"))
+            # Lote de sentencias del mismo tipo, en el orden del archivo
+            batch_sql, batch = None, []
+
+            def flush():
+                if batch:
+                    con.executemany(batch_sql, batch)
+                    batch.clear()
+
+            for n, (_, parsed) in enumerate(rows, 1):
+                if n % chunk_size == 0:
+                    if cancel is not None and cancel.is_set():
+                        con.rollback()
+                        return {"created": 0, "updated": 0, "skipped": 0, "cancelled": True}
+                    if progress is not None:
+                        progress(n, n, len(rows))
+
+                if parsed is False:
+                    skipped += 1
+                    continue
+
+                name, sale_price, purchase_price, barcode = parsed
+                product_id = index.find(name, barcode)
+                if product_id:
+                    index.update(product_id, name, barcode)
+                    sql, params = _UPDATE_SQL, (name, sale_price, purchase_price, barcode, product_id)
+                    updated += 1
+                else:
+                    product_id = index.insert(name, barcode)
+                    sql, params = _INSERT_SQL, (product_id, name, sale_price, purchase_price, barcode)
+                    created += 1
+
+                if sql is not batch_sql or len(batch) >= chunk_size:
+                    flush()
+                    batch_sql = sql
+                batch.append(params)
+
+            flush()
+            if cancel is not None and cancel.is_set():
+                con.rollback()
+                return {"created": 0, "updated": 0, "skipped": 0, "cancelled": True}
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+
+    if progress is not None:
+        progress(n, len(rows), len(rows))
+    # Una sola invalidación del catálogo al final de toda la importación
+    product_catalog.invalidate()
+    return {"created": created, "updated": updated, "skipped": skipped, "cancelled": False}
+
+
+def import_products_csv(path: str, chunk_size: int = IMPORT_CHUNK, progress=None, cancel=None,
+                        workers=None):
     """
     Importa productos desde un CSV con columnas:
         Nombre;PrecioVenta;PrecioCompra;CodigoBarra
@@ -47,93 +243,111 @@ def import_products_csv(path: str):
       - Si no se encuentra, se CREA un nuevo producto.
     No elimina productos existentes.
 
+    Primero lee y valida el archivo (read_products_csv), sin el lock de
+    escritura; recién después abre la transacción y escribe
+    (import_parsed_products). progress(filas, hecho, total) cuenta bytes
+    leídos mientras se lee y filas escritas mientras se escribe; 'cancel' se
+    revisa en ambas fases.
+
     Devuelve un dict con contadores:
-        {"created": n, "updated": m, "skipped": k}
+        {"created": n, "updated": m, "skipped": k, "cancelled": bool}
+    (si se canceló, los contadores quedan en 0: no se guardó nada).
     """
-    created = 0
-    updated = 0
-    skipped = 0
+    rows = read_products_csv(path, workers, progress=progress, cancel=cancel)
+    if rows is None:
+        return {"created": 0, "updated": 0, "skipped": 0, "cancelled": True}
+    return import_parsed_products(rows, chunk_size, progress=progress, cancel=cancel)
 
-    # Leemos CSV
-    with open(path, "r", newline="", encoding="latin-1") as f:
-        reader = csv.reader(f, delimiter=";")
-        rows = list(reader)
 
-    if not rows:
-        return {"created": 0, "updated": 0, "skipped": 0}
+def preview_import_products_csv(path: str, workers=None):
+    """Vista previa de import_products_csv para el archivo (ver preview_parsed_products)."""
+    return preview_parsed_products(read_products_csv(path, workers))
 
-    # Detectar y saltar cabecera si la tiene
-    start_index = 0
-    header = [c.strip().lower() for c in rows[0]]
-    if header and "nombre" in header[0]:
-        start_index = 1
 
-    with get_conn() as con:
-        cur = con.cursor()
-
-        for row in rows[start_index:]:
-            if not row or all(not c.strip() for c in row):
-                continue
-
-            # Normalizamos columnas según lo esperado
-            try:
-                name = (row[0] or "").strip()
-            except IndexError:
-                skipped += 1
-                continue
-
-            if not name:
-                skipped += 1
-                continue
-
-            sale_price = 0
-            purchase_price = 0
-            barcode = None
-
-            try:
-                if len(row) > 1:
-                    sale_price = int((row[1] or "0").strip() or 0)
-                if len(row) > 2:
-                    purchase_price = int((row[2] or "0").strip() or 0)
-                if len(row) > 3:
-                    bc = (row[3] or "").strip()
-                    barcode = bc if bc else None
-            except Exception:
-                # si hay valores no numéricos, se salta la fila
-                skipped += 1
-                continue
-
-            # Buscar producto existente
-            product_id = None
-
-            if barcode:
-                cur.execute("SELECT id FROM products WHERE barcode=?", (barcode,))
-                r = cur.fetchone()
-                if r:
-                    product_id = r[0]
-
-            if not product_id:
-                cur.execute("SELECT id FROM products WHERE name=?", (name,))
-                r = cur.fetchone()
-                if r:
-                    product_id = r[0]
-
-            if product_id:
-                # Actualizar
-                cur.execute("""
-                    UPDATE products
-                    SET name = ?, sale_price = ?, purchase_price = ?, barcode = ?
-                    WHERE id = ?
-                """, (name, sale_price, purchase_price, barcode, product_id))
-                updated += 1
-            else:
-                # Crear nuevo
-                cur.execute("""
-                    INSERT INTO products (name, sale_price, purchase_price, barcode)
-                    VALUES (?, ?, ?, ?)
-                """, (name, sale_price, purchase_price, barcode))
-                created += 1
-
-        con.commit()
-
-    return {"created": created, "updated": updated, "skipped": skipped}
+def preview_parsed_products(rows):
+    """
+    Simulación de import_parsed_products sobre las filas de read_products_csv:
+    calcula qué haría sin escribir nada. Se resuelve en memoria con la misma
+    regla e índices (ProductIndex), con una sola lectura de products. 'line'
+    es el número de línea en el archivo.
+
+    Devuelve:
+        {
+          "new":       [{"line", "name", "sale_price", "purchase_price", "barcode"}],
+          "changed":   [{"line", "id", "name", "sale_price", "purchase_price", "barcode",
+                         "old_name", "old_sale_price", "old_purchase_price", "old_barcode"}],
+          "unchanged": int,          # productos existentes que quedan igual
+          "skipped":   [line, ...],  # filas que se omitirían por error
+          "barcode_collisions": [{"line", "barcode", "name", "other"}],
+          "duplicate_names":    [{"name", "lines": [line, ...]}],
+        }
+    "new" y "changed" traen el estado final (si el archivo repite un producto,
+    gana la última fila). Una colisión de código es una fila cuyo código ya
+    pertenece (en la BD o en una fila anterior) a un producto con otro nombre
+    ('other'): la importación lo renombraría.
+    """
+    with get_read_conn() as con:
+        before = {
+            pid: (name, sale_price, purchase_price, barcode)
+            for pid, name, sale_price, purchase_price, barcode in con.execute(
+                "SELECT id, name, sale_price, purchase_price, barcode FROM products"
+            )
+        }
+    index = ProductIndex((pid, v[0], v[3]) for pid, v in before.items())
+
+    final = {}              # id -> (línea, name, sale_price, purchase_price, barcode)
+    lines_by_name = {}
+    skipped = []
+    collisions = []
+
+    for line, parsed in rows:
+        if parsed is False:
+            skipped.append(line)
+            continue
+
+        name, sale_price, purchase_price, barcode = parsed
+        lines_by_name.setdefault(name, []).append(line)
+
+        owner = index.by_barcode.get(barcode) if barcode else None
+        if owner is not None and index.current[owner][0] != name:
+            collisions.append({
+                "line": line, "barcode": barcode, "name": name,
+                "other": index.current[owner][0],
+            })
+
+        product_id = index.find(name, barcode)
+        if product_id:
+            index.update(product_id, name, barcode)
+        else:
+            product_id = index.insert(name, barcode)
+        final[product_id] = (line, name, sale_price, purchase_price, barcode)
+
+    new, changed, unchanged = [], [], 0
+    for pid, (line, name, sale_price, purchase_price, barcode) in final.items():
+        old = before.get(pid)
+        if old is None:
+            new.append({
+                "line": line, "name": name, "sale_price": sale_price,
+                "purchase_price": purchase_price, "barcode": barcode,
+            })
+        elif old == (name, sale_price, purchase_price, barcode):
+            unchanged += 1
+        else:
+            changed.append({
+                "line": line, "id": pid, "name": name, "sale_price": sale_price,
+                "purchase_price": purchase_price, "barcode": barcode,
+                "old_name": old[0], "old_sale_price": old[1],
+                "old_purchase_price": old[2], "old_barcode": old[3],
+            })
+
+    return {
+        "new": sorted(new, key=lambda c: c["line"]),
+        "changed": sorted(changed, key=lambda c: c["line"]),
+        "unchanged": unchanged,
+        "skipped": skipped,
+        "barcode_collisions": collisions,
+        "duplicate_names": [
+            {"name": name, "lines": lines}
+            for name, lines in lines_by_name.items() if len(lines) > 1
+        ],
+    }
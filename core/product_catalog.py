@@ -0,0 +1,172 @@
+# core/product_catalog.py
+"""
+Catálogo de productos en memoria, compartido por todo el proceso.
+
+Se carga una sola vez desde la BD y se guarda en arreglos compactos
+ordenados por nombre. Cada vez que cambian los productos (crear, editar,
+eliminar, importar CSV) se llama a invalidate(), que sube un contador de
+versión; la siguiente consulta recarga el catálogo.
+
+Así get_product (usado en cada línea que agrega el POS) y las búsquedas
+exactas por código de barras (lector) o por nombre no tocan la BD.
+La búsqueda por texto usa el índice FTS5 (product_service.search_products).
+
+invalidate() solo avisa dentro de este proceso: un producto creado desde
+otra terminal o proceso no está en el catálogo. Por eso, si un id, un
+código o un nombre no aparece, se busca esa fila en la BD y se agrega al catálogo vigente.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+from core.db_manager import get_conn
+
+_lock = threading.Lock()
+_version = 0          # sube con cada invalidate()
+_loaded = None        # _Snapshot vigente (o None si nunca se cargó)
+
+
+class _Snapshot:
+    """Arreglos paralelos con todos los productos, ordenados por nombre."""
+
+    __slots__ = (
+        "version", "ids", "names", "barcodes",
+        "sale_prices", "purchase_prices", "pos_by_id", "pos_by_barcode", "sorted_count",
+    )
+
+    def __init__(self, version: int, rows):
+        self.version = version
+        self.ids = array("q")
+        self.names: List[str] = []
+        self.barcodes: List[str] = []          # "" si no tiene
+        self.sale_prices = array("q")
+        self.purchase_prices = array("q")
+        for pid, name, sale_price, purchase_price, barcode in rows:
+            self.ids.append(int(pid))
+            self.names.append(name or "")
+            self.barcodes.append(barcode or "")
+            self.sale_prices.append(int(sale_price or 0))
+            self.purchase_prices.append(int(purchase_price or 0))
+        self.pos_by_id = {pid: i for i, pid in enumerate(self.ids)}
+        # barcode es UNIQUE en la BD: un código -> un producto
+        self.pos_by_barcode = {bc: i for i, bc in enumerate(self.barcodes) if bc}
+        # names[:sorted_count] sigue ordenado; add() agrega detrás
+        self.sorted_count = len(self.ids)
+
+    def add(self, row) -> int:
+        """Agrega una fila leída de la BD (al final, fuera del orden por nombre)."""
+        pid, name, sale_price, purchase_price, barcode = row
+        i = len(self.ids)
+        self.ids.append(int(pid))
+        self.names.append(name or "")
+        self.barcodes.append(barcode or "")
+        self.sale_prices.append(int(sale_price or 0))
+        self.purchase_prices.append(int(purchase_price or 0))
+        self.pos_by_id[int(pid)] = i
+        if barcode:
+            self.pos_by_barcode[barcode] = i
+        return i
+
+    def product(self, i: int) -> Dict[str, Any]:
+        return {
+            "id": self.ids[i],
+            "name": self.names[i],
+            "sale_price": self.sale_prices[i],
+            "purchase_price": self.purchase_prices[i],
+            "barcode": self.barcodes[i] or None,
+        }
+
+
+def invalidate() -> None:
+    """Marca el catálogo como desactualizado (se recarga en la próxima consulta)."""
+    global _version
+    with _lock:
+        _version += 1
+
+
+def version() -> int:
+    """Versión actual del catálogo (cambia con cada invalidate())."""
+    return _version
+
+
+def _snapshot() -> _Snapshot:
+    global _loaded
+    snap = _loaded
+    if snap is not None and snap.version == _version:
+        return snap
+
+    with _lock:
+        if _loaded is not None and _loaded.version == _version:
+            return _loaded
+        wanted = _version
+        with get_conn() as con:
+            rows = con.execute("""
+                SELECT id, name, sale_price, purchase_price, barcode
+                FROM products
+                ORDER BY name
+            """).fetchall()
+        _loaded = _Snapshot(wanted, rows)
+        return _loaded
+
+
+def _fetch_missing(snap: _Snapshot, where: str, value) -> Optional[Dict[str, Any]]:
+    """Busca en la BD una fila que no está en el catálogo y la agrega a 'snap'."""
+    with get_conn() as con:
+        row = con.execute(f"""
+            SELECT id, name, sale_price, purchase_price, barcode
+            FROM products
+            WHERE {where} = ?
+            ORDER BY id
+            LIMIT 1
+        """, (value,)).fetchone()
+    if row is None:
+        return None
+    with _lock:
+        # Otro hilo pudo agregarla mientras tanto
+        i = snap.pos_by_id.get(int(row[0]))
+        if i is None:
+            i = snap.add(row)
+    return snap.product(i)
+
+
+def get_product(product_id: int) -> Optional[Dict[str, Any]]:
+    """Producto por id; si no está en el catálogo se busca en la BD."""
+    snap = _snapshot()
+    i = snap.pos_by_id.get(int(product_id))
+    if i is not None:
+        return snap.product(i)
+    return _fetch_missing(snap, "id", int(product_id))
+
+
+def get_by_barcode(barcode: str) -> Optional[Dict[str, Any]]:
+    """
+    Producto cuyo código de barras es exactamente 'barcode' (O(1)). Si no
+    está en el catálogo se busca en la BD (índice único de barcode).
+    """
+    barcode = (barcode or "").strip()
+    if not barcode:
+        return None
+    snap = _snapshot()
+    i = snap.pos_by_barcode.get(barcode)
+    if i is not None:
+        return snap.product(i)
+    return _fetch_missing(snap, "barcode", barcode)
+
+
+def get_by_name(name: str) -> Optional[Dict[str, Any]]:
+    """
+    Producto cuyo nombre es exactamente 'name' (el de menor id si se repite):
+    búsqueda binaria sobre los nombres ordenados, más los agregados después.
+    Si no está en el catálogo se busca en la BD.
+    """
+    snap = _snapshot()
+    matches = []
+    i = bisect_left(snap.names, name, 0, snap.sorted_count)
+    while i < snap.sorted_count and snap.names[i] == name:
+        matches.append(i)
+        i += 1
+    matches.extend(j for j in range(snap.sorted_count, len(snap.ids)) if snap.names[j] == name)
+    if matches:
+        return snap.product(min(matches, key=lambda j: snap.ids[j]))
+    return _fetch_missing(snap, "name", name)
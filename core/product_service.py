@@ -1,6 +1,10 @@
 # core/product_service.py
+import re
 from typing import List, Dict, Optional, Any
+from core import product_catalog
 from core.db_manager import get_conn
+from core.rollup_service import remove_product as remove_product_from_rollups
+from core.ticket_service import _apply_ticket_delta
 
 
 def create_product(
@@ -21,7 +25,8 @@ def create_product(
             VALUES (?, ?, ?, ?)
         """, (name.strip(), int(sale_price), int(purchase_price), barcode))
         con.commit()
-        return cur.lastrowid
+    product_catalog.invalidate()
+    return cur.lastrowid
 
 
 def update_product(product_id: int, **fields) -> int:
@@ -49,26 +54,95 @@ def update_product(product_id: int, **fields) -> int:
         cur = con.cursor()
         cur.execute(f"UPDATE products SET {', '.join(sets)} WHERE id=?", values)
         con.commit()
-        return cur.rowcount
+    product_catalog.invalidate()
+    return cur.rowcount
 
 
 def get_product(product_id: int) -> Optional[Dict[str, Any]]:
+    """Producto por id, servido desde el catálogo en memoria."""
+    return product_catalog.get_product(product_id)
+
+
+def get_product_by_barcode(barcode: str) -> Optional[Dict[str, Any]]:
+    """Producto con ese código de barras exacto (para el lector): catálogo y, si falta, la BD."""
+    return product_catalog.get_by_barcode(barcode)
+
+
+def get_product_by_name(name: str) -> Optional[Dict[str, Any]]:
+    """Producto con ese nombre exacto: catálogo y, si falta, la BD."""
+    return product_catalog.get_by_name(name)
+
+
+_FTS_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts_query(q: str) -> str:
+    """
+    Convierte el texto del usuario en una consulta FTS5: cada palabra se
+    busca por prefijo y todas deben aparecer ("ipa lat" -> "ipa"* "lat"*).
+    Las comillas evitan que el texto se interprete como sintaxis FTS.
+    """
+    return " ".join(f'"{tok}"*' for tok in _FTS_TOKEN.findall(q))
+
+
+def search_products(q: str = "", limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Búsqueda para el POS y la pantalla de productos, sobre el índice FTS5:
+    - cada palabra de 'q' coincide por prefijo con el nombre o el código,
+      sin distinguir mayúsculas ni tildes ("comun" encuentra "Producto común");
+    - orden por relevancia (pesa más el nombre) y luego por nombre;
+    - si 'q' son solo dígitos, después van los productos cuyo código los
+      contiene en cualquier posición ("0001" encuentra "7800001..."), como
+      hacía el LIKE de antes;
+    - 'limit' se aplica en la consulta.
+    Sin texto devuelve todos los productos ordenados por nombre.
+    """
+    q = (q or "").strip()
+    match = _fts_query(q)
+    lim = -1 if limit is None else int(limit)
     with get_conn() as con:
         cur = con.cursor()
-        cur.execute("""
-            SELECT id, name, sale_price, purchase_price, barcode
-            FROM products WHERE id=?
-        """, (product_id,))
-        r = cur.fetchone()
-        if not r:
-            return None
-        return {
-            "id": r[0],
-            "name": r[1],
-            "sale_price": r[2],
-            "purchase_price": r[3],
-            "barcode": r[4],
-        }
+        if match:
+            cur.execute("""
+                SELECT p.id, p.name, p.sale_price, p.purchase_price, p.barcode
+                FROM products_fts
+                JOIN products p ON p.id = products_fts.rowid
+                WHERE products_fts MATCH ?
+                ORDER BY products_fts.rank, p.name
+                LIMIT ?
+            """, (match, lim))
+        elif q:
+            # Solo símbolos (p. ej. "#"): no hay palabras que buscar en FTS
+            cur.execute("""
+                SELECT id, name, sale_price, purchase_price, barcode
+                FROM products
+                WHERE name LIKE '%'||?||'%' OR IFNULL(barcode,'') LIKE '%'||?||'%'
+                ORDER BY name
+                LIMIT ?
+            """, (q, q, lim))
+        else:
+            cur.execute("""
+                SELECT id, name, sale_price, purchase_price, barcode
+                FROM products
+                ORDER BY name
+                LIMIT ?
+            """, (lim,))
+        rows = cur.fetchall()
+        if match and q.isdigit() and (lim < 0 or len(rows) < lim):
+            # Parte de un código: FTS solo encuentra prefijos
+            cur.execute("""
+                SELECT id, name, sale_price, purchase_price, barcode
+                FROM products
+                WHERE barcode LIKE '%'||?||'%'
+                  AND id NOT IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)
+                ORDER BY name
+                LIMIT ?
+            """, (q, match, lim if lim < 0 else lim - len(rows)))
+            rows += cur.fetchall()
+        return [
+            {"id": r[0], "name": r[1], "sale_price": r[2], "purchase_price": r[3], "barcode": r[4]}
+            for r in rows
+        ]
 
 
 def list_products(q: str = "") -> List[Dict[str, Any]]:
@@ -120,6 +194,7 @@ def ensure_demo_products():
                 ("Pilsner Lata 473ml",  2100, 950,  "780000000006"),
             ])
             con.commit()
+            product_catalog.invalidate()
 
 
 def delete_product(product_id: int):
@@ -157,14 +232,16 @@ def delete_product(product_id: int):
             raise ValueError("El producto no existe o ya fue eliminado.")
 
         con.commit()
+    product_catalog.invalidate()
 
 
 def force_delete_product(product_id: int):
     """
     Elimina el producto incluso si tiene ventas o está en tickets.
     ATENCIÓN:
-    - Borra las líneas de ese producto en tickets abiertos.
-    - Borra las líneas de detalle en sale_items.
+    - Borra las líneas de ese producto en tickets abiertos (y descuenta su
+      importe del pending_total de cada ticket).
+    - Borra las líneas de detalle en sale_items (y su rollup por producto).
     - Los totales de 'sales' se mantienen, pero sin ese detalle.
     """
     pid = int(product_id)
@@ -172,10 +249,19 @@ def force_delete_product(product_id: int):
     with get_conn() as con:
         cur = con.cursor()
         try:
-            # Borrar de tickets abiertos
+            # Borrar de tickets abiertos, con el ajuste de total por ticket
+            deltas = cur.execute("""
+                SELECT ticket_id, -SUM(qty * unit_price)
+                  FROM open_ticket_items
+                 WHERE product_id=?
+              GROUP BY ticket_id
+            """, (pid,)).fetchall()
             cur.execute("DELETE FROM open_ticket_items WHERE product_id=?", (pid,))
-            # Borrar de líneas de venta
+            for ticket_id, delta in deltas:
+                _apply_ticket_delta(con, ticket_id, int(delta or 0))
+            # Borrar de líneas de venta (y de su resumen por producto)
             cur.execute("DELETE FROM sale_items WHERE product_id=?", (pid,))
+            remove_product_from_rollups(con, pid)
             # Borrar el producto
             cur.execute("DELETE FROM products WHERE id=?", (pid,))
 
@@ -186,3 +272,4 @@ def force_delete_product(product_id: int):
         except Exception:
             con.rollback()
             raise
+    product_catalog.invalidate()
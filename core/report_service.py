@@ -1,5 +1,11 @@
-from typing import List, Dict, Any
-from core.db_manager import get_conn
+import functools
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
+
+from core import db_manager
+from core.db_manager import get_read_conn
+from core.time_utils import today_local_str
 
 def _to_date_str(d) -> str:
     """Acepta QDate o str y devuelve 'YYYY-MM-DD'."""
@@ -7,99 +13,145 @@ def _to_date_str(d) -> str:
         return d.toString("yyyy-MM-dd")
     return str(d)
 
+# Todas las consultas usan conexiones de solo lectura (db_manager.get_read_conn):
+# no compiten con el hilo escritor y pueden correr en un hilo de trabajo.
+
+# -------- Caché de resultados --------
+# Clave: (base de datos, función, argumentos). Cada entrada guarda las versiones de
+# change_counters leídas antes de calcularla (ver migrate_sales_change_counters):
+# - un rango que termina antes de hoy (período cerrado) sigue válido mientras
+#   no cambie 'sales_history';
+# - un rango que incluye hoy se recalcula también tras cada venta ('sales').
+CACHE_SIZE = 64
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0}
+
+
+def _sales_versions(con) -> Tuple[int, int]:
+    rows = dict(con.execute(
+        "SELECT name, value FROM change_counters WHERE name IN ('sales', 'sales_history')"
+    ).fetchall())
+    return int(rows.get("sales", 0)), int(rows.get("sales_history", 0))
+
+
+def _copy(value):
+    """Copia superficial, para que quien recibe el resultado no altere el caché."""
+    if isinstance(value, list):
+        return [dict(v) if isinstance(v, dict) else v for v in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def _cached(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        args = tuple(_to_date_str(a) if hasattr(a, "toString") else a for a in args)
+        key = (db_manager.DB_PATH, fn.__name__, args, tuple(sorted(kwargs.items())))
+        last_day = max((a for a in args if isinstance(a, str)), default="")
+        with get_read_conn() as con:
+            # Versiones antes de calcular: si entra una venta a mitad de camino,
+            # la próxima consulta ve otra versión y recalcula.
+            sales_v, history_v = _sales_versions(con)
+            is_open = last_day >= today_local_str()
+            with _cache_lock:
+                entry = _cache.get(key)
+                if entry is not None:
+                    value, e_sales, e_history, e_open = entry
+                    if e_history == history_v and (not e_open or e_sales == sales_v):
+                        _cache.move_to_end(key)
+                        cache_stats["hits"] += 1
+                        return _copy(value)
+                cache_stats["misses"] += 1
+            value = fn(*args, **kwargs)
+        with _cache_lock:
+            _cache[key] = (value, sales_v, history_v, is_open)
+            _cache.move_to_end(key)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+        return _copy(value)
+    return wrapper
+
+
+def clear_cache() -> None:
+    """Vacía el caché de reportes (p. ej. al cambiar de base de datos)."""
+    with _cache_lock:
+        _cache.clear()
+
+
 def list_sales(date_from, date_to) -> List[Dict[str, Any]]:
     d1, d2 = _to_date_str(date_from), _to_date_str(date_to)
-    with get_conn() as con:
+    with get_read_conn() as con:
         cur = con.cursor()
         cur.execute("""
             SELECT id, created_at, IFNULL(total,0)
             FROM sales
-            WHERE date(created_at) BETWEEN ? AND ?
-            ORDER BY datetime(created_at) DESC, id DESC   -- más nuevas primero
+            WHERE sale_date BETWEEN ? AND ?
+            ORDER BY created_at DESC, id DESC   -- más nuevas primero
         """, (d1, d2))
         return [
             {"id": r[0], "created_at": r[1], "total": int(r[2] or 0)}
             for r in cur.fetchall()
         ]
 
+@_cached
 def summary(date_from, date_to) -> Dict[str, Any]:
     """
-    Resumen de ventas y ganancias en el rango.
-    Usa gain_per_unit si está disponible; si es 0, usa unit_price - purchase_price.
+    Resumen de ventas y ganancias en el rango, en una sola consulta sobre los rollups.
+    Usa gain_per_unit si está disponible; si es 0, usa unit_price - purchase_price
+    (purchase_price actual del producto). avg_margin es el promedio de los márgenes
+    de cada línea con ingreso > 0. Ver core/rollup_service.py para las columnas.
     """
     d1, d2 = _to_date_str(date_from), _to_date_str(date_to)
 
-    with get_conn() as con:
+    with get_read_conn() as con:
         cur = con.cursor()
         cur.execute("""
             SELECT
-                si.qty,
-                si.unit_price,
-                COALESCE(p.purchase_price, 0) AS purchase_price,
-                COALESCE(si.gain_per_unit, 0) AS gain_per_unit
-            FROM sales s
-            JOIN sale_items si ON si.sale_id = s.id
-            JOIN products p ON p.id = si.product_id
-            WHERE date(s.created_at) BETWEEN ? AND ?
-        """, (d1, d2))
-
-        total_revenue = 0
-        total_profit = 0
-        margins_sum = 0.0
-        margin_count = 0
-
-        for qty, unit_price, purchase_price, gain_per_unit in cur.fetchall():
-            qty = int(qty or 0)
-            unit_price = int(unit_price or 0)
-            purchase_price = int(purchase_price or 0)
-            gain_per_unit = int(gain_per_unit or 0)
-
-            line_revenue = qty * unit_price
-            total_revenue += line_revenue
-
-            if gain_per_unit != 0:
-                # Caso producto común con ganancia definida en la UI
-                line_profit = qty * gain_per_unit
-            else:
-                # Caso producto normal: ganancia por diferencia precio - costo
-                line_profit = qty * (unit_price - purchase_price)
-
-            total_profit += line_profit
-
-            if line_revenue > 0:
-                margin = line_profit / line_revenue
-                margins_sum += margin
-                margin_count += 1
-
-        avg_ticket = 0
-        tickets = 0
-
-        # Si ya tienes lógica para tickets/avg_ticket aparte, puedes mantenerla;
-        # aquí lo dejo en 0 por simplicidad o puedes combinarlo con tu código actual.
-
-        avg_margin = (margins_sum / margin_count) if margin_count > 0 else 0.0
-
-        return {
-            "total": total_revenue,
-            "tickets": tickets,
-            "avg_ticket": avg_ticket,
-            "profit": total_profit,
-            "avg_margin": avg_margin,
-        }
-
-
+                IFNULL(SUM(r.revenue), 0),
+                IFNULL(SUM(r.gain_profit + r.cost_revenue
+                           - COALESCE(p.purchase_price, 0) * r.cost_qty), 0),
+                TOTAL(r.gain_margin_sum + r.cost_margin_lines
+                      - COALESCE(p.purchase_price, 0) * r.cost_inv_price_sum),
+                IFNULL(SUM(r.margin_lines), 0),
+                (SELECT IFNULL(SUM(d.tickets), 0) FROM sales_daily d
+                  WHERE d.sale_date BETWEEN :d1 AND :d2),
+                (SELECT IFNULL(SUM(d.total), 0) FROM sales_daily d
+                  WHERE d.sale_date BETWEEN :d1 AND :d2)
+            FROM sales_daily_products r
+            JOIN products p ON p.id = r.product_id
+            WHERE r.sale_date BETWEEN :d1 AND :d2
+        """, {"d1": d1, "d2": d2})
+        revenue, profit, margins_sum, margin_count, tickets, sales_total = cur.fetchone()
+
+    tickets = int(tickets or 0)
+    margin_count = int(margin_count or 0)
+    avg_ticket = round(int(sales_total or 0) / tickets) if tickets > 0 else 0
+    avg_margin = (margins_sum / margin_count) if margin_count > 0 else 0.0
+
+    return {
+        "total": int(revenue or 0),
+        "tickets": tickets,
+        "avg_ticket": avg_ticket,
+        "profit": int(profit or 0),
+        "avg_margin": avg_margin,
+    }
+
+
+@_cached
 def top_products(date_from, date_to, limit:int=10) -> List[Dict[str, Any]]:
+    """Productos más vendidos del rango, desde el rollup diario por producto."""
     d1, d2 = _to_date_str(date_from), _to_date_str(date_to)
-    with get_conn() as con:
+    with get_read_conn() as con:
         cur = con.cursor()
         cur.execute("""
             SELECT p.name,
-                   SUM(si.qty)               AS total_qty,
-                   SUM(si.qty*si.unit_price) AS revenue
-            FROM sale_items si
-            JOIN sales    s ON s.id = si.sale_id
-            JOIN products p ON p.id = si.product_id
-            WHERE date(s.created_at) BETWEEN ? AND ?
+                   SUM(r.qty)     AS total_qty,
+                   SUM(r.revenue) AS revenue
+            FROM sales_daily_products r
+            JOIN products p ON p.id = r.product_id
+            WHERE r.sale_date BETWEEN ? AND ?
             GROUP BY p.id, p.name
             ORDER BY revenue DESC
             LIMIT ?
@@ -109,54 +161,69 @@ def top_products(date_from, date_to, limit:int=10) -> List[Dict[str, Any]]:
             for r in cur.fetchall()
         ]
         
+@_cached
 def daily_totals(date_from, date_to) -> List[Dict[str, Any]]:
-    """Devuelve totales por día en el rango (orden cronológico asc)."""
+    """Devuelve totales por día en el rango (orden cronológico asc), desde el rollup diario."""
     def _to_date_str(d) -> str:
         if hasattr(d, "toString"):
             return d.toString("yyyy-MM-dd")
         return str(d)
 
     d1, d2 = _to_date_str(date_from), _to_date_str(date_to)
-    with get_conn() as con:
+    with get_read_conn() as con:
         cur = con.cursor()
         cur.execute("""
-            SELECT date(created_at) AS d, IFNULL(SUM(total),0) AS t
-            FROM sales
-            WHERE date(created_at) BETWEEN ? AND ?
-            GROUP BY date(created_at)
+            SELECT sale_date AS d, total AS t
+            FROM sales_daily
+            WHERE sale_date BETWEEN ? AND ?
             ORDER BY d ASC
         """, (d1, d2))
         return [{"date": r[0], "total": int(r[1] or 0)} for r in cur.fetchall()]
 
+@_cached
 def hourly_totals(day) -> List[Dict[str, Any]]:
     """Totales por hora para un día (YYYY-MM-DD). Devuelve 0..23 con huecos en 0 si no hay ventas."""
     d = day.toString("yyyy-MM-dd") if hasattr(day, "toString") else str(day)
     # base vacía 0..23
     base = {f"{h:02d}": 0 for h in range(24)}
-    with get_conn() as con:
+    with get_read_conn() as con:
         cur = con.cursor()
         cur.execute("""
-            SELECT strftime('%H', created_at) AS hh, IFNULL(SUM(total),0)
-            FROM sales
-            WHERE date(created_at)=?
-            GROUP BY hh
-            ORDER BY hh
+            SELECT sale_hour AS hh, total
+            FROM sales_hourly
+            WHERE sale_date=?
+            ORDER BY sale_hour
         """, (d,))
         for hh, tot in cur.fetchall():
-            base[hh] = int(tot or 0)
+            base[f"{int(hh):02d}"] = int(tot or 0)
     return [{"label": k, "total": v} for k, v in base.items()]
 
+@_cached
 def monthly_totals(date_from, date_to) -> List[Dict[str, Any]]:
-    """Totales por mes (AAAA-MM) para el rango."""
+    """Totales por mes (AAAA-MM) para el rango, sumando el rollup diario."""
     def _to(d): return d.toString("yyyy-MM-dd") if hasattr(d, "toString") else str(d)
     d1, d2 = _to(date_from), _to(date_to)
-    with get_conn() as con:
+    with get_read_conn() as con:
         cur = con.cursor()
         cur.execute("""
-            SELECT strftime('%Y-%m', created_at) AS ym, IFNULL(SUM(total),0)
-            FROM sales
-            WHERE date(created_at) BETWEEN ? AND ?
+            SELECT substr(sale_date, 1, 7) AS ym, IFNULL(SUM(total),0)
+            FROM sales_daily
+            WHERE sale_date BETWEEN ? AND ?
             GROUP BY ym
             ORDER BY ym ASC
         """, (d1, d2))
         return [{"label": r[0], "total": int(r[1] or 0)} for r in cur.fetchall()]
+
+
+def load_report(date_from, date_to, top_limit: int = 10) -> Dict[str, Any]:
+    """
+    Resumen y top de productos del rango leídos de una misma foto de la BD,
+    así ambos cuadran aunque se registre una venta mientras se calculan:
+        {"summary": summary(...), "top": top_products(...)}
+    Pensado para correr fuera del hilo de la UI (ver ui/reports/actions.py).
+    """
+    with get_read_conn(snapshot=True):
+        return {
+            "summary": summary(date_from, date_to),
+            "top": top_products(date_from, date_to, limit=top_limit),
+        }
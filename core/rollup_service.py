@@ -0,0 +1,177 @@
+# core/rollup_service.py
+"""
+Tablas resumen (rollups) de ventas, para que los reportes no recorran
+sales/sale_items completos:
+
+    sales_daily              (sale_date)               -> tickets, total
+    sales_hourly             (sale_date, sale_hour)    -> tickets, total
+    sales_daily_products     (sale_date, product_id)   -> qty, revenue y bases de ganancia/margen
+    sales_daily_pay_methods  (sale_date, pay_method)   -> tickets, total
+
+sales_service.cobrar_ticket las actualiza en la misma transacción de la venta
+(apply_sale); las importaciones de historial, por rango de ids (apply_sales).
+rebuild_rollups() las recalcula desde el historial completo.
+
+Uso por consola:
+    python -m core.rollup_service
+"""
+from core.db_manager import get_conn
+
+ROLLUP_TABLES = (
+    "sales_daily",
+    "sales_hourly",
+    "sales_daily_products",
+    "sales_daily_pay_methods",
+)
+
+# Cada consulta agrega un conjunto de ventas; {where} acota cuáles.
+# El "WHERE" es obligatorio: SQLite lo exige para usar ON CONFLICT tras un SELECT.
+_DAILY_SQL = """
+    INSERT INTO sales_daily (sale_date, tickets, total)
+    SELECT s.sale_date, COUNT(*), IFNULL(SUM(s.total), 0)
+      FROM sales s
+     WHERE {where}
+  GROUP BY s.sale_date
+    ON CONFLICT(sale_date) DO UPDATE
+       SET tickets = tickets + excluded.tickets,
+           total   = total + excluded.total
+"""
+
+_HOURLY_SQL = """
+    INSERT INTO sales_hourly (sale_date, sale_hour, tickets, total)
+    SELECT s.sale_date, s.sale_hour, COUNT(*), IFNULL(SUM(s.total), 0)
+      FROM sales s
+     WHERE {where}
+  GROUP BY s.sale_date, s.sale_hour
+    ON CONFLICT(sale_date, sale_hour) DO UPDATE
+       SET tickets = tickets + excluded.tickets,
+           total   = total + excluded.total
+"""
+
+# Ganancia y margen dependen del purchase_price ACTUAL del producto, así que no
+# se guardan ya calculados: se guardan separados según la regla de summary()
+# (gain_per_unit != 0 manda; si es 0 se usa unit_price - purchase_price):
+#   gain_profit        = SUM(qty * gain_per_unit)          líneas con ganancia fija
+#   cost_qty           = SUM(qty)                          líneas sin ganancia fija
+#   cost_revenue       = SUM(qty * unit_price)             líneas sin ganancia fija
+#   margin_lines       = N° de líneas con ingreso > 0
+#   gain_margin_sum    = SUM(gain_per_unit / unit_price)   ganancia fija, ingreso > 0
+#   cost_margin_lines  = N° de líneas sin ganancia fija con ingreso > 0
+#   cost_inv_price_sum = SUM(1 / unit_price)               ídem
+# Con purchase_price = c:
+#   ganancia    = gain_profit + cost_revenue - c * cost_qty
+#   suma margen = gain_margin_sum + cost_margin_lines - c * cost_inv_price_sum
+_PRODUCTS_SQL = """
+    INSERT INTO sales_daily_products (
+        sale_date, product_id, qty, revenue,
+        gain_profit, cost_qty, cost_revenue,
+        margin_lines, gain_margin_sum, cost_margin_lines, cost_inv_price_sum
+    )
+    SELECT s.sale_date, si.product_id,
+           SUM(si.qty),
+           SUM(si.qty * si.unit_price),
+           SUM(CASE WHEN IFNULL(si.gain_per_unit, 0) != 0 THEN si.qty * si.gain_per_unit ELSE 0 END),
+           SUM(CASE WHEN IFNULL(si.gain_per_unit, 0) = 0 THEN si.qty ELSE 0 END),
+           SUM(CASE WHEN IFNULL(si.gain_per_unit, 0) = 0 THEN si.qty * si.unit_price ELSE 0 END),
+           SUM(si.qty * si.unit_price > 0),
+           TOTAL(CASE WHEN IFNULL(si.gain_per_unit, 0) != 0 AND si.qty * si.unit_price > 0
+                      THEN CAST(si.gain_per_unit AS REAL) / si.unit_price END),
+           SUM(IFNULL(si.gain_per_unit, 0) = 0 AND si.qty * si.unit_price > 0),
+           TOTAL(CASE WHEN IFNULL(si.gain_per_unit, 0) = 0 AND si.qty * si.unit_price > 0
+                      THEN 1.0 / si.unit_price END)
+      FROM sale_items si
+      JOIN sales s ON s.id = si.sale_id
+     WHERE {where}
+  GROUP BY s.sale_date, si.product_id
+    ON CONFLICT(sale_date, product_id) DO UPDATE
+       SET qty                = qty + excluded.qty,
+           revenue            = revenue + excluded.revenue,
+           gain_profit        = gain_profit + excluded.gain_profit,
+           cost_qty           = cost_qty + excluded.cost_qty,
+           cost_revenue       = cost_revenue + excluded.cost_revenue,
+           margin_lines       = margin_lines + excluded.margin_lines,
+           gain_margin_sum    = gain_margin_sum + excluded.gain_margin_sum,
+           cost_margin_lines  = cost_margin_lines + excluded.cost_margin_lines,
+           cost_inv_price_sum = cost_inv_price_sum + excluded.cost_inv_price_sum
+"""
+
+_PAY_METHODS_SQL = """
+    INSERT INTO sales_daily_pay_methods (sale_date, pay_method, tickets, total)
+    SELECT s.sale_date, s.pay_method, COUNT(*), IFNULL(SUM(s.total), 0)
+      FROM sales s
+     WHERE {where}
+  GROUP BY s.sale_date, s.pay_method
+    ON CONFLICT(sale_date, pay_method) DO UPDATE
+       SET tickets = tickets + excluded.tickets,
+           total   = total + excluded.total
+"""
+
+_ALL_SQL = (_DAILY_SQL, _HOURLY_SQL, _PRODUCTS_SQL, _PAY_METHODS_SQL)
+
+
+def apply_sale(con, sale_id: int) -> None:
+    """
+    Suma una venta recién creada a los rollups.
+    No hace commit: debe llamarse dentro de la transacción que creó la venta.
+    """
+    for sql in _ALL_SQL:
+        con.execute(sql.format(where="s.id = ?"), (sale_id,))
+
+
+def apply_sales(con, first_id: int, last_id: int) -> None:
+    """
+    Suma a los rollups las ventas con id entre first_id y last_id (inclusive),
+    agregadas de una vez: para cargas masivas (core/sales_import_service.py).
+    No hace commit, igual que apply_sale.
+    """
+    for sql in _ALL_SQL:
+        con.execute(sql.format(where="s.id BETWEEN ? AND ?"), (first_id, last_id))
+
+
+def rebuild_rollups(con=None) -> None:
+    """
+    Vacía los rollups y los recalcula desde sales/sale_items, en una sola
+    transacción. Sube la versión 'sales_history' (y 'sales'): los reportes en
+    caché (report_service) se calcularon con los rollups anteriores.
+    No se puede llamar con una transacción abierta en 'con': no confirma
+    trabajo ajeno (RuntimeError).
+    """
+    if con is None:
+        with get_conn() as con:
+            rebuild_rollups(con)
+            return
+
+    if con.in_transaction:
+        raise RuntimeError("rebuild_rollups necesita su propia transacción; hay otra abierta.")
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        for table in ROLLUP_TABLES:
+            con.execute(f"DELETE FROM {table}")
+        for sql in _ALL_SQL:
+            con.execute(sql.format(where="s.sale_date IS NOT NULL"))
+        # Durante las migraciones puede correr antes de que exista change_counters
+        if con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_counters'"
+        ).fetchone():
+            con.execute("""
+                UPDATE change_counters SET value = value + 1
+                 WHERE name IN ('sales', 'sales_history')
+            """)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+
+def remove_product(con, product_id: int) -> None:
+    """Quita un producto de los rollups (se usa al borrar sus líneas de venta)."""
+    con.execute("DELETE FROM sales_daily_products WHERE product_id=?", (product_id,))
+
+
+if __name__ == "__main__":
+    from core.db_manager import bootstrap, close_all
+
+    bootstrap()
+    rebuild_rollups()
+    close_all()
+    print("Rollups de ventas recalculados.")
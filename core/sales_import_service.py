@@ -0,0 +1,231 @@
+# core/sales_import_service.py
+"""
+Importación del historial de ventas de otro POS.
+
+CSV (';', latin-1), una fila por línea vendida:
+    Venta;FechaHora;Producto;CodigoBarra;Cantidad;PrecioUnit;MedioPago
+
+- Venta: identificador de la venta en el sistema anterior; las filas con el
+  mismo valor forman una venta (no necesitan ir seguidas). Fecha y medio de
+  pago se toman de su primera fila.
+- FechaHora: 'AAAA-MM-DD HH:MM[:SS]' (hora local).
+- Producto/CodigoBarra: se busca como en la importación de productos (código
+  y luego nombre); si no existe se crea con PrecioUnit como precio de venta.
+- MedioPago: opcional ('efectivo' si viene vacío).
+
+El archivo se parsea y valida en paralelo (core/csv_chunks.py) y cada trozo
+se escribe a medida que llega, en una sola transacción y por lotes, con los
+rollups sumados de una vez al final (rollup_service.apply_sales). En memoria
+queda un estado corto por venta (id, fecha, medio de pago, total), no las
+líneas: el consumo crece con el número de ventas, unos cientos de bytes
+por venta. Una venta con alguna fila inválida se omite entera (también los
+productos que solo ella habría creado); los errores se informan por número
+de línea.
+No detecta si el mismo archivo ya se importó antes.
+
+Uso por consola:
+    python -m core.sales_import_service historial.csv
+"""
+from datetime import datetime
+from typing import Any, Dict
+
+from core import csv_chunks, product_catalog
+from core.db_manager import get_conn
+from core.product_backup_service import ProductIndex
+from core.rollup_service import apply_sales
+
+# Filas por executemany
+IMPORT_CHUNK = 5000
+
+
+def _parse_line(row):
+    """
+    Valida una fila. Devuelve (error, venta, datos): error es None si la fila
+    es válida y datos = (created_at, name, barcode, qty, unit_price, pay_method).
+    """
+    cells = [c.strip() for c in row] + [""] * (7 - len(row))
+    ref, when, name, barcode, qty, price, pay = cells[:7]
+    if not ref:
+        return "Falta el número de venta", None, None
+    try:
+        created_at = datetime.fromisoformat(when).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return f"Fecha/hora inválida: '{when}'", ref, None
+    if not name:
+        return "Falta el nombre del producto", ref, None
+    try:
+        qty = int(qty)
+    except ValueError:
+        return f"Cantidad inválida: '{qty}'", ref, None
+    if qty <= 0:
+        return f"Cantidad inválida: '{qty}'", ref, None
+    try:
+        price = int(price or 0)
+    except ValueError:
+        return f"Precio inválido: '{price}'", ref, None
+    if price < 0:
+        return f"Precio inválido: '{price}'", ref, None
+    return None, ref, (created_at, name, barcode or None, qty, price, pay.lower() or "efectivo")
+
+
+def _parse_sales_chunk(path: str, start: int, end: int):
+    """Trozo del CSV para csv_chunks.parse_file: [(línea, _parse_line(fila))], sin las vacías."""
+    reader = csv_chunks.read_rows(path, start, end)
+    items = []
+    for line, row in csv_chunks.numbered(reader):
+        if not row or all(not c.strip() for c in row):
+            continue
+        if start == 0 and line == 1 and "venta" in row[0].strip().lower():
+            continue
+        items.append((line, _parse_line(row)))
+    return items, reader.line_num
+
+
+class _SaleState:
+    """Lo que se guarda de cada venta mientras se importan sus líneas."""
+
+    __slots__ = ("id", "created_at", "pay", "total", "lines")
+
+    def __init__(self, sale_id: int, created_at: str, pay: str):
+        self.id = sale_id
+        self.created_at = created_at
+        self.pay = pay
+        self.total = 0
+        self.lines = 0
+
+
+def _insert_sales(con, rows) -> None:
+    con.executemany("""
+        INSERT INTO sales (id, subtotal, total, pay_method, status,
+                           created_at, sale_date, sale_hour, datetime)
+        VALUES (?, ?, ?, ?, 'pagada', ?, ?, ?, ?)
+    """, rows)
+    rows.clear()
+
+
+def import_sales_csv(path: str, workers=None) -> Dict[str, Any]:
+    """
+    Importa el historial de ventas del CSV (ver el formato arriba).
+    'workers': procesos para parsear (None = uno por CPU; 1 = sin procesos).
+
+    Las líneas se escriben a medida que llegan los trozos parseados; en
+    memoria queda solo un estado corto por venta (ver _SaleState). Las ventas
+    se insertan al final, con su total, y las líneas de una venta que resultó
+    inválida se borran antes de confirmar. No se puede llamar con una
+    transacción abierta en la conexión del hilo (RuntimeError).
+
+    Devuelve:
+        {"sales": n, "lines": m, "products_created": k,
+         "skipped_sales": j, "errors": [(línea, mensaje), ...]}
+    con los errores en el orden del archivo.
+    """
+    errors = []
+    bad_refs = set()
+    sales = {}      # venta -> _SaleState
+    products_created = 0
+
+    with get_conn() as con:
+        if con.in_transaction:
+            raise RuntimeError("import_sales_csv necesita su propia transacción; hay otra abierta.")
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            # Las líneas se insertan antes que su venta: la FK se revisa al confirmar
+            con.execute("PRAGMA defer_foreign_keys = ON")
+            index = ProductIndex(con.execute("SELECT id, name, barcode FROM products"))
+            first_product_id = index.next_id
+            (first_id,) = con.execute("SELECT IFNULL(MAX(id), 0) + 1 FROM sales").fetchone()
+            next_id = first_id
+            product_rows, item_rows = [], []
+
+            def flush():
+                # Productos nuevos primero: las líneas los referencian
+                con.executemany("""
+                    INSERT INTO products (id, name, sale_price, purchase_price, barcode)
+                    VALUES (?, ?, ?, 0, ?)
+                """, product_rows)
+                con.executemany("""
+                    INSERT INTO sale_items (sale_id, product_id, qty, unit_price, line_total, gain_per_unit)
+                    VALUES (?, ?, ?, ?, ?, 0)
+                """, item_rows)
+                product_rows.clear()
+                item_rows.clear()
+
+            for line, (error, ref, data) in csv_chunks.parse_file(path, _parse_sales_chunk, workers):
+                if error is not None:
+                    errors.append((line, error))
+                    if ref is not None:
+                        bad_refs.add(ref)
+                    continue
+                if ref in bad_refs:
+                    continue
+                created_at, name, barcode, qty, price, pay = data
+                sale = sales.get(ref)
+                if sale is None:
+                    sale = sales[ref] = _SaleState(next_id, created_at, pay)
+                    next_id += 1
+                product_id = index.find(name, barcode)
+                if not product_id:
+                    product_id = index.insert(name, barcode)
+                    product_rows.append((product_id, name, price, barcode))
+                    products_created += 1
+                item_rows.append((sale.id, product_id, qty, price, qty * price))
+                sale.total += qty * price
+                sale.lines += 1
+                if len(item_rows) >= IMPORT_CHUNK:
+                    flush()
+            flush()
+
+            # Ventas con alguna fila inválida (quizás después de otras válidas): fuera
+            skipped = [sales.pop(ref).id for ref in bad_refs if ref in sales]
+            for start in range(0, len(skipped), IMPORT_CHUNK):
+                ids = skipped[start:start + IMPORT_CHUNK]
+                con.execute(
+                    f"DELETE FROM sale_items WHERE sale_id IN ({','.join('?' * len(ids))})", ids
+                )
+            if skipped and products_created:
+                # Productos nuevos que solo usaban las ventas omitidas
+                products_created -= con.execute("""
+                    DELETE FROM products
+                     WHERE id >= ?
+                       AND id NOT IN (SELECT product_id FROM sale_items WHERE sale_id >= ?)
+                """, (first_product_id, first_id)).rowcount
+
+            sale_rows = []
+            for sale in sales.values():
+                # 'datetime' (columna heredada) también con la hora de la venta, no la de hoy
+                sale_rows.append((sale.id, sale.total, sale.total, sale.pay, sale.created_at,
+                                  sale.created_at[:10], int(sale.created_at[11:13]), sale.created_at))
+                if len(sale_rows) >= IMPORT_CHUNK:
+                    _insert_sales(con, sale_rows)
+            _insert_sales(con, sale_rows)
+            if sales:
+                apply_sales(con, first_id, next_id - 1)
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+
+    if products_created:
+        product_catalog.invalidate()
+    return {
+        "sales": len(sales),
+        "lines": sum(sale.lines for sale in sales.values()),
+        "products_created": products_created,
+        "skipped_sales": len(bad_refs),
+        "errors": errors,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    from core.db_manager import bootstrap, close_all
+
+    bootstrap()
+    result = import_sales_csv(sys.argv[1])
+    close_all()
+    print(f"Ventas importadas: {result['sales']} ({result['lines']} líneas)")
+    print(f"Productos creados: {result['products_created']}")
+    print(f"Ventas omitidas por errores: {result['skipped_sales']}")
+    for line, message in result["errors"]:
+        print(f"  línea {line}: {message}")
@@ -1,99 +1,105 @@
 # core/sales_service.py
 from typing import List, Dict, Any, Optional
-from core.db_manager import get_conn
-from core.time_utils import now_local_str
+from core.db_manager import get_conn, get_read_conn
+from core.rollup_service import apply_sale
+from core.time_utils import now_local_str, today_local_str
 
 
-def cobrar_ticket(ticket_id: int) -> int:
+def cobrar_ticket(ticket_id: int) -> Dict[str, Any]:
     """
-    Convierte un ticket abierto en una venta:
-    - Crea cabecera en sales (subtotal=SUM, total=subtotal, pay_method del ticket, status=pagada, created_at local)
-    - Crea sale_items con qty, unit_price, line_total y gain_per_unit
+    Convierte un ticket abierto en una venta, en una sola transacción IMMEDIATE:
+    - Crea cabecera en sales (subtotal=SUM, total=subtotal, pay_method del ticket, status=pagada,
+      created_at local y sus columnas indexadas sale_date/sale_hour)
+    - Copia las líneas a sale_items con un solo INSERT ... SELECT
+      (qty, unit_price, line_total y gain_per_unit)
+    - Suma la venta a los rollups de reportes
     - Borra ticket e ítems abiertos
-    Devuelve sale_id.
+    Devuelve {"sale_id", "subtotal", "total", "pay_method", "lines", "units", "created_at"}.
+    No se puede llamar con una transacción abierta en la conexión del hilo:
+    el cobro no confirma trabajo ajeno (RuntimeError).
     """
     with get_conn() as con:
-        cur = con.cursor()
-
-        # Obtener ticket
-        cur.execute("""
-            SELECT id, COALESCE(pay_method,''), COALESCE(pending_total,0)
-            FROM open_tickets WHERE id=?
-        """, (ticket_id,))
-        t = cur.fetchone()
-        if not t:
-            raise ValueError("Ticket no existe.")
-        _, pay_method, _ = t
-
-        # Ítems del ticket (incluyendo gain_per_unit)
-        cur.execute("""
-            SELECT i.product_id, i.qty, i.unit_price, i.gain_per_unit
-            FROM open_ticket_items i
-            WHERE i.ticket_id=?
-        """, (ticket_id,))
-        items = cur.fetchall()
-        if not items:
-            raise ValueError("El ticket no tiene ítems.")
-
-        # Calcular subtotal/total (sin descuentos)
-        cur.execute("""
-            SELECT IFNULL(SUM(qty * unit_price), 0)
-            FROM open_ticket_items
-            WHERE ticket_id=?
-        """, (ticket_id,))
-        subtotal = cur.fetchone()[0] or 0
-        total = subtotal
-
-        # Insertar venta (incluye created_at en hora local)
-        created_at = now_local_str()
-        cur.execute("""
-            INSERT INTO sales (subtotal, total, pay_method, status, created_at)
-            VALUES (?, ?, ?, 'pagada', ?)
-        """, (subtotal, total, (pay_method or "efectivo"), created_at))
-        sale_id = cur.lastrowid
-
-        # Insertar detalle (incluyendo gain_per_unit)
-        for (product_id, qty, unit_price, gain_per_unit) in items:
-            qty = int(qty)
-            unit_price = int(unit_price)
-            gain_per_unit = int(gain_per_unit or 0)
-            line_total = qty * unit_price
-
-            cur.execute("""
+        if con.in_transaction:
+            raise RuntimeError("cobrar_ticket necesita su propia transacción; hay otra abierta.")
+        # IMMEDIATE: toma el bloqueo de escritura al inicio; si otra escritura
+        # está en curso se espera aquí (busy_timeout) y no a mitad del cobro.
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            # Obtener ticket
+            t = con.execute("""
+                SELECT COALESCE(pay_method,'')
+                FROM open_tickets WHERE id=?
+            """, (ticket_id,)).fetchone()
+            if not t:
+                raise ValueError("Ticket no existe.")
+            pay_method = t[0] or "efectivo"
+
+            # Totales del ticket en un solo agregado (sin descuentos)
+            lines, subtotal, units = con.execute("""
+                SELECT COUNT(*), IFNULL(SUM(qty * unit_price), 0), IFNULL(SUM(qty), 0)
+                FROM open_ticket_items
+                WHERE ticket_id=?
+            """, (ticket_id,)).fetchone()
+            if not lines:
+                raise ValueError("El ticket no tiene ítems.")
+            total = subtotal
+
+            # Insertar venta (incluye created_at en hora local)
+            created_at = now_local_str()
+            sale_date, sale_hour = created_at[:10], int(created_at[11:13])
+            cur = con.execute("""
+                INSERT INTO sales (subtotal, total, pay_method, status, created_at, sale_date, sale_hour)
+                VALUES (?, ?, ?, 'pagada', ?, ?, ?)
+            """, (subtotal, total, pay_method, created_at, sale_date, sale_hour))
+            sale_id = cur.lastrowid
+
+            # Detalle completo en un solo INSERT ... SELECT (incluye gain_per_unit)
+            con.execute("""
                 INSERT INTO sale_items (sale_id, product_id, qty, unit_price, line_total, gain_per_unit)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (sale_id, product_id, qty, unit_price, line_total, gain_per_unit))
-
-        # Borrar ticket abierto (ON DELETE CASCADE borra líneas de open_ticket_items)
-        cur.execute("DELETE FROM open_tickets WHERE id=?", (ticket_id,))
-
-        con.commit()
-        return sale_id
+                SELECT ?, product_id, qty, unit_price, qty * unit_price, IFNULL(gain_per_unit, 0)
+                  FROM open_ticket_items
+                 WHERE ticket_id=?
+              ORDER BY id
+            """, (sale_id, ticket_id))
+
+            # Actualizar tablas resumen de reportes
+            apply_sale(con, sale_id)
+
+            # Borrar ticket abierto (ON DELETE CASCADE borra líneas de open_ticket_items)
+            con.execute("DELETE FROM open_tickets WHERE id=?", (ticket_id,))
+
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+
+    return {
+        "sale_id": sale_id,
+        "subtotal": int(subtotal),
+        "total": int(total),
+        "pay_method": pay_method,
+        "lines": int(lines),
+        "units": int(units),
+        "created_at": created_at,
+    }
 
 
 # --------- Consultas de ventas (útil para vistas rápidas o utilidades) ---------
 
 def ventas_del_dia(fecha_iso: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Lista ventas del día por 'created_at' (local). Si se pasa fecha_iso ('YYYY-MM-DD'),
-    filtra por ese día; si no, usa la fecha local actual.
+    Lista ventas del día por 'sale_date' (fecha local de created_at). Si se pasa
+    fecha_iso ('YYYY-MM-DD'), filtra por ese día; si no, usa la fecha local actual.
     """
-    with get_conn() as con:
+    day = fecha_iso or today_local_str()
+    with get_read_conn() as con:
         cur = con.cursor()
-        if fecha_iso:
-            cur.execute("""
-                SELECT id, created_at, subtotal, total, pay_method, status
-                FROM sales
-                WHERE DATE(created_at) = DATE(?)
-                ORDER BY created_at DESC
-            """, (fecha_iso,))
-        else:
-            cur.execute("""
-                SELECT id, created_at, subtotal, total, pay_method, status
-                FROM sales
-                WHERE DATE(created_at) = DATE('now','localtime')
-                ORDER BY created_at DESC
-            """)
+        cur.execute("""
+            SELECT id, created_at, subtotal, total, pay_method, status
+            FROM sales
+            WHERE sale_date = ?
+            ORDER BY created_at DESC
+        """, (day,))
         rows = cur.fetchall()
         return [{
             "id": r[0],
@@ -106,7 +112,7 @@ def ventas_del_dia(fecha_iso: Optional[str] = None) -> List[Dict[str, Any]]:
 
 
 def items_de_venta(sale_id: int) -> List[Dict[str, Any]]:
-    with get_conn() as con:
+    with get_read_conn() as con:
         cur = con.cursor()
         cur.execute("""
             SELECT si.id, p.name, si.qty, si.unit_price, si.line_total
@@ -126,12 +132,12 @@ def items_de_venta(sale_id: int) -> List[Dict[str, Any]]:
 
 
 def ventas_por_rango(desde_iso: str, hasta_iso: str) -> List[Dict[str, Any]]:
-    with get_conn() as con:
+    with get_read_conn() as con:
         cur = con.cursor()
         cur.execute("""
             SELECT id, created_at, subtotal, total, pay_method, status
             FROM sales
-            WHERE DATE(created_at) BETWEEN DATE(?) AND DATE(?)
+            WHERE sale_date BETWEEN ? AND ?
             ORDER BY created_at DESC
         """, (desde_iso, hasta_iso))
         rows = cur.fetchall()
@@ -1,29 +1,30 @@
 # core/ticket_service.py
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Optional, Any, Tuple, Iterable
 from core.db_manager import get_conn, ensure_common_product_exists
 from core.time_utils import now_local_str
 
 # -------- Helpers internos --------
+_MAX_SQL_PARAMS = 500   # por debajo del límite de variables de SQLite antiguos (999)
+
 def _line_total(qty: int, unit_price: int) -> int:
     return int(qty) * int(unit_price)
 
-def _recalc_ticket_totals(con, ticket_id: int) -> Tuple[int, int]:
-    """Recalcula subtotal y total (son iguales porque no hay descuentos) y actualiza pending_total/updated_at."""
-    cur = con.cursor()
-    cur.execute("""
-        SELECT IFNULL(SUM(qty * unit_price), 0)
-        FROM open_ticket_items
-        WHERE ticket_id=?
-    """, (ticket_id,))
-    subtotal = cur.fetchone()[0] or 0
-    total = subtotal
-    cur.execute("""
+def _chunks(values: List[int], size: int = _MAX_SQL_PARAMS):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def _apply_ticket_delta(con, ticket_id: int, delta: int) -> None:
+    """
+    Suma 'delta' a pending_total y actualiza updated_at.
+    Se llama en la misma transacción que modifica las líneas, así el total
+    nunca queda desfasado (sin recorrer todas las líneas del ticket).
+    """
+    con.execute("""
         UPDATE open_tickets
-           SET pending_total=?,
+           SET pending_total = pending_total + ?,
                updated_at=?
          WHERE id=?
-    """, (total, now_local_str(), ticket_id))
-    return subtotal, total
+    """, (int(delta), now_local_str(), ticket_id))
 
 # -------- Tickets (cabecera) --------
 def create_ticket(name: Optional[str] = None) -> int:
@@ -64,116 +65,191 @@ def delete_ticket(ticket_id: int) -> None:
         con.execute("DELETE FROM open_tickets WHERE id=?", (ticket_id,))
         con.commit()
 
+def _row_to_ticket(r) -> Dict[str, Any]:
+    return {
+        "id": r[0],
+        "name": r[1],
+        "created_at": r[2],
+        "updated_at": r[3],
+        "pay_method": r[4],
+        "pending_total": r[5],
+    }
+
+def _fetch_ticket(con, ticket_id: int) -> Optional[Dict[str, Any]]:
+    r = con.execute("""
+        SELECT id, name, created_at, updated_at, pay_method, pending_total
+          FROM open_tickets
+         WHERE id=?
+    """, (ticket_id,)).fetchone()
+    return _row_to_ticket(r) if r else None
+
+def _fetch_open_tickets(con) -> List[Dict[str, Any]]:
+    rows = con.execute("""
+        SELECT id, name, created_at, updated_at, pay_method, pending_total
+          FROM open_tickets
+      ORDER BY updated_at DESC, id DESC
+    """).fetchall()
+    return [_row_to_ticket(r) for r in rows]
+
+def _fetch_items(con, ticket_id: int) -> List[Dict[str, Any]]:
+    rows = con.execute("""
+        SELECT 
+            i.id,
+            i.product_id,
+            COALESCE(i.display_name, p.name) AS final_name,
+            i.qty,
+            i.unit_price
+        FROM open_ticket_items i
+        JOIN products p ON p.id = i.product_id
+        WHERE i.ticket_id=?
+        ORDER BY i.id ASC
+    """, (ticket_id,)).fetchall()
+    result = []
+    for r in rows:
+        item_id = r[0]
+        product_id = r[1]
+        name = r[2]        # nombre final (producto normal o común)
+        qty = r[3]
+        unit = r[4]
+        result.append({
+            "id": item_id,
+            "ticket_id": ticket_id,
+            "product_id": product_id,
+            "product_name": name,
+            "qty": qty,
+            "unit_price": unit,
+            "line_total": _line_total(qty, unit),
+        })
+    return result
+
+def _open_tickets_version(con) -> int:
+    r = con.execute("SELECT value FROM change_counters WHERE name='open_tickets'").fetchone()
+    return int(r[0]) if r else 0
+
+def _fetch_open_tickets_since(con, version: int) -> Dict[str, Any]:
+    current = _open_tickets_version(con)
+    if version == current:
+        return {"version": current, "ids": None, "changed": []}
+    if not 0 <= version < current:
+        version = 0     # versión desconocida (otra BD, reinicio): todo cambió
+    ids = [r[0] for r in con.execute("""
+        SELECT id FROM open_tickets ORDER BY updated_at DESC, id DESC
+    """)]
+    rows = con.execute("""
+        SELECT id, name, created_at, updated_at, pay_method, pending_total
+          FROM open_tickets
+         WHERE rev > ?
+    """, (version,)).fetchall()
+    return {"version": current, "ids": ids, "changed": [_row_to_ticket(r) for r in rows]}
+
 def get_ticket(ticket_id: int) -> Optional[Dict[str, Any]]:
     with get_conn() as con:
-        cur = con.cursor()
-        cur.execute("""
-            SELECT id, name, created_at, updated_at, pay_method, pending_total
-              FROM open_tickets
-             WHERE id=?
-        """, (ticket_id,))
-        r = cur.fetchone()
-        if not r:
-            return None
-        return {
-            "id": r[0],
-            "name": r[1],
-            "created_at": r[2],
-            "updated_at": r[3],
-            "pay_method": r[4],
-            "pending_total": r[5],
-        }
+        return _fetch_ticket(con, ticket_id)
 
 def list_open_tickets() -> List[Dict[str, Any]]:
     with get_conn() as con:
-        cur = con.cursor()
-        cur.execute("""
-            SELECT id, name, created_at, updated_at, pay_method, pending_total
-              FROM open_tickets
-          ORDER BY updated_at DESC, id DESC
-        """)
-        rows = cur.fetchall()
-        return [{
-            "id": r[0],
-            "name": r[1],
-            "created_at": r[2],
-            "updated_at": r[3],
-            "pay_method": r[4],
-            "pending_total": r[5],
-        } for r in rows]
+        return _fetch_open_tickets(con)
+
+def open_tickets_version() -> int:
+    """Versión actual de open_tickets (sube con cada alta, cambio o baja de un ticket)."""
+    with get_conn() as con:
+        return _open_tickets_version(con)
+
+def list_open_tickets_since(version: int) -> Dict[str, Any]:
+    """
+    Cambios en tickets abiertos desde 'version' (la devuelta por una llamada anterior;
+    0 = todo):
+        {"version": actual,
+         "ids": ids de todos los tickets en orden de la lista (o None si nada cambió),
+         "changed": tickets creados o modificados desde 'version'}
+    Los eliminados son los que ya no aparecen en "ids".
+    Si nada cambió cuesta una sola lectura de change_counters.
+    """
+    with get_conn() as con:
+        own_tx = not con.in_transaction
+        if own_tx:
+            con.execute("BEGIN")
+        try:
+            return _fetch_open_tickets_since(con, int(version))
+        finally:
+            if own_tx:
+                con.commit()
+
+def get_ticket_snapshot(ticket_id: int, tickets_since: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Todo lo que el POS necesita para pintar un ticket, leído con una sola
+    conexión y dentro de una misma transacción de lectura (vista consistente):
+        {"ticket": cabecera o None, "items": [...], "subtotal": int, "total": int}
+    Con tickets_since=N agrega "tickets" = list_open_tickets_since(N)
+    (cambios de la lista de la izquierda).
+    """
+    with get_conn() as con:
+        own_tx = not con.in_transaction
+        if own_tx:
+            con.execute("BEGIN")
+        try:
+            ticket = _fetch_ticket(con, ticket_id)
+            items = _fetch_items(con, ticket_id) if ticket else []
+            tickets = (
+                _fetch_open_tickets_since(con, int(tickets_since))
+                if tickets_since is not None else None
+            )
+        finally:
+            if own_tx:
+                con.commit()
+
+    total = int(ticket["pending_total"] or 0) if ticket else 0
+    snap = {"ticket": ticket, "items": items, "subtotal": total, "total": total}
+    if tickets_since is not None:
+        snap["tickets"] = tickets
+    return snap
 
 # -------- Ítems de ticket --------
 def list_items(ticket_id: int) -> List[Dict[str, Any]]:
     with get_conn() as con:
-        cur = con.cursor()
-        cur.execute("""
-            SELECT 
-                i.id,
-                i.product_id,
-                COALESCE(i.display_name, p.name) AS final_name,
-                i.qty,
-                i.unit_price
-            FROM open_ticket_items i
-            JOIN products p ON p.id = i.product_id
-            WHERE i.ticket_id=?
-            ORDER BY i.id ASC
-        """, (ticket_id,))
-        rows = cur.fetchall()
-        result = []
-        for r in rows:
-            item_id = r[0]
-            product_id = r[1]
-            name = r[2]        # nombre final (producto normal o común)
-            qty = r[3]
-            unit = r[4]
-            result.append({
-                "id": item_id,
-                "ticket_id": ticket_id,
-                "product_id": product_id,
-                "product_name": name,
-                "qty": qty,
-                "unit_price": unit,
-                "line_total": _line_total(qty, unit),
-            })
-        return result
+        return _fetch_items(con, ticket_id)
 
 
 def add_item(ticket_id: int, product_id: int, qty: int, unit_price: int) -> int:
     """Si existe línea del mismo producto y mismo precio, acumula cantidad; si no, crea línea nueva."""
-    qty = int(qty)
-    unit_price = int(unit_price)
-    if qty <= 0 or unit_price < 0:
-        raise ValueError("Cantidad y precio deben ser positivos.")
+    return add_items(ticket_id, [(product_id, qty, unit_price)])[0]
+
+
+def add_items(ticket_id: int, items: Iterable[Tuple[int, int, int]]) -> List[int]:
+    """
+    Agrega varias líneas (product_id, qty, unit_price) en una sola transacción,
+    con la misma regla que add_item: si ya hay línea de ese producto y precio
+    (sin contar las de Producto común), acumula la cantidad.
+    Devuelve el id de línea de cada ítem, en el mismo orden.
+    """
+    rows = []
+    for product_id, qty, unit_price in items:
+        qty = int(qty)
+        unit_price = int(unit_price)
+        if qty <= 0 or unit_price < 0:
+            raise ValueError("Cantidad y precio deben ser positivos.")
+        rows.append((int(product_id), qty, unit_price))
+    if not rows:
+        return []
 
+    result_ids = []
     with get_conn() as con:
-        cur = con.cursor()
-        # ¿Ya existe línea de ese producto y precio?
-        cur.execute("""
-            SELECT id, qty
-              FROM open_ticket_items
-             WHERE ticket_id=? AND product_id=? AND unit_price=?
-          ORDER BY id ASC LIMIT 1
-        """, (ticket_id, product_id, unit_price))
-        row = cur.fetchone()
-        if row:
-            line_id, old_qty = row
-            new_qty = int(old_qty) + qty
-            cur.execute("""
-                UPDATE open_ticket_items
-                   SET qty=?
-                 WHERE id=?
-            """, (new_qty, line_id))
-            result_id = line_id
-        else:
-            cur.execute("""
+        for product_id, qty, unit_price in rows:
+            # Una sentencia: inserta la línea o suma a la existente
+            # (índice único parcial idx_open_ticket_items_line)
+            line_id = con.execute("""
                 INSERT INTO open_ticket_items (ticket_id, product_id, qty, unit_price)
                 VALUES (?, ?, ?, ?)
-            """, (ticket_id, product_id, qty, unit_price))
-            result_id = cur.lastrowid
+                ON CONFLICT(ticket_id, product_id, unit_price) WHERE display_name IS NULL
+                DO UPDATE SET qty = qty + excluded.qty
+                RETURNING id
+            """, (ticket_id, product_id, qty, unit_price)).fetchone()[0]
+            result_ids.append(line_id)
 
-        _recalc_ticket_totals(con, ticket_id)
+        delta = sum(_line_total(qty, unit_price) for _, qty, unit_price in rows)
+        _apply_ticket_delta(con, ticket_id, delta)
         con.commit()
-        return result_id
+    return result_ids
 
 
 def add_common_item(
@@ -210,45 +286,174 @@ def add_common_item(
         """, (ticket_id, common_product_id, qty, unit_price, display_name, gain_per_unit))
         line_id = cur.lastrowid
 
-        _recalc_ticket_totals(con, ticket_id)
+        _apply_ticket_delta(con, ticket_id, _line_total(qty, unit_price))
         con.commit()
         return line_id
 
 
 def remove_item(item_id: int) -> None:
+    remove_items([item_id])
+
+def remove_items(item_ids: Iterable[int]) -> int:
+    """
+    Elimina varias líneas (pueden ser de distintos tickets) en una sola
+    transacción, con un ajuste de total por ticket. Devuelve cuántas borró.
+    """
+    ids = sorted({int(i) for i in item_ids})
+    if not ids:
+        return 0
+
+    removed = 0
     with get_conn() as con:
-        cur = con.cursor()
-        cur.execute("SELECT ticket_id FROM open_ticket_items WHERE id=?", (item_id,))
-        r = cur.fetchone()
-        if not r:
-            return
-        ticket_id = r[0]
-        cur.execute("DELETE FROM open_ticket_items WHERE id=?", (item_id,))
-        _recalc_ticket_totals(con, ticket_id)
+        for chunk in _chunks(ids):
+            marks = ",".join("?" * len(chunk))
+            deltas = con.execute(f"""
+                SELECT ticket_id, SUM(qty * unit_price), COUNT(*)
+                  FROM open_ticket_items
+                 WHERE id IN ({marks})
+              GROUP BY ticket_id
+            """, chunk).fetchall()
+            if not deltas:
+                continue
+            con.execute(f"DELETE FROM open_ticket_items WHERE id IN ({marks})", chunk)
+            for ticket_id, total, count in deltas:
+                _apply_ticket_delta(con, ticket_id, -int(total or 0))
+                removed += count
         con.commit()
+    return removed
+
+def clear_ticket(ticket_id: int) -> int:
+    """Quita todas las líneas del ticket (un DELETE y un ajuste de total). Devuelve cuántas borró."""
+    with get_conn() as con:
+        cur = con.execute("DELETE FROM open_ticket_items WHERE ticket_id=?", (ticket_id,))
+        removed = cur.rowcount
+        if removed:
+            con.execute("""
+                UPDATE open_tickets
+                   SET pending_total=0,
+                       updated_at=?
+                 WHERE id=?
+            """, (now_local_str(), ticket_id))
+        con.commit()
+        return removed
 
 def update_item_qty(item_id: int, new_qty: int) -> None:
     """Actualiza la cantidad de una línea. Si new_qty <= 0, elimina la línea."""
-    new_qty = int(new_qty)
+    set_quantities({item_id: new_qty})
+
+def set_quantities(quantities: Dict[int, int]) -> None:
+    """
+    Fija la cantidad de varias líneas {item_id: qty} en una sola transacción
+    (qty <= 0 elimina la línea), con un ajuste de total por ticket.
+    Las líneas que no existen se ignoran.
+    """
+    wanted = {int(k): int(v) for k, v in quantities.items()}
+    if not wanted:
+        return
+
     with get_conn() as con:
-        cur = con.cursor()
-        cur.execute("SELECT ticket_id FROM open_ticket_items WHERE id=?", (item_id,))
-        r = cur.fetchone()
-        if not r:
-            return
-        ticket_id = r[0]
-
-        if new_qty <= 0:
-            cur.execute("DELETE FROM open_ticket_items WHERE id=?", (item_id,))
-        else:
-            cur.execute("UPDATE open_ticket_items SET qty=? WHERE id=?", (new_qty, item_id))
-
-        _recalc_ticket_totals(con, ticket_id)
+        current = []
+        for chunk in _chunks(sorted(wanted)):
+            marks = ",".join("?" * len(chunk))
+            current += con.execute(f"""
+                SELECT id, ticket_id, qty, unit_price
+                  FROM open_ticket_items
+                 WHERE id IN ({marks})
+            """, chunk).fetchall()
+
+        updates, deletes, deltas = [], [], {}
+        for item_id, ticket_id, old_qty, unit_price in current:
+            new_qty = wanted[item_id]
+            if new_qty <= 0:
+                deletes.append((item_id,))
+                delta = -_line_total(old_qty, unit_price)
+            else:
+                updates.append((new_qty, item_id))
+                delta = _line_total(new_qty - int(old_qty), unit_price)
+            deltas[ticket_id] = deltas.get(ticket_id, 0) + delta
+
+        if updates:
+            con.executemany("UPDATE open_ticket_items SET qty=? WHERE id=?", updates)
+        if deletes:
+            con.executemany("DELETE FROM open_ticket_items WHERE id=?", deletes)
+        for ticket_id, delta in deltas.items():
+            _apply_ticket_delta(con, ticket_id, delta)
         con.commit()
 
-def calc_ticket_totals(ticket_id: int) -> Tuple[int, int, int]:
-    """Devuelve (subtotal, 0, total). Segundo valor queda 0 por compatibilidad con UI previa."""
+
+def change_item_qty(item_id: int, delta: int) -> Optional[int]:
+    """
+    Suma 'delta' a la cantidad de una línea (teclas +/- del POS) sin dejarla
+    por debajo de 1, con su ajuste de total en la misma transacción. Devuelve la cantidad final, o None
+    si la línea no existe. Al ser relativo, varias pulsaciones seguidas se
+    pueden combinar en una sola llamada (ver core.db_writer).
+    """
     with get_conn() as con:
-        subtotal, total = _recalc_ticket_totals(con, ticket_id)
+        row = con.execute(
+            "SELECT ticket_id, qty, unit_price FROM open_ticket_items WHERE id=?",
+            (int(item_id),),
+        ).fetchone()
+        if row is None:
+            return None
+        ticket_id, old_qty, unit_price = row
+        new_qty = max(int(old_qty) + int(delta), 1)
+        if new_qty != old_qty:
+            con.execute("UPDATE open_ticket_items SET qty=? WHERE id=?", (new_qty, int(item_id)))
+            _apply_ticket_delta(con, ticket_id, _line_total(new_qty - int(old_qty), unit_price))
         con.commit()
-        return subtotal, 0, total
+        return new_qty
+
+
+def calc_ticket_totals(ticket_id: int) -> Tuple[int, int, int]:
+    """
+    Devuelve (subtotal, 0, total) leyendo pending_total (solo lectura).
+    Segundo valor queda 0 por compatibilidad con UI previa.
+    """
+    with get_conn() as con:
+        r = con.execute(
+            "SELECT pending_total FROM open_tickets WHERE id=?", (ticket_id,)
+        ).fetchone()
+        total = int(r[0] or 0) if r else 0
+        return total, 0, total
+
+def check_ticket_totals(fix: bool = False) -> List[Dict[str, Any]]:
+    """
+    Compara pending_total de cada ticket abierto contra la suma real de sus
+    líneas. Devuelve los descuadres como {"ticket_id", "stored", "actual"}.
+    Con fix=True además corrige pending_total en esos tickets.
+    """
+    with get_conn() as con:
+        rows = con.execute("""
+            SELECT t.id, t.pending_total, IFNULL(SUM(i.qty * i.unit_price), 0) AS actual
+              FROM open_tickets t
+              LEFT JOIN open_ticket_items i ON i.ticket_id = t.id
+          GROUP BY t.id
+            HAVING t.pending_total IS NOT actual
+        """).fetchall()
+        mismatches = [
+            {"ticket_id": r[0], "stored": r[1], "actual": r[2]}
+            for r in rows
+        ]
+        if fix and mismatches:
+            con.executemany(
+                "UPDATE open_tickets SET pending_total=? WHERE id=?",
+                [(m["actual"], m["ticket_id"]) for m in mismatches],
+            )
+            con.commit()
+        return mismatches
+
+
+if __name__ == "__main__":
+    import sys
+    from core.db_manager import bootstrap, close_all
+
+    bootstrap()
+    fix = "--fix" in sys.argv[1:]
+    bad = check_ticket_totals(fix=fix)
+    close_all()
+    for m in bad:
+        print(f"Ticket {m['ticket_id']}: guardado {m['stored']} / real {m['actual']}")
+    if not bad:
+        print("Totales de tickets abiertos: OK.")
+    elif fix:
+        print(f"{len(bad)} ticket(s) corregido(s).")
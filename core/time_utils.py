@@ -7,3 +7,7 @@ def now_local_str():
     con zona horaria local (offset) resuelta por el SO.
     """
     return datetime.now().astimezone().strftime("%Y-%m-%d %H:%M:%S")
+
+def today_local_str():
+    """Fecha local del sistema en formato 'YYYY-MM-DD'."""
+    return datetime.now().astimezone().strftime("%Y-%m-%d")
@@ -1,11 +1,12 @@
 # main.py
+import multiprocessing
 import sys
 
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QColor, QFont, QPalette
 from PySide6.QtWidgets import QApplication, QMainWindow, QTabWidget
 
-from core import db_manager
+from core import db_manager, db_writer
 from ui.pos.pos_view import POSView
 from ui.products_view import ProductsView
 from ui.reports_view import ReportsView
@@ -340,8 +341,16 @@ def main() -> None:
 
     window = MainWindow()
     window.show()
-    sys.exit(app.exec())
+    code = app.exec()
+
+    # Terminar las escrituras pendientes y cerrar las conexiones a la BD
+    db_writer.shutdown()
+    db_manager.close_all()
+    sys.exit(code)
 
 
 if __name__ == "__main__":
+    # Necesario en el .exe (PyInstaller): los procesos que parsean importaciones
+    # grandes (core/csv_chunks.py) arrancan de nuevo este mismo ejecutable.
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,57 @@
+# ui/export_job.py
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+
+class _ExportJob(QRunnable):
+    """Una exportación en un hilo del pool; no toca widgets."""
+
+    def __init__(self, runner, fn, args, on_done):
+        super().__init__()
+        self.setAutoDelete(False)   # la referencia la mantiene ExportRunner
+        self.runner = runner
+        self.fn = fn
+        self.args = args
+        self.on_done = on_done
+
+    def run(self):
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            result = e
+        self.runner._finished.emit(result, self.on_done)
+
+
+class ExportRunner(QObject):
+    """
+    Corre exportaciones de core.export_service (streaming, pueden tardar
+    cientos de ms) en QThreadPool.globalInstance() y entrega el resultado en
+    el hilo de la UI, igual que WriterBridge: la señal se emite desde el hilo
+    del pool y, como este objeto vive en el hilo de la UI, Qt la entrega en cola.
+
+    Una exportación a la vez: start() devuelve False si hay otra en curso.
+    """
+
+    _finished = Signal(object, object)   # (filas exportadas o la excepción, callback)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._job = None      # se reemplaza recién en la próxima exportación
+        self._busy = False
+        self._finished.connect(self._deliver)
+
+    def busy(self) -> bool:
+        return self._busy
+
+    def start(self, fn, *args, on_done) -> bool:
+        """Lanza fn(*args); al terminar llama a on_done(filas o la excepción)."""
+        if self._busy:
+            return False
+        self._busy = True
+        self._job = _ExportJob(self, fn, args, on_done)
+        QThreadPool.globalInstance().start(self._job)
+        return True
+
+    @Slot(object, object)
+    def _deliver(self, result, callback):
+        self._busy = False
+        callback(result)
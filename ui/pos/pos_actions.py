@@ -9,6 +9,14 @@ from ui.charge_dialog import ChargeDialog
 from ui.common_product_dialog import CommonProductDialog
 from PySide6.QtWidgets import QDialog
 
+
+def _close_ticket(ticket_id: int, name, pay_method: str):
+    """Nombre, medio de pago y cobro del ticket, en orden (corre en el hilo escritor)."""
+    ts.rename_ticket(ticket_id, name)
+    ts.set_pay_method(ticket_id, pay_method)
+    return ss.cobrar_ticket(ticket_id)
+
+
 class POSActionsMixin:
     """
     Mixin para acciones sobre el ticket actual:
@@ -19,33 +27,37 @@ class POSActionsMixin:
 
     Asume que la clase hija (POSView) tiene:
       - self.current_ticket_id
-      - self.table
+      - self.table, self.ticket_model
       - self.lbl_totals (QLabel)
       - self.in_search (QLineEdit)
       - self.in_ticket_name (QLineEdit)
       - métodos:
           * self.load_ticket(ticket_id: int)
+          * self.reload_current_ticket()
           * self.reload_tickets(initial: bool = False)
           * self._refresh_tickets_sidebar()
+          * self._submit_write(fn, *args, ...), self._remove_lines(ids)
+          * self._with_ticket(then)
+      - self.db_writer (WriterBridge), self._charging (bool)
       - señal:
           * self.sale_completed (Signal)
     """
 
     
     # === Totales ===
-    def refresh_totals(self):
-        """Recalcula y actualiza el total del ticket actual en la etiqueta."""
+    def refresh_totals(self, total=None):
+        """Actualiza el total del ticket actual en la etiqueta (lo lee si no viene dado)."""
         if not self.current_ticket_id:
             self.lbl_totals.setText("Total: $0")
             return
 
-        _, _, tot = ts.calc_ticket_totals(self.current_ticket_id)
+        tot = total if total is not None else ts.calc_ticket_totals(self.current_ticket_id)[2]
         self.lbl_totals.setText(f"Total: {fmt_money(tot)}")
 
     def clear_ticket_ui(self):
         """Limpia la UI del ticket cuando no hay ticket seleccionado."""
         self.in_ticket_name.clear()
-        self.table.setRowCount(0)
+        self.ticket_model.set_lines([])
         self.lbl_totals.setText("Total: $0")
 
     # === Ítems del ticket ===
@@ -54,11 +66,10 @@ class POSActionsMixin:
         if not self.current_ticket_id:
             return
 
-        for it in ts.list_items(self.current_ticket_id):
-            ts.remove_item(it["id"])
-
-        self.load_ticket(self.current_ticket_id)
-        self._refresh_tickets_sidebar()
+        # Se vacía la tabla al instante; el borrado corre en el hilo escritor
+        self.ticket_model.set_lines([])
+        self.refresh_totals(0)
+        self._submit_write(ts.clear_ticket, self.current_ticket_id)
         self.in_search.setFocus()
 
     def _remove_line_direct(self, line_id: int):
@@ -66,64 +77,80 @@ class POSActionsMixin:
         if not self.current_ticket_id:
             return
 
-        ts.remove_item(int(line_id))
-        self.load_ticket(self.current_ticket_id)
-        self._refresh_tickets_sidebar()
+        self._remove_lines([line_id])
         self.in_search.setFocus()
 
     # === Cobro ===
+    # Todo pasa por el hilo escritor sin esperarlo: el total se lee en la cola
+    # (detrás de los +/- y escaneos pendientes) y el diálogo se abre cuando
+    # llega; el cobro se encola y la lista se actualiza al terminar. Con una
+    # importación larga en la cola la UI sigue respondiendo mientras tanto.
     def charge_ticket(self):
         """Abre el diálogo de cobro y registra la venta si todo es válido."""
-        if not self.current_ticket_id:
+        if not self.current_ticket_id or self._charging:
             return
 
-        _, _, tot = ts.calc_ticket_totals(self.current_ticket_id)
+        self._charging = True
+        tid = self.current_ticket_id
+        self.db_writer.submit(
+            ts.calc_ticket_totals, tid,
+            on_done=lambda future: self._open_charge_dialog(tid, future),
+        )
+
+    def _open_charge_dialog(self, tid: int, future):
+        self._charging = False
+        if tid != self.current_ticket_id:
+            return  # se cambió de ticket mientras se leía el total
+        error = future.exception()
+        if error is not None:
+            QMessageBox.critical(self, "Error", str(error))
+            return
+        _, _, tot = future.result()
         if tot <= 0:
             QMessageBox.warning(self, "Cobrar", "El ticket está vacío.")
             return
 
         dlg = ChargeDialog(total=tot, parent=self)
-        if dlg.exec() != ChargeDialog.Accepted:
+        if dlg.exec() != ChargeDialog.Accepted or tid != self.current_ticket_id:
             return
 
         pay_method = dlg.selected_method or "efectivo"
-
         # Guardar último nombre escrito en el ticket antes de cobrar
-        ts.rename_ticket(self.current_ticket_id, self.in_ticket_name.text().strip() or None)
-        ts.set_pay_method(self.current_ticket_id, pay_method)
+        name = self.in_ticket_name.text().strip() or None
 
-        try:
-            sid = ss.cobrar_ticket(self.current_ticket_id)
+        # El ticket se suelta ya: lo que se escanee mientras tanto va a uno nuevo
+        self.current_ticket_id = None
+        self.clear_ticket_ui()
+        self.db_writer.submit(
+            _close_ticket, tid, name, pay_method, on_done=self._on_ticket_charged
+        )
 
-            # Recargar tickets abiertos y notificar al resto de la app
-            self.reload_tickets(initial=True)
-            self.sale_completed.emit()  # el MainWindow puede escuchar esto
-            
-            # Volvemos al buscador
-            self.in_search.setFocus()
+        # Volvemos al buscador
+        self.in_search.setFocus()
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+    def _on_ticket_charged(self, future):
+        error = future.exception()
+        if error is not None:
+            QMessageBox.critical(self, "Error", str(error))
+        else:
+            self.sale_completed.emit()  # el MainWindow puede escuchar esto
+        # Recargar tickets abiertos (si falló, el ticket sigue en la lista)
+        self.reload_tickets(initial=self.current_ticket_id is None)
 
 
     def add_common_item_dialog(self):
             """Abre el diálogo de producto común y agrega la línea al ticket."""
-            if not self.current_ticket_id:
-                # Crear ticket si no hay
-                self.new_ticket()
-
             dlg = CommonProductDialog(self)
             if dlg.exec() != QDialog.Accepted:
                 return
 
             data = dlg.get_data()
-            ts.add_common_item(
-                ticket_id=self.current_ticket_id,
+            # Al terminar la escritura se recargan tabla y totales (sin ticket,
+            # primero se crea uno)
+            self._with_ticket(lambda ticket_id: self._submit_write(
+                ts.add_common_item,
+                ticket_id=ticket_id,
                 name=data["name"],
                 qty=data["qty"],
                 unit_price=data["unit_price"],
-            )
-
-            # Recargar tabla y totales
-            self.load_ticket(self.current_ticket_id)
-            self._refresh_tickets_sidebar()
\ No newline at end of file
+            ))
\ No newline at end of file
@@ -1,6 +1,7 @@
 # ui/pos/pos_search.py
+import time
 
-from PySide6.QtCore import QTimer
+from PySide6.QtCore import QObject, QRunnable, Signal
 from PySide6.QtWidgets import QMessageBox, QDialog
 
 from core import product_service as ps
@@ -8,51 +9,135 @@ from core import ticket_service as ts
 from ui.common_product_dialog import CommonProductDialog
 
 
+SUGGEST_DEBOUNCE_MS = 120   # espera tras la última tecla antes de consultar
+SUGGEST_LIMIT = 30
+
+
+class _SuggestSignals(QObject):
+    # (seq, filas) -> se entrega en el hilo de la UI (conexión en cola)
+    done = Signal(int, list)
+
+
+class _SuggestJob(QRunnable):
+    """Consulta de sugerencias en un hilo del pool; no toca widgets."""
+
+    def __init__(self, seq: int, text: str):
+        super().__init__()
+        self.setAutoDelete(False)   # la referencia la mantiene el mixin (_suggest_jobs)
+        self.seq = seq
+        self.text = text
+        self.signals = _SuggestSignals()
+
+    def run(self):
+        try:
+            rows = ps.search_products(self.text, limit=SUGGEST_LIMIT)
+        except Exception:
+            # BD ocupada o error puntual: sin sugerencias esta vez
+            rows = []
+        self.signals.done.emit(self.seq, rows)
+
+
 class POSSearchMixin:
     """
     Mixin para manejar la lógica de búsqueda de productos y 'Producto común'.
 
     Asume que la clase hija (POSView) tiene:
       - self.current_ticket_id
-      - self.new_ticket()
+      - self._with_ticket(then) (POSTicketsMixin)
       - self.load_ticket(ticket_id)
-      - self._refresh_tickets_sidebar()
-      - self.in_search (QLineEdit)
+      - self.reload_current_ticket(sidebar=True)
+      - self.in_search (SearchLine)
       - self.suggest_model (QStringListModel)
       - self.suggest_map (dict)
       - self.selected_product_id
-      - self.table (QTableWidget)
+      - self._suggest_timer (QTimer de un disparo, SUGGEST_DEBOUNCE_MS)
+      - self._suggest_pool (QThreadPool de 1 hilo)
+      - self._suggest_seq, self._suggest_jobs (set)
+      - self.suggest_stats ({"served": int, "dropped": int})
+      - self.last_scan_latency_ms, self._scan_started
+      - self.table (QTableView) y los helpers de fila de POSTableMixin
       - self._preserve_table_focus (bool)
+      - self._submit_write(...) (POSTicketsMixin)
+      - self._common_product_id (None hasta resolverlo)
     """
 
-    # --- Utilidad: asegurar existencia de 'Producto común' ---
-    def _ensure_common_product_id(self) -> int:
-        # Busca (o crea) "Producto común"
-        candidates = ps.list_products("Producto común")
-        for p in candidates:
-            if (p["name"] or "").strip().lower() == "producto común":
-                return p["id"]
-        return ps.create_product(
-            name="Producto común",
-            sale_price=0,
-            purchase_price=0,
-            barcode=None
-        )
+    # --- Utilidad: id de 'Producto común' ---
+    def _ensure_common_product_id(self):
+        """
+        Id de "Producto común", por nombre exacto en el catálogo en memoria y
+        guardado después de la primera vez. La fila la crean la migración y
+        ensure_common_product_exists (en el hilo escritor); desde aquí no se
+        crea: otra terminal podría encolar un duplicado.
+        """
+        if self._common_product_id is None:
+            prod = ps.get_product_by_name("Producto común")
+            if prod is not None:
+                self._common_product_id = prod["id"]
+        return self._common_product_id
 
     # === Autocompletar ===
+    # Cada edición sube _suggest_seq y reinicia el timer (debounce), salvo
+    # durante una ráfaga del lector: ahí se detiene y no se consulta. Al vencer,
+    # la consulta corre en _suggest_pool; solo se aplica el resultado cuyo seq
+    # sigue siendo el último. suggest_stats cuenta servidas y descartadas
+    # (canceladas antes de correr o llegadas tarde).
+    # _suggest_jobs guarda cada consulta lanzada hasta saber que terminó del
+    # todo: si Python soltara la última referencia mientras corre en el pool,
+    # se liberaría el QRunnable (y sus señales) a mitad de camino.
     def update_suggestions(self, text: str):
         text = (text or "").strip()
-        items = []
-        self.suggest_map.clear()
         self.selected_product_id = None
+        self._suggest_seq += 1          # invalida cualquier consulta en curso
 
-        if len(text) >= 1:
-            for p in ps.list_products(text)[:30]:
-                name = p["name"]
-                if name not in self.suggest_map:
-                    self.suggest_map[name] = p["id"]
-                    items.append(name)
+        if not text:
+            self._suggest_timer.stop()
+            self._cancel_pending_suggest()
+            self.suggest_map.clear()
+            self.suggest_model.setStringList([])
+            return
+
+        if self.in_search.in_burst():
+            # Lector de códigos escribiendo: sin sugerencias (termina en Enter)
+            self._suggest_timer.stop()
+            return
+        self._suggest_timer.start()
+
+    def _start_suggest_query(self):
+        text = (self.in_search.text() or "").strip()
+        if not text:
+            return
 
+        self._cancel_pending_suggest()
+        job = _SuggestJob(self._suggest_seq, text)
+        job.signals.done.connect(self._on_suggestions_ready)
+        self._suggest_jobs.add(job)
+        self._suggest_pool.start(job)
+
+    def _cancel_pending_suggest(self):
+        """Saca de la cola las consultas que todavía no empezaron."""
+        for job in list(self._suggest_jobs):
+            if self._suggest_pool.tryTake(job):
+                self.suggest_stats["dropped"] += 1
+                self._suggest_jobs.discard(job)
+
+    def _on_suggestions_ready(self, seq: int, rows: list):
+        # El pool tiene un solo hilo: las consultas anteriores a esta ya
+        # terminaron. Esta misma se suelta con la próxima respuesta, porque
+        # su run() puede seguir en el hilo justo después del emit.
+        self._suggest_jobs = {job for job in self._suggest_jobs if job.seq >= seq}
+
+        if seq != self._suggest_seq:
+            self.suggest_stats["dropped"] += 1
+            return
+        self.suggest_stats["served"] += 1
+
+        items = []
+        self.suggest_map.clear()
+        for p in rows:
+            name = p["name"]
+            if name not in self.suggest_map:
+                self.suggest_map[name] = p["id"]
+                items.append(name)
         self.suggest_model.setStringList(items)
 
 
@@ -70,9 +155,6 @@ class POSSearchMixin:
     # === Ítems ===
     def add_common_item_dialog(self):
         """Abre el diálogo de producto común y agrega la línea al ticket."""
-        if not self.current_ticket_id:
-            self.new_ticket()
-
         dlg = CommonProductDialog(self)
         if dlg.exec() != QDialog.Accepted:
             return
@@ -97,23 +179,31 @@ class POSSearchMixin:
             else:  # "$"
                 gain_per_unit = int(gain_value)
 
-        # Guardar línea de producto común en el ticket
-        ts.add_common_item(
-            ticket_id=self.current_ticket_id,
+        # Guardar línea de producto común en el ticket (al terminar se recarga
+        # la tabla y la lista de tickets); sin ticket, primero se crea uno
+        self._with_ticket(lambda ticket_id: self._submit_write(
+            ts.add_common_item,
+            ticket_id=ticket_id,
             name=name,
             qty=qty,
             unit_price=unit_price,
             gain_per_unit=gain_per_unit,
-        )
-
-        # Recargar tabla
-        self.load_ticket(self.current_ticket_id)
+        ))
     
 
     def add_item_by_search(self):
-        """Agrega producto por nombre/código: cantidad 1, precio del producto."""
-        if not self.current_ticket_id:
-            self.new_ticket()
+        """
+        Agrega producto por nombre/código: cantidad 1, precio del producto.
+
+        Primero se busca el código de barras exacto (O(1), catálogo en memoria;
+        si no está, una consulta exacta a la BD por si se creó en otra terminal).
+        Si el texto llegó como ráfaga de lector y el código no existe, se avisa
+        en vez de caer a la búsqueda por texto (podría elegir otro producto).
+        """
+        scanned = self.in_search.looks_like_scan()
+        started = self.in_search.burst_started_at() if scanned else time.perf_counter()
+        self._suggest_timer.stop()
+        self.in_search.reset_burst()
 
         pid = self.selected_product_id
         if not pid:
@@ -121,39 +211,56 @@ class POSSearchMixin:
             if not q:
                 QMessageBox.warning(self, "Agregar", "Escribe nombre o código para buscar.")
                 return
-            cand = ps.list_products(q)
-            if not cand:
-                QMessageBox.warning(self, "Producto", "No se encontró producto.")
+            prod = ps.get_product_by_barcode(q)
+            if prod is not None:
+                pid = prod["id"]
+            elif scanned:
+                QMessageBox.warning(self, "Producto", f"No existe un producto con el código {q}.")
+                self.in_search.selectAll()
                 return
-            pid = cand[0]["id"]
+            else:
+                cand = ps.search_products(q, limit=1)
+                if not cand:
+                    QMessageBox.warning(self, "Producto", "No se encontró producto.")
+                    return
+                pid = cand[0]["id"]
 
         prod = ps.get_product(pid)
-        ts.add_item(self.current_ticket_id, pid, qty=1, unit_price=prod["sale_price"])
+        if prod is None:
+            # Eliminado (quizás desde otra terminal) después de sugerirlo
+            QMessageBox.warning(self, "Producto", "El producto ya no existe.")
+            self.selected_product_id = None
+            self.in_search.selectAll()
+            return
+
+        def added(line_id):
+            # Al recargar queda seleccionada la línea agregada (o a la que se sumó)
+            self._selected_line_id = line_id
+            if scanned:
+                self._scan_started = started
+
+        # Se guarda en el hilo escritor; escaneos seguidos del mismo producto
+        # se combinan en un solo add_item con la cantidad sumada. Sin ticket,
+        # primero se crea uno (también en el escritor, sin esperarlo aquí).
+        price = prod["sale_price"]
+        self._with_ticket(lambda ticket_id: self._submit_write(
+            ts.add_item, ticket_id, pid, 1, price,
+            key=("add", ticket_id, pid, price),
+            merge=lambda old, new: (old[0], old[1], old[2] + new[2], old[3]),
+            then=added,
+        ))
 
         # Limpiar casilla de búsqueda y sugerencias
         self.in_search.clear()
         self.selected_product_id = None
         self.update_suggestions("")
 
-        # Recargar la tabla del ticket (sin preocuparnos del foco aún)
-        self._preserve_table_focus = True
-        self.load_ticket(self.current_ticket_id)
-        self._preserve_table_focus = False
-
-        # Seleccionar automáticamente la última fila (producto recién agregado)
-        last_row = self.table.rowCount() - 1
-        if last_row >= 0:
-            self.table.setCurrentCell(last_row, 1)  # columna Cant
-
-        # Actualizar panel izquierdo de tickets
-        self._refresh_tickets_sidebar()
-
         # Mantener flujo rápido: foco de vuelta en el buscador
         self.in_search.setFocus()
 
 
     def _warmup_common_product(self):
-        """Crea/busca el Producto común al inicio para evitar la espera en el primer uso."""
+        """Busca el Producto común al inicio (también carga el catálogo) para evitar la espera en el primer uso."""
         try:
             self._ensure_common_product_id()
         except Exception:
@@ -1,73 +1,224 @@
 # ui/pos/pos_table.py
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, Signal
 from PySide6.QtGui import QColor, QBrush, QFont
-from PySide6.QtWidgets import QTableWidgetItem
 from core.utils_format import fmt_money
-from core import ticket_service as ts
+
+
+class TicketLinesModel(QAbstractTableModel):
+    """
+    Modelo de las líneas del ticket actual para la tabla del POS.
+
+    Columnas:
+    0: Producto (UserRole = line_id)
+    1: Cantidad (editable)
+    2: P.Unit (solo lectura)
+    3: Total (solo lectura)
+    4: ✕ (solo lectura, texto)
+
+    set_lines() compara por line_id contra lo que ya se muestra y emite solo
+    las inserciones, eliminaciones y dataChanged de las filas que cambiaron,
+    así un +/- repinta una fila y no la tabla completa.
+    """
+
+    HEADERS = ["Producto", "Cant", "P.Unit", "Total", ""]
+    COL_QTY = 1
+    COL_DELETE = 4
+
+    # (line_id, texto ingresado) al editar la columna Cant; la vista decide qué hacer
+    qty_edited = Signal(int, str)
+
+    _ALIGN_RIGHT = Qt.AlignRight | Qt.AlignVCenter
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lines = []            # dicts de ticket_service (ordenados por id)
+        self._row_by_id = {}
+
+        # Estilo de la columna ✕: un solo objeto compartido por todas las filas
+        self._del_bg = QBrush(QColor("#ffcccc"))   # Fondo rojo suave
+        self._del_fg = QBrush(QColor("#cc0000"))   # Texto rojo oscuro
+        self._del_font = QFont()
+        self._del_font.setBold(True)
+
+    # --- API de Qt ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._lines)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index):
+        base = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == self.COL_QTY:
+            base |= Qt.ItemIsEditable
+        return base
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        line = self._lines[index.row()]
+        col = index.column()
+
+        if role == Qt.DisplayRole:
+            if col == 0:
+                return line["product_name"]
+            if col == 1:
+                return str(line["qty"])
+            if col == 2:
+                return fmt_money(line["unit_price"])
+            if col == 3:
+                return fmt_money(line["line_total"])
+            return "✕"
+        if role == Qt.EditRole and col == self.COL_QTY:
+            return str(line["qty"])
+        if role == Qt.UserRole:
+            return line["id"]
+        if role == Qt.TextAlignmentRole:
+            if col == self.COL_DELETE:
+                return int(Qt.AlignCenter)
+            if col in (1, 2, 3):
+                return int(self._ALIGN_RIGHT)
+            return None
+        if col == self.COL_DELETE:
+            if role == Qt.BackgroundRole:
+                return self._del_bg
+            if role == Qt.ForegroundRole:
+                return self._del_fg
+            if role == Qt.FontRole:
+                return self._del_font
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        # No se escribe en la BD desde el modelo: se avisa a la vista,
+        # que valida, guarda y vuelve a llamar a set_lines().
+        if role != Qt.EditRole or index.column() != self.COL_QTY:
+            return False
+        self.qty_edited.emit(int(self._lines[index.row()]["id"]), str(value))
+        return True
+
+    # --- Acceso por fila / línea ---
+    def line_id_at(self, row: int):
+        if 0 <= row < len(self._lines):
+            return self._lines[row]["id"]
+        return None
+
+    def line_at(self, row: int):
+        if 0 <= row < len(self._lines):
+            return self._lines[row]
+        return None
+
+    def row_of(self, line_id) -> int:
+        return self._row_by_id.get(line_id, -1)
+
+    def lines(self):
+        return list(self._lines)
+
+    def total(self) -> int:
+        """Suma de las líneas mostradas (igual a pending_total cuando la BD está al día)."""
+        return sum(ln["line_total"] for ln in self._lines)
+
+    def set_line_qty(self, line_id, qty: int) -> None:
+        """
+        Muestra una cantidad nueva en una línea sin esperar a la BD (+/- del POS).
+        La siguiente recarga con set_lines() deja la fila igual a lo guardado.
+        """
+        row = self.row_of(line_id)
+        if row < 0:
+            return
+        line = self._lines[row]
+        self._lines[row] = dict(line, qty=qty, line_total=int(qty) * int(line["unit_price"]))
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.COL_DELETE - 1))
+
+    # --- Actualización incremental ---
+    def set_lines(self, lines) -> None:
+        """Deja el modelo igual a 'lines' tocando solo las filas que cambiaron."""
+        lines = list(lines)
+        new_ids = {ln["id"] for ln in lines}
+
+        # 1) Quitar filas que ya no existen (de abajo hacia arriba, por tramos)
+        row = len(self._lines) - 1
+        while row >= 0:
+            if self._lines[row]["id"] in new_ids:
+                row -= 1
+                continue
+            last = row
+            while row >= 0 and self._lines[row]["id"] not in new_ids:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row + 1, last)
+            del self._lines[row + 1:last + 1]
+            self.endRemoveRows()
+
+        # 2) Insertar las nuevas y actualizar las que cambiaron, en el orden de 'lines'
+        for pos, line in enumerate(lines):
+            current = self._lines[pos] if pos < len(self._lines) else None
+            if current is not None and current["id"] == line["id"]:
+                if current != line:
+                    self._lines[pos] = line
+                    self.dataChanged.emit(
+                        self.index(pos, 0), self.index(pos, self.COL_DELETE - 1)
+                    )
+                continue
+            if current is not None and any(ln["id"] == current["id"] for ln in lines[pos:]):
+                self.beginInsertRows(QModelIndex(), pos, pos)
+                self._lines.insert(pos, line)
+                self.endInsertRows()
+                continue
+            if current is None:
+                self.beginInsertRows(QModelIndex(), pos, pos)
+                self._lines.append(line)
+                self.endInsertRows()
+                continue
+            # Orden distinto al esperado: recarga completa (no debería ocurrir)
+            self.beginResetModel()
+            self._lines = lines
+            self.endResetModel()
+            break
+
+        self._row_by_id = {ln["id"]: i for i, ln in enumerate(self._lines)}
 
 
 class POSTableMixin:
     """
     Mixin para manejar SOLO la carga de la tabla del POS.
     Asume que la clase hija tiene:
-      - self.table (QTableWidget)
+      - self.table (QTableView)
+      - self.ticket_model (TicketLinesModel)
       - self._updating_table (bool)
     """
 
-    def load_ticket_table(self, ticket_id: int):
-        """Carga las líneas del ticket en la tabla.
-
-        Columnas:
-        0: Producto (UserRole = line_id)
-        1: Cantidad (editable)
-        2: P.Unit (solo lectura)
-        3: Total (solo lectura)
-        4: ✕ (solo lectura, texto)
-        """
+    def load_ticket_table(self, items):
+        """Aplica las líneas del ticket (items de get_ticket_snapshot) al modelo de la tabla."""
         self._updating_table = True
         try:
-            self.table.setRowCount(0)
-
-            for it in ts.list_items(ticket_id):
-                r = self.table.rowCount()
-                self.table.insertRow(r)
-
-                # Producto
-                prod_item = QTableWidgetItem(it["product_name"])
-                prod_item.setData(Qt.UserRole, it["id"])  # line_id
-                self.table.setItem(r, 0, prod_item)
-
-                # Cantidad (editable)
-                qty_item = QTableWidgetItem(str(it["qty"]))
-                qty_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                self.table.setItem(r, 1, qty_item)
-
-                # Precio unitario
-                pu_item = QTableWidgetItem(fmt_money(it["unit_price"]))
-                pu_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                pu_item.setFlags(pu_item.flags() & ~Qt.ItemIsEditable)
-                self.table.setItem(r, 2, pu_item)
-
-                # Total línea
-                tot_item = QTableWidgetItem(fmt_money(it["line_total"]))
-                tot_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-                tot_item.setFlags(tot_item.flags() & ~Qt.ItemIsEditable)
-                self.table.setItem(r, 3, tot_item)
-
-                # Columna de borrar (X) - Rojo suave
-                del_item = QTableWidgetItem("✕")
-                del_item.setTextAlignment(Qt.AlignCenter)
-                del_item.setFlags(del_item.flags() & ~Qt.ItemIsEditable)
-                
-                # Estilo rojo suave
-                del_item.setBackground(QBrush(QColor("#ffcccc")))  # Fondo rojo suave
-                del_item.setForeground(QBrush(QColor("#cc0000")))  # Texto rojo oscuro
-                font = QFont()
-                font.setBold(True)
-                del_item.setFont(font)
-                
-                self.table.setItem(r, 4, del_item)
-
+            self.ticket_model.set_lines(items)
         finally:
             self._updating_table = False
+
+    # --- Utilidades de fila (equivalentes a las de QTableWidget) ---
+    def _row_count(self) -> int:
+        return self.ticket_model.rowCount()
+
+    def _current_row(self) -> int:
+        idx = self.table.currentIndex()
+        return idx.row() if idx.isValid() else -1
+
+    def _select_row(self, row: int) -> None:
+        """Selecciona la fila 'row' con el cursor en la columna Cant."""
+        self.table.setCurrentIndex(self.ticket_model.index(row, TicketLinesModel.COL_QTY))
+
+    def _line_id_at(self, row: int):
+        return self.ticket_model.line_id_at(row)
+
+    def _selected_rows(self):
+        """Filas seleccionadas (ordenadas); si no hay selección, la fila actual."""
+        rows = sorted({idx.row() for idx in self.table.selectionModel().selectedRows()})
+        if not rows:
+            row = self._current_row()
+            rows = [row] if row >= 0 else []
+        return rows
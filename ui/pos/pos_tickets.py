@@ -4,6 +4,7 @@ from PySide6.QtCore import Qt
 from PySide6.QtWidgets import QMessageBox, QListWidgetItem
 
 from core import ticket_service as ts
+from core.utils_format import fmt_money
 
 
 class POSTicketsMixin:
@@ -12,24 +13,34 @@ class POSTicketsMixin:
 
     Asume que la clase hija (POSView) tiene:
       - self.list_tickets (QListWidget)
+      - self._tickets_version, self._ticket_items, self._ticket_rows
       - self.current_ticket_id (int o None)
       - self.in_ticket_name (QLineEdit)
       - self.in_search (QLineEdit)
       - self.clear_ticket_ui()
       - self.load_ticket(ticket_id: int)
+      - self.db_writer (WriterBridge) y self._submit_write(...)
+      - self._ticket_waiters (lista o None, ver _with_ticket)
+
+    Las escrituras de tickets se encolan en el hilo escritor y la UI sigue
+    al recibir el resultado (on_done): nunca espera la cola, que puede tener
+    delante una importación larga.
     """
 
     # === Tickets ===
-    def reload_tickets(self, initial: bool = False):
-        """Carga todos los tickets abiertos en la lista de la izquierda."""
-        self.list_tickets.clear()
-
-        for t in ts.list_open_tickets():
-            name = (t.get("name") or f"Ticket {t['id']}").strip()
-            total = int(t.get("pending_total") or 0)  # por si luego quieres mostrarlo
-            it = QListWidgetItem(name)
-            it.setData(Qt.UserRole, int(t["id"]))
-            self.list_tickets.addItem(it)
+    # La lista se actualiza por diferencias: ts.list_open_tickets_since() dice
+    # qué tickets cambiaron desde self._tickets_version y el orden actual; aquí
+    # solo se insertan, quitan, mueven o renombran esos ítems.
+    #   self._ticket_items: id -> QListWidgetItem
+    #   self._ticket_rows:  id -> fila actual en la lista
+    def reload_tickets(self, initial: bool = False, delta=None):
+        """
+        Sincroniza la lista de tickets abiertos de la izquierda.
+        'delta' permite pasar los cambios ya leídos (p. ej. de get_ticket_snapshot).
+        """
+        if delta is None:
+            delta = ts.list_open_tickets_since(self._tickets_version)
+        self._apply_tickets_delta(delta)
 
         # Seleccionar el primero al inicio
         if self.list_tickets.count() and initial:
@@ -40,19 +51,63 @@ class POSTicketsMixin:
             self.current_ticket_id = None
             self.clear_ticket_ui()
 
-    def _refresh_tickets_sidebar(self):
-        """Recarga la lista de tickets manteniendo seleccionado el actual."""
+    def _apply_tickets_delta(self, delta):
+        ids = delta["ids"]
+        if ids is None:
+            return  # nada cambió desde la última vez
+
+        changed = {t["id"]: t for t in delta["changed"]}
+        if any(tid not in self._ticket_items and tid not in changed for tid in ids):
+            # Perdimos la secuencia de versiones: pedir todo de nuevo
+            self._tickets_version = 0
+            return self._apply_tickets_delta(ts.list_open_tickets_since(0))
+
+        # 1) Quitar los tickets que ya no están abiertos
+        keep = set(ids)
+        for tid in [tid for tid in self._ticket_items if tid not in keep]:
+            item = self._ticket_items.pop(tid)
+            self.list_tickets.takeItem(self.list_tickets.row(item))
+
+        # 2) Insertar nuevos y mover los que cambiaron de posición
+        for pos, tid in enumerate(ids):
+            item = self._ticket_items.get(tid)
+            if item is None:
+                item = QListWidgetItem()
+                item.setData(Qt.UserRole, int(tid))
+                self._ticket_items[tid] = item
+                self.list_tickets.insertItem(pos, item)
+            elif self.list_tickets.item(pos).data(Qt.UserRole) != tid:
+                self.list_tickets.takeItem(self.list_tickets.row(item))
+                self.list_tickets.insertItem(pos, item)
+
+            # 3) Texto y total solo de los que cambiaron
+            t = changed.get(tid)
+            if t is not None:
+                item.setText((t.get("name") or f"Ticket {t['id']}").strip())
+                item.setToolTip(f"Total: {fmt_money(int(t.get('pending_total') or 0))}")
+
+        self._ticket_rows = {tid: i for i, tid in enumerate(ids)}
+        self._tickets_version = delta["version"]
+
+    def _refresh_tickets_sidebar(self, delta=None):
+        """
+        Actualiza la lista de tickets manteniendo seleccionado el actual.
+        Las señales de la lista se bloquean: el ticket actual ya está cargado y
+        volver a seleccionarlo no debe disparar otro load_ticket.
+        """
         current_id = self.current_ticket_id
-        self.reload_tickets(initial=False)
+        self.list_tickets.blockSignals(True)
+        try:
+            self.reload_tickets(initial=False, delta=delta)
 
-        if current_id is None:
-            return
+            if current_id is None:
+                return
 
-        for i in range(self.list_tickets.count()):
-            it = self.list_tickets.item(i)
-            if it.data(Qt.UserRole) == current_id:
-                self.list_tickets.setCurrentRow(i)
-                break
+            row = self._ticket_rows.get(current_id)
+            if row is not None and self.list_tickets.currentRow() != row:
+                self.list_tickets.setCurrentRow(row)
+        finally:
+            self.list_tickets.blockSignals(False)
 
     def on_ticket_selected(self):
         """Cuando el usuario selecciona un ticket en la lista."""
@@ -68,25 +123,68 @@ class POSTicketsMixin:
 
     def new_ticket(self):
         """Crea un nuevo ticket (usando el nombre ingresado si existe)."""
-        ts.create_ticket(self.in_ticket_name.text().strip() or None)
-        self.reload_tickets(initial=False)
-        # seleccionar el primero (el más nuevo queda arriba con tu lógica actual)
-        if self.list_tickets.count() > 0:
-            self.list_tickets.setCurrentRow(0)
+        self._create_ticket()
         self.in_search.setFocus()
 
+    def _create_ticket(self, then=None):
+        """
+        Encola la creación del ticket; al terminar lo selecciona y llama a
+        then(ticket_id) (then(None) si falló).
+        """
+        def done(future):
+            error = future.exception()
+            if error is not None:
+                QMessageBox.warning(self, "Nuevo ticket", str(error))
+                tid = None
+            else:
+                tid = int(future.result())
+                self.reload_tickets(initial=False)
+                row = self._ticket_rows.get(tid)
+                if row is not None:
+                    self.list_tickets.setCurrentRow(row)
+                if self.current_ticket_id != tid:
+                    self.load_ticket(tid)
+            if then is not None:
+                then(tid)
+
+        self.db_writer.submit(
+            ts.create_ticket, self.in_ticket_name.text().strip() or None, on_done=done
+        )
+
+    def _with_ticket(self, then):
+        """
+        Llama a then(ticket_id) con el ticket actual. Si no hay, lo crea
+        primero; las acciones que llegan mientras se crea esperan al mismo.
+        """
+        if self.current_ticket_id:
+            then(self.current_ticket_id)
+            return
+        if self._ticket_waiters is not None:
+            self._ticket_waiters.append(then)
+            return
+
+        self._ticket_waiters = [then]
+
+        def created(tid):
+            waiters, self._ticket_waiters = self._ticket_waiters, None
+            if tid is not None:
+                for fn in waiters:
+                    fn(tid)
+
+        self._create_ticket(then=created)
+
     def rename_ticket(self):
         """Renombra el ticket actual usando el texto del campo."""
         if not self.current_ticket_id:
             return
 
-        ts.rename_ticket(
+        # La lista de la izquierda se actualiza al terminar la escritura
+        self._submit_write(
+            ts.rename_ticket,
             self.current_ticket_id,
             self.in_ticket_name.text().strip() or None
         )
 
-        self.reload_tickets(initial=False)
-
         # Limpiar la casilla del nombre del ticket y volver al buscador
         self.in_ticket_name.clear()
         self.in_search.setFocus()
@@ -103,6 +201,12 @@ class POSTicketsMixin:
         ) != QMessageBox.Yes:
             return
 
-        ts.delete_ticket(self.current_ticket_id)
-        self.reload_tickets(initial=False)
+        # Se suelta al instante (lo que se escanee ahora va a un ticket nuevo);
+        # al borrarse se selecciona el primero de la lista
+        tid = self.current_ticket_id
+        self.current_ticket_id = None
+        self.clear_ticket_ui()
+        self._submit_write(
+            ts.delete_ticket, tid, then=lambda _: self.reload_tickets(initial=True)
+        )
         self.in_search.setFocus()
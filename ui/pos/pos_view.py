@@ -1,20 +1,23 @@
 # ui/pos/pos_view.py
-from PySide6.QtCore import Qt, QStringListModel, QTimer, Signal, QEvent
+import time
+
+from PySide6.QtCore import Qt, QStringListModel, QTimer, QThreadPool, Signal, QEvent
 from PySide6.QtGui import QKeySequence, QShortcut
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
-    QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox, QListWidget,
+    QTableView, QHeaderView, QMessageBox, QListWidget,
     QSplitter, QCompleter, QLineEdit, QAbstractItemView
 )
 
 from core import ticket_service as ts
 
-from ui.pos.pos_table import POSTableMixin
-from ui.pos.pos_search import POSSearchMixin
+from ui.pos.pos_table import POSTableMixin, TicketLinesModel
+from ui.pos.pos_search import POSSearchMixin, SUGGEST_DEBOUNCE_MS
 from ui.pos.pos_tickets import POSTicketsMixin
 from ui.pos.pos_actions import POSActionsMixin
 from ui.pos.pos_widgets import IntSpinDelegate, SearchLine
 from ui.daily_sales_dialog import DailySalesDialog
+from ui.writer_bridge import WriterBridge
 
 
 class POSView(
@@ -37,6 +40,12 @@ class POSView(
 
         # === Panel izquierdo: Tickets abiertos ===
         self.list_tickets = QListWidget()
+        # Estado para actualizar la lista por diferencias (ver POSTicketsMixin)
+        self._tickets_version = 0
+        self._ticket_items = {}
+        self._ticket_rows = {}
+        self._ticket_waiters = None      # acciones esperando el ticket que se está creando
+        self._charging = False           # cobro en curso (ver POSActionsMixin.charge_ticket)
         self.list_tickets.setObjectName("TicketList")
 
         self.btn_new = QPushButton("Nuevo")
@@ -92,6 +101,28 @@ class POSView(
         self.suggest_map = {}
         self.selected_product_id = None
 
+        # Sugerencias con debounce, consultadas fuera del hilo de la UI
+        self._suggest_timer = QTimer(self)
+        self._suggest_timer.setSingleShot(True)
+        self._suggest_timer.setInterval(SUGGEST_DEBOUNCE_MS)
+        self._suggest_timer.timeout.connect(self._start_suggest_query)
+
+        self._suggest_pool = QThreadPool(self)
+        self._suggest_pool.setMaxThreadCount(1)
+        self._suggest_seq = 0
+        self._suggest_jobs = set()
+        self.suggest_stats = {"served": 0, "dropped": 0}
+        self._common_product_id = None
+
+        # Último tiempo "escaneo -> fila en la tabla" (ms), para medir el flujo del lector
+        self.last_scan_latency_ms = None
+        self._scan_started = None
+
+        # Escrituras del ticket en el hilo escritor (core.db_writer): la UI no
+        # espera el lock de SQLite y recarga una vez que terminan las pendientes.
+        self.db_writer = WriterBridge(self)
+        self._pending_writes = 0
+
         self.in_search.textEdited.connect(self.update_suggestions)
         self.completer.activated.connect(self.on_suggestion_chosen)
         self.in_search.returnPressed.connect(self.add_item_by_search)
@@ -116,11 +147,13 @@ class POSView(
         actions_row.addWidget(self.btn_clear)
 
         # === Tabla: Producto | Cant | P.Unit | Total | ✕ ===
-        self.table = QTableWidget(0, 5)
-        self.table.setHorizontalHeaderLabels(["Producto", "Cant", "P.Unit", "Total", ""])
+        # Modelo propio: los cambios se aplican fila a fila (ver TicketLinesModel)
+        self.ticket_model = TicketLinesModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.ticket_model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table.setColumnWidth(4, 48)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.setAlternatingRowColors(True)
         
         self.table.setEditTriggers(
@@ -128,8 +161,11 @@ class POSView(
         )
 
         self.table.setItemDelegateForColumn(1, IntSpinDelegate(self))
-        self.table.itemChanged.connect(self.on_table_item_changed)
-        self.table.cellClicked.connect(self._on_table_cell_clicked)
+        # En cola: se guarda y recarga después de que el editor termine de confirmar
+        self.ticket_model.qty_edited.connect(self.on_table_qty_edited, Qt.QueuedConnection)
+        self.table.clicked.connect(
+            lambda index: self._on_table_cell_clicked(index.row(), index.column())
+        )
         
         # Permitir atajos de teclado (+/- y navegación) tanto en la tabla como en la búsqueda
         self.table.installEventFilter(self)
@@ -245,13 +281,73 @@ class POSView(
 
 
     # === Carga y tabla ===
-    def load_ticket(self, ticket_id: int):
+    def reload_current_ticket(self, sidebar: bool = True):
+        """
+        Recarga el ticket actual y (opcional) la lista de tickets abiertos
+        con una sola lectura a la BD (get_ticket_snapshot).
+        """
+        if not self.current_ticket_id:
+            return
+        snap = ts.get_ticket_snapshot(
+            self.current_ticket_id,
+            tickets_since=self._tickets_version if sidebar else None,
+        )
+        self.load_ticket(self.current_ticket_id, snapshot=snap)
+        if sidebar:
+            self._refresh_tickets_sidebar(snap["tickets"])
+
+    def _submit_write(self, fn, *args, key=None, merge=None, then=None, **kwargs):
+        """
+        Encola una escritura en el hilo escritor y devuelve su Future.
+        Al terminar, 'then(resultado)' corre en el hilo de la UI y, cuando ya no
+        quedan escrituras pendientes, se recarga el ticket una sola vez.
+        'key'/'merge' permiten combinar pulsaciones seguidas (ver DbWriter.submit).
+        """
+        self._pending_writes += 1
+
+        def done(future):
+            self._pending_writes -= 1
+            error = future.exception()
+            if error is not None:
+                QMessageBox.warning(self, "Error", str(error))
+            elif then is not None:
+                then(future.result())
+            if self._pending_writes == 0 or error is not None:
+                self._reload_after_writes()
+
+        return self.db_writer.submit(fn, *args, on_done=done, key=key, merge=merge, **kwargs)
+
+    def _reload_after_writes(self):
+        """Recarga el ticket con lo ya guardado, sin mover el foco."""
+        self._preserve_table_focus = True
+        try:
+            self.reload_current_ticket()
+        finally:
+            self._preserve_table_focus = False
+
+        # Latencia de escaneo: primera tecla del lector -> fila visible en el ticket
+        if self._scan_started is not None:
+            self.last_scan_latency_ms = (time.perf_counter() - self._scan_started) * 1000
+            self._scan_started = None
+
+    def _remove_lines(self, line_ids):
+        """Quita las líneas de la tabla al instante y encola su borrado en la BD."""
+        gone = {int(i) for i in line_ids}
+        self.ticket_model.set_lines(
+            ln for ln in self.ticket_model.lines() if ln["id"] not in gone
+        )
+        self.refresh_totals(self.ticket_model.total())
+        self._submit_write(ts.remove_items, sorted(gone))
+
+    def load_ticket(self, ticket_id: int, snapshot=None):
         """Producto | Cant (editable) | P.Unit | Total | ✕"""
         # Guardamos el ID actual del ticket
         self.current_ticket_id = int(ticket_id)
 
-        # Obtenemos el ticket desde la capa de servicio
-        t = ts.get_ticket(self.current_ticket_id)
+        # Cabecera, líneas y total en una sola lectura
+        if snapshot is None:
+            snapshot = ts.get_ticket_snapshot(self.current_ticket_id)
+        t = snapshot["ticket"]
         if not t:
             self.clear_ticket_ui()
             return
@@ -261,43 +357,39 @@ class POSView(
 
         # Recordar la fila seleccionada ANTES de recargar,
         # solo si queremos preservar contexto desde la acción que nos llamó.
-        prev_row = self.table.currentRow() if self._preserve_table_focus else -1
+        prev_row = self._current_row() if self._preserve_table_focus else -1
 
         # --- Cargar la tabla usando el mixin POSTableMixin ---
         self._updating_table = True
         try:
             # Esta función viene desde POSTableMixin (pos_table.py)
-            self.load_ticket_table(self.current_ticket_id)
+            self.load_ticket_table(snapshot["items"])
         finally:
             self._updating_table = False
 
         # Actualizamos los totales del ticket
-        self.refresh_totals()
+        self.refresh_totals(snapshot["total"])
 
         # --- Restaurar selección REAL basada en _selected_line_id ---
         restored = False
         if self._selected_line_id is not None:
-            for r in range(self.table.rowCount()):
-                prod_cell = self.table.item(r, 0)
-                if prod_cell and prod_cell.data(Qt.UserRole) == self._selected_line_id:
-                    self.table.setCurrentCell(r, 1)  # columna Cant
-                    restored = True
-                    break
+            r = self.ticket_model.row_of(self._selected_line_id)
+            if r >= 0:
+                self._select_row(r)
+                restored = True
 
         # Si no se pudo restaurar (ej: línea eliminada)
-        if not restored and self.table.rowCount() > 0:
+        if not restored and self._row_count() > 0:
             # Si venimos de una acción de tabla y había fila previa, intentamos respetarla
             if self._preserve_table_focus and prev_row >= 0:
-                row = min(prev_row, self.table.rowCount() - 1)
+                row = min(prev_row, self._row_count() - 1)
             else:
                 row = 0
 
-            self.table.setCurrentCell(row, 1)  # columna Cant
+            self._select_row(row)
 
             # también actualizamos el ID seleccionado
-            prod_cell = self.table.item(row, 0)
-            if prod_cell:
-                self._selected_line_id = prod_cell.data(Qt.UserRole)
+            self._selected_line_id = self._line_id_at(row)
 
         # Solo devolvemos el foco al buscador si NO venimos de una acción de tabla
         if not self._preserve_table_focus:
@@ -305,23 +397,14 @@ class POSView(
 
 
     # === Edición de cantidad en línea ===
-    def on_table_item_changed(self, item: QTableWidgetItem):
-        """Se dispara cuando cambia una celda; solo nos importa la columna Cant (1)."""
-        if self._updating_table or item.column() != 1:
-            return
-
-        row = item.row()
-        prod_cell = self.table.item(row, 0)
-        if not prod_cell:
-            return
-
-        line_id = prod_cell.data(Qt.UserRole)
-        if line_id is None:
+    def on_table_qty_edited(self, line_id: int, text: str):
+        """Se dispara al confirmar la edición de la columna Cant (1) en el modelo."""
+        if self._updating_table or not self.current_ticket_id:
             return
 
         # Validar nueva cantidad
         try:
-            new_qty = int(item.text())
+            new_qty = int(text)
             if new_qty <= 0:
                 raise ValueError
         except Exception:
@@ -331,55 +414,36 @@ class POSView(
             self.load_ticket(self.current_ticket_id)
             return
 
-        # ===== Actualizar en BD =====
-        ts.update_item_qty(line_id, new_qty)
-
-        # ===== Recargar ticket y sidebar =====
-        self._preserve_table_focus = True
-        try:
-            self.load_ticket(self.current_ticket_id)
-            self._refresh_tickets_sidebar()
-        finally:
-            self._preserve_table_focus = False
-
-        # ===== Volver a seleccionar la MISMA línea que se editó =====
-        for r in range(self.table.rowCount()):
-            cell = self.table.item(r, 0)
-            if cell and cell.data(Qt.UserRole) == line_id:
-                self.table.setCurrentCell(r, 1)  # columna Cant
-                break
+        # ===== Mostrar y guardar en segundo plano =====
+        # La recarga al terminar vuelve a seleccionar la MISMA línea editada
+        self._selected_line_id = line_id
+        self.ticket_model.set_line_qty(line_id, new_qty)
+        self.refresh_totals(self.ticket_model.total())
+        self._submit_write(
+            ts.update_item_qty, line_id, new_qty,
+            key=("qty", line_id), merge=lambda old, new: new,
+        )
 
 
     def _delete_current_row(self):
-        """Elimina la línea actualmente seleccionada en la tabla (atajo Supr)."""
+        """Elimina las líneas seleccionadas en la tabla (atajo Supr; admite selección múltiple)."""
         if not self.current_ticket_id:
             return
 
-        row = self.table.currentRow()
-        if row < 0:
-            return
-
-        prod_cell = self.table.item(row, 0)
-        if not prod_cell:
-            return
-
-        line_id = prod_cell.data(Qt.UserRole)
-        if line_id is None:
+        rows = self._selected_rows()
+        line_ids = [self._line_id_at(r) for r in rows]
+        line_ids = [int(i) for i in line_ids if i is not None]
+        if not line_ids:
             return
+        row = rows[0]
 
-        # Eliminar ítem en BD
-        ts.remove_item(int(line_id))
-
-        # Recargar manteniendo foco/selección coherente en la tabla
-        self._preserve_table_focus = True
-        self.load_ticket(self.current_ticket_id)
-        self._preserve_table_focus = False
-        self._refresh_tickets_sidebar()
+        # Quitar de la tabla y eliminar en BD (una sola transacción, en segundo plano)
+        self._remove_lines(line_ids)
 
         # Seleccionar una fila lógica tras el borrado
-        if self.table.rowCount() > 0:
-            new_row = min(row, self.table.rowCount() - 1)
-            self.table.setCurrentCell(new_row, 1)
+        if self._row_count() > 0:
+            new_row = min(row, self._row_count() - 1)
+            self._select_row(new_row)
             self.table.setFocus()
         else:
             # Si ya no quedan ítems en el ticket, devolvemos el foco al buscador
@@ -388,14 +452,14 @@ class POSView(
     
     def _focus_table(self):
         """Pone el foco en la tabla del ticket y selecciona una fila para navegar con ↑/↓."""
-        if self.table.rowCount() == 0:
+        if self._row_count() == 0:
             return
 
-        row = self.table.currentRow()
+        row = self._current_row()
         if row < 0:
             row = 0
 
-        self.table.setCurrentCell(row, 1)  # columna Cant
+        self._select_row(row)  # columna Cant
         self.table.setFocus()
 
 
@@ -413,22 +477,16 @@ class POSView(
         if not self.current_ticket_id:
             return
 
-        row = self.table.currentRow()
-        if row < 0:
-            return
-
-        prod_cell = self.table.item(row, 0)   # columna Producto
-        qty_item = self.table.item(row, 1)    # columna Cant
-        if not prod_cell or not qty_item:
+        row = self._current_row()
+        line = self.ticket_model.line_at(row)
+        if line is None:
             return
 
-        line_id = prod_cell.data(Qt.UserRole)
-        if line_id is None:
-            return
+        line_id = line["id"]
 
         # Leer cantidad actual
         try:
-            current_qty = int(qty_item.text())
+            current_qty = int(line["qty"])
         except Exception:
             current_qty = 1
 
@@ -437,23 +495,17 @@ class POSView(
             # No permitimos cantidades 0 o negativas
             return
 
-        # ===== Actualizar en BD =====
-        ts.update_item_qty(int(line_id), new_qty)
-
-        # ===== Recargar ticket y sidebar preservando la fila =====
-        self._preserve_table_focus = True
-        try:
-            self.load_ticket(self.current_ticket_id)
-            self._refresh_tickets_sidebar()
-        finally:
-            self._preserve_table_focus = False
-
-        # Mantener la misma fila seleccionada,
-        # PERO SIN cambiar el foco (si estaba en la búsqueda, sigue allí).
-        if self.table.rowCount() > 0:
-            new_row = min(row, self.table.rowCount() - 1)
-            self.table.setCurrentCell(new_row, 1)
-            # OJO: aquí ya NO llamamos a self.table.setFocus()
+        # ===== Mostrar al instante y guardar en segundo plano =====
+        # Pulsaciones seguidas sobre la misma línea se combinan en un solo
+        # change_item_qty con la suma de los 'delta'. La fila y el foco no
+        # cambian (si estaba en la búsqueda, sigue allí).
+        self._selected_line_id = line_id
+        self.ticket_model.set_line_qty(line_id, new_qty)
+        self.refresh_totals(self.ticket_model.total())
+        self._submit_write(
+            ts.change_item_qty, int(line_id), delta,
+            key=("qty", int(line_id)), merge=lambda old, new: (old[0], old[1] + new[1]),
+        )
 
 
     def eventFilter(self, obj, event):
@@ -462,7 +514,7 @@ class POSView(
         - En la TABLA:
             + y -  -> aumentan / disminuyen cantidad del ítem seleccionado.
             Supr   -> elimina la línea seleccionada.
-            ↑ y ↓  -> navegación normal (deja que QTableWidget la maneje).
+            ↑ y ↓  -> navegación normal (deja que QTableView la maneje).
         - En la BÚSQUEDA (in_search):
             + y -  -> aumentan / disminuyen cantidad del ítem seleccionado.
             Supr   -> elimina la línea seleccionada.
@@ -510,24 +562,24 @@ class POSView(
 
                 # Flecha ARRIBA: seleccionar ítem anterior en la tabla
                 if key == Qt.Key_Up:
-                    if self.table.rowCount() > 0:
-                        row = self.table.currentRow()
+                    if self._row_count() > 0:
+                        row = self._current_row()
                         if row < 0:
-                            row = self.table.rowCount() - 1
+                            row = self._row_count() - 1
                         else:
                             row = max(0, row - 1)
-                        self.table.setCurrentCell(row, 1)  # columna Cant
+                        self._select_row(row)  # columna Cant
                     return True  # no dejamos que el QLineEdit cambie selección/cursor
 
                 # Flecha ABAJO: seleccionar ítem siguiente en la tabla
                 if key == Qt.Key_Down:
-                    if self.table.rowCount() > 0:
-                        row = self.table.currentRow()
+                    if self._row_count() > 0:
+                        row = self._current_row()
                         if row < 0:
                             row = 0
                         else:
-                            row = min(self.table.rowCount() - 1, row + 1)
-                        self.table.setCurrentCell(row, 1)
+                            row = min(self._row_count() - 1, row + 1)
+                        self._select_row(row)
                     return True
 
         return super().eventFilter(obj, event)
@@ -540,24 +592,17 @@ class POSView(
             if not self.current_ticket_id:
                 return
 
-            prod_cell = self.table.item(row, 0)
-            if not prod_cell:
-                return
-
-            line_id = prod_cell.data(Qt.UserRole)
+            line_id = self._line_id_at(row)
             if line_id is None:
                 return
 
-            ts.remove_item(int(line_id))
-            self.load_ticket(self.current_ticket_id)
-            self._refresh_tickets_sidebar()
+            self._remove_lines([line_id])
             self.in_search.setFocus()
             return
 
         # Cualquier otra columna: solo enfocar la cantidad, SIN abrir editor
-        qty_item = self.table.item(row, 1)
-        if qty_item:
-            self.table.setCurrentCell(row, 1)
+        if self._line_id_at(row) is not None:
+            self._select_row(row)
 
 
     def show_daily_sales_dialog(self):
@@ -1,4 +1,5 @@
 # ui/pos/pos_widgets.py
+import time
 
 from PySide6.QtCore import Qt, QTimer
 from PySide6.QtWidgets import QStyledItemDelegate, QSpinBox, QLineEdit
@@ -30,7 +31,58 @@ class IntSpinDelegate(QStyledItemDelegate):
 
 
 class SearchLine(QLineEdit):
-    """QLineEdit que siempre selecciona todo el texto al recibir foco."""
+    """
+    QLineEdit que siempre selecciona todo el texto al recibir foco.
+
+    Además detecta ráfagas de lector de código de barras: el lector "teclea"
+    el código completo + Enter en pocos milisegundos, mientras que una persona
+    rara vez baja de ~50 ms entre teclas.
+    """
+    SCAN_KEY_INTERVAL_MS = 30   # separación máxima entre teclas de una ráfaga
+    SCAN_MIN_CHARS = 4          # largo mínimo para considerar que fue un escaneo
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._last_key_at = None
+        self._burst_started_at = None
+        self._burst_len = 0
+
     def focusInEvent(self, event):
         super().focusInEvent(event)
         QTimer.singleShot(0, self.selectAll)
+
+    def keyPressEvent(self, event):
+        # Se registra antes de super(): textEdited/returnPressed ya ven el estado nuevo
+        text = event.text()
+        if text and text.isprintable():
+            now = time.perf_counter()
+            if (
+                self._last_key_at is not None
+                and (now - self._last_key_at) * 1000 <= self.SCAN_KEY_INTERVAL_MS
+            ):
+                self._burst_len += 1
+            else:
+                self._burst_started_at = now
+                self._burst_len = 1
+            self._last_key_at = now
+        super().keyPressEvent(event)
+
+    def in_burst(self) -> bool:
+        """True mientras llegan teclas a ritmo de lector (la última hace < SCAN_KEY_INTERVAL_MS)."""
+        return (
+            self._burst_len >= 2
+            and (time.perf_counter() - self._last_key_at) * 1000 <= self.SCAN_KEY_INTERVAL_MS
+        )
+
+    def looks_like_scan(self) -> bool:
+        """True si el texto actual llegó completo en una ráfaga (útil al presionar Enter)."""
+        return self._burst_len >= self.SCAN_MIN_CHARS
+
+    def burst_started_at(self):
+        """perf_counter() de la primera tecla de la ráfaga actual (o None)."""
+        return self._burst_started_at
+
+    def reset_burst(self):
+        self._last_key_at = None
+        self._burst_started_at = None
+        self._burst_len = 0
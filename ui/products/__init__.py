@@ -1,7 +1,7 @@
 """Componentes reutilizables para la vista de productos."""
 
-from .dialogs import ProductDialog
+from .dialogs import ProductDialog, ImportPreviewDialog
 from .actions import ProductActionsMixin
 from .backup import ProductBackupMixin
 
-__all__ = ["ProductDialog", "ProductActionsMixin", "ProductBackupMixin"]
+__all__ = ["ProductDialog", "ImportPreviewDialog", "ProductActionsMixin", "ProductBackupMixin"]
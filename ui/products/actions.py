@@ -6,7 +6,11 @@ from .dialogs import ProductDialog
 
 
 class ProductActionsMixin:
-    """Acciones comunes para la vista de productos (CRUD)."""
+    """
+    Acciones comunes para la vista de productos (CRUD).
+    Las escrituras pasan por el hilo escritor (self.db_writer, WriterBridge)
+    para quedar en orden con las del POS; la UI no espera su resultado.
+    """
 
     def _selected_product_id(self):
         """Devuelve el id del producto seleccionado en la tabla (o None)."""
@@ -24,7 +28,7 @@ class ProductActionsMixin:
 
     def reload(self):
         q = (self.in_search.text() or "").strip()
-        rows = ps.list_products(q)
+        rows = ps.search_products(q)
 
         self.table.setRowCount(0)
         for r in rows:
@@ -63,24 +67,37 @@ class ProductActionsMixin:
         display = fmt_money(value) if isinstance(value, int) else str(value)
         return QTableWidgetItem(display)
 
+    def _submit_product_write(self, fn, *args, error_text, then=None, **kwargs):
+        """
+        Encola la escritura en el hilo escritor sin esperarla (puede haber una
+        importación delante). Al terminar recarga la tabla o avisa el error;
+        then(error) permite decidir otra cosa ante un error.
+        """
+        def done(future):
+            error = future.exception()
+            if then is not None and then(error):
+                return
+            if error is not None:
+                QMessageBox.critical(self, "Error", f"{error_text}:\n{error}")
+                return
+            self.reload()
+
+        self.db_writer.submit(fn, *args, on_done=done, **kwargs)
+
     def new_product(self):
         dlg = ProductDialog(self)
         if dlg.exec() != ProductDialog.Accepted or not dlg.result:
             return
 
         data = dlg.result
-        try:
-            ps.create_product(
-                name=data["name"],
-                sale_price=data["sale_price"],
-                purchase_price=data["purchase_price"],
-                barcode=data["barcode"],
-            )
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"No se pudo crear el producto:\n{e}")
-            return
-
-        self.reload()
+        self._submit_product_write(
+            ps.create_product,
+            name=data["name"],
+            sale_price=data["sale_price"],
+            purchase_price=data["purchase_price"],
+            barcode=data["barcode"],
+            error_text="No se pudo crear el producto",
+        )
 
     def edit_selected(self, row=None, col=None):
         pid = self._selected_product_id()
@@ -97,19 +114,15 @@ class ProductActionsMixin:
             return
 
         new_data = dlg.result
-        try:
-            ps.update_product(
-                pid,
-                name=new_data["name"],
-                sale_price=new_data["sale_price"],
-                purchase_price=new_data["purchase_price"],
-                barcode=new_data["barcode"],
-            )
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"No se pudo actualizar el producto:\n{e}")
-            return
-
-        self.reload()
+        self._submit_product_write(
+            ps.update_product,
+            pid,
+            name=new_data["name"],
+            sale_price=new_data["sale_price"],
+            purchase_price=new_data["purchase_price"],
+            barcode=new_data["barcode"],
+            error_text="No se pudo actualizar el producto",
+        )
 
     def delete_selected(self):
         pid = self._selected_product_id()
@@ -126,36 +139,35 @@ class ProductActionsMixin:
         if confirm != QMessageBox.Yes:
             return
 
-        try:
-            ps.delete_product(pid)
-            self.reload()
-            return
-        except ValueError as ve:
-            resp = QMessageBox.question(
-                self,
-                "Producto con ventas",
-                (
-                    f"{ve}\n\n"
-                    "Este producto tiene ventas o tickets relacionados.\n"
-                    "Si continúas, se eliminarán las líneas de detalle "
-                    "asociadas a este producto en ventas y tickets.\n\n"
-                    "¿Deseas eliminarlo de todos modos?"
-                ),
-                QMessageBox.Yes | QMessageBox.No,
-            )
-            if resp != QMessageBox.Yes:
-                return
-            try:
-                ps.force_delete_product(pid)
-                self.reload()
-                return
-            except Exception as e:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"No se pudo eliminar el producto incluso forzando:\n{e}",
-                )
-                return
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"No se pudo eliminar el producto:\n{e}")
+        def used(error):
+            # ValueError: tiene ventas o está en tickets -> ofrecer forzar
+            if not isinstance(error, ValueError):
+                return False
+            self._confirm_force_delete(pid, error)
+            return True
+
+        self._submit_product_write(
+            ps.delete_product, pid,
+            error_text="No se pudo eliminar el producto",
+            then=used,
+        )
+
+    def _confirm_force_delete(self, pid, reason):
+        resp = QMessageBox.question(
+            self,
+            "Producto con ventas",
+            (
+                f"{reason}\n\n"
+                "Este producto tiene ventas o tickets relacionados.\n"
+                "Si continúas, se eliminarán las líneas de detalle "
+                "asociadas a este producto en ventas y tickets.\n\n"
+                "¿Deseas eliminarlo de todos modos?"
+            ),
+            QMessageBox.Yes | QMessageBox.No,
+        )
+        if resp != QMessageBox.Yes:
             return
+        self._submit_product_write(
+            ps.force_delete_product, pid,
+            error_text="No se pudo eliminar el producto incluso forzando",
+        )
@@ -1,35 +1,88 @@
-from PySide6.QtWidgets import QFileDialog, QMessageBox
+import threading
+import time
 
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Qt, Signal
+from PySide6.QtWidgets import QDialog, QFileDialog, QMessageBox, QProgressDialog
+
+from core import export_service
 from core import product_backup_service as pbs
+from .dialogs import ImportPreviewDialog
+
+
+class _ImportSignals(QObject):
+    # (filas, hecho, total) desde el hilo del pool o el escritor -> hilo de la UI (en cola)
+    progress = Signal(int, int, int)
+    # (filas leídas, vista previa), None si se canceló, o la excepción
+    read = Signal(object)
+
+
+class _ReadJob(QRunnable):
+    """
+    Lee y valida el CSV (pbs.read_products_csv) y calcula la vista previa
+    con esas mismas filas, en un hilo del pool; no toca widgets.
+    """
+
+    def __init__(self, path, signals, cancel):
+        super().__init__()
+        self.setAutoDelete(False)   # la referencia la mantiene el mixin (_import_job)
+        self.path = path
+        self.signals = signals
+        self.cancel = cancel
+
+    def run(self):
+        try:
+            rows = pbs.read_products_csv(
+                self.path, progress=self.signals.progress.emit, cancel=self.cancel
+            )
+            result = None if rows is None else (rows, pbs.preview_parsed_products(rows))
+        except Exception as e:
+            result = e
+        self.signals.read.emit(result)
 
 
 class ProductBackupMixin:
-    """Operaciones de exportación/importación de productos."""
+    """
+    Operaciones de exportación/importación de productos.
+    Asume self.db_writer (WriterBridge), self.btn_import, self.btn_export,
+    self.exporter (ExportRunner), self._import_job y self._import_dialog /
+    self._import_signals (None si no hay importación).
+    """
 
     def export_products_csv(self):
-        """Permite al usuario guardar la lista de productos en un CSV."""
-        path, _ = QFileDialog.getSaveFileName(
+        """Permite al usuario guardar la lista de productos en un CSV (o Excel)."""
+        path, selected = QFileDialog.getSaveFileName(
             self,
             "Guardar lista de productos",
             "productos.csv",
-            "CSV (*.csv)",
+            "CSV (*.csv);;Excel (*.xlsx)",
         )
         if not path:
             return
+        if selected.startswith("Excel") and not path.lower().endswith(".xlsx"):
+            path += ".xlsx"
 
-        try:
-            pbs.export_products_csv(path)
-            QMessageBox.information(
-                self,
-                "Exportar productos",
-                "La lista de productos se guardó correctamente.",
-            )
-        except Exception as e:
+        # Se escribe en un hilo del pool; la ventana sigue respondiendo
+        if not self.exporter.start(
+            export_service.export_products, path, on_done=self._on_products_exported
+        ):
+            QMessageBox.information(self, "Exportar productos", "Ya hay una exportación en curso.")
+            return
+        self.btn_export.setEnabled(False)
+
+    def _on_products_exported(self, result):
+        self.btn_export.setEnabled(True)
+        if isinstance(result, Exception):
             QMessageBox.critical(
                 self,
                 "Exportar productos",
-                f"No se pudo guardar la lista de productos:\n{e}",
+                f"No se pudo guardar la lista de productos:\n{result}",
             )
+            return
+        QMessageBox.information(
+            self,
+            "Exportar productos",
+            "La lista de productos se guardó correctamente.",
+        )
 
     def import_products_csv(self):
         """Permite al usuario cargar/actualizar productos desde un CSV."""
@@ -42,33 +95,123 @@ class ProductBackupMixin:
         if not path:
             return
 
-        resp = QMessageBox.question(
+        # El archivo se lee y se compara con la BD (vista previa) en un hilo
+        # del pool; después de confirmar se escriben esas mismas filas en el
+        # hilo escritor. La UI sigue respondiendo y muestra el avance de cada
+        # fase; Cancelar deshace todo (la escritura es una sola transacción).
+        self.btn_import.setEnabled(False)
+        self._import_cancel = threading.Event()
+        self._import_signals = _ImportSignals(self)
+        self._import_signals.progress.connect(self._on_import_progress)
+        self._import_signals.read.connect(self._on_import_read)
+        self._open_import_dialog("Leyendo lista de productos…")
+
+        # La referencia se reemplaza recién en la próxima importación
+        self._import_job = _ReadJob(path, self._import_signals, self._import_cancel)
+        QThreadPool.globalInstance().start(self._import_job)
+
+    def _open_import_dialog(self, label):
+        self._import_label = label
+        self._import_started = time.perf_counter()
+        dlg = QProgressDialog(label, "Cancelar", 0, 1000, self)
+        dlg.setWindowTitle("Cargar productos")
+        dlg.setWindowModality(Qt.WindowModal)
+        dlg.setMinimumDuration(300)
+        dlg.setAutoClose(False)
+        dlg.setAutoReset(False)
+        dlg.canceled.connect(self._import_cancel.set)
+        self._import_dialog = dlg
+
+    def _close_import_dialog(self):
+        if self._import_dialog is not None:
+            self._import_dialog.close()
+            self._import_dialog.deleteLater()
+            self._import_dialog = None
+
+    def _on_import_read(self, result):
+        """
+        Archivo leído (llega en el hilo de la UI): se muestra la vista previa
+        y, si se confirma, se encola la escritura de esas mismas filas.
+        """
+        self._close_import_dialog()
+        if result is None or isinstance(result, Exception):
+            self._finish_import()
+            if result is None:
+                self._show_import_cancelled()
+            else:
+                QMessageBox.critical(
+                    self,
+                    "Cargar productos",
+                    f"No se pudo leer la lista de productos:\n{result}",
+                )
+            return
+
+        rows, preview = result
+        if ImportPreviewDialog(preview, self).exec() != QDialog.Accepted:
+            self._finish_import()
+            return
+
+        self._open_import_dialog("Importando productos…")
+        self.db_writer.submit(
+            pbs.import_parsed_products, rows,
+            progress=self._import_signals.progress.emit,
+            cancel=self._import_cancel,
+            on_done=self._on_import_done,
+        )
+
+    def _on_import_progress(self, rows, done, total):
+        """Avance de cada fase: filas por segundo y tiempo restante estimado."""
+        dlg = self._import_dialog
+        if dlg is None:
+            return
+        if dlg.wasCanceled():
+            dlg.setLabelText("Cancelando importación…")
+            return
+        elapsed = time.perf_counter() - self._import_started
+        rate = rows / elapsed if elapsed > 0 else 0
+        eta = elapsed * (total - done) / done if done else 0
+        dlg.setValue(int(1000 * done / total) if total else 1000)
+        dlg.setLabelText(
+            f"{self._import_label}\n"
+            f"{rows} filas · {rate:.0f} filas/s · quedan ~{eta:.0f} s"
+        )
+
+    def _finish_import(self):
+        self.btn_import.setEnabled(True)
+        self._close_import_dialog()
+        self._import_signals.deleteLater()
+        self._import_signals = None
+
+    def _show_import_cancelled(self):
+        QMessageBox.information(
             self,
             "Cargar productos",
-            (
-                "Se van a importar productos desde el archivo seleccionado.\n\n"
-                "- Si un producto ya existe (mismo código de barras o nombre), se actualizará.\n"
-                "- Si no existe, se creará uno nuevo.\n\n"
-                "Esta acción no elimina productos existentes.\n\n"
-                "¿Deseas continuar?"
-            ),
-            QMessageBox.Yes | QMessageBox.No,
+            "Importación cancelada. No se modificó ningún producto.",
         )
-        if resp != QMessageBox.Yes:
-            return
+
+    def _on_import_done(self, future):
+        """Resultado de import_parsed_products (llega en el hilo de la UI)."""
+        self._finish_import()
 
         try:
-            result = pbs.import_products_csv(path)
-            msg = (
-                f"Productos creados: {result.get('created', 0)}\n"
-                f"Productos actualizados: {result.get('updated', 0)}\n"
-                f"Filas omitidas por error: {result.get('skipped', 0)}"
-            )
-            QMessageBox.information(self, "Cargar productos", msg)
-            self.reload()
+            result = future.result()
         except Exception as e:
             QMessageBox.critical(
                 self,
                 "Cargar productos",
                 f"No se pudieron importar los productos:\n{e}",
             )
+            return
+
+        if result.get("cancelled"):
+            self._show_import_cancelled()
+            return
+
+        msg = (
+            f"Productos creados: {result.get('created', 0)}\n"
+            f"Productos actualizados: {result.get('updated', 0)}\n"
+            f"Filas omitidas por error: {result.get('skipped', 0)}"
+        )
+        QMessageBox.information(self, "Cargar productos", msg)
+        # Tabla y catálogo se refrescan una sola vez, al terminar
+        self.reload()
@@ -1,17 +1,24 @@
-from PySide6.QtCore import Qt
+from bisect import bisect_right
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
 from PySide6.QtGui import QIntValidator
 from PySide6.QtWidgets import (
+    QAbstractItemView,
     QDialog,
     QFormLayout,
     QGroupBox,
     QHBoxLayout,
+    QHeaderView,
     QLabel,
     QLineEdit,
     QMessageBox,
     QPushButton,
+    QTableView,
     QVBoxLayout
 )
 
+from core.utils_format import fmt_money
+
 
 class ProductDialog(QDialog):
     """
@@ -151,3 +158,159 @@ class ProductDialog(QDialog):
             "barcode": barcode,
         }
         self.accept()
+
+
+def _price_change(old, new) -> str:
+    if old == new:
+        return fmt_money(new)
+    return f"{fmt_money(old)} → {fmt_money(new)}"
+
+
+class ImportPreviewModel(QAbstractTableModel):
+    """
+    Filas de la vista previa de importación (preview_parsed_products).
+
+    Las secciones (avisos, cambios, nuevos) se guardan tal cual vienen del
+    servicio y cada celda se arma recién cuando la vista la pide: con miles
+    de filas solo se formatea lo visible.
+    """
+
+    HEADERS = ["Tipo", "Línea", "Producto", "Código", "Venta", "Compra", "Detalle"]
+
+    def __init__(self, preview, parent=None):
+        super().__init__(parent)
+        self._sections = [
+            ("Código repetido", preview["barcode_collisions"]),
+            ("Nombre repetido", preview["duplicate_names"]),
+            ("Omitida", preview["skipped"]),
+            ("Cambio", preview["changed"]),
+            ("Nuevo", preview["new"]),
+        ]
+        self._sections = [(kind, items) for kind, items in self._sections if items]
+        # Fila donde empieza cada sección, para ubicar una fila con bisect
+        self._starts = []
+        total = 0
+        for _, items in self._sections:
+            self._starts.append(total)
+            total += len(items)
+        self._total = total
+
+    # --- API de Qt ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._total
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        i = bisect_right(self._starts, index.row()) - 1
+        kind, items = self._sections[i]
+        return self._cells(kind, items[index.row() - self._starts[i]])[index.column()]
+
+    @staticmethod
+    def _cells(kind, item):
+        if kind == "Código repetido":
+            return [kind, str(item["line"]), item["name"], item["barcode"], "", "",
+                    f"El código ya es de «{item['other']}»: se renombraría"]
+        if kind == "Nombre repetido":
+            lines = ", ".join(str(n) for n in item["lines"])
+            return [kind, str(item["lines"][0]), item["name"], "", "", "",
+                    f"Aparece en las líneas {lines}: gana la última"]
+        if kind == "Omitida":
+            return [kind, str(item), "", "", "", "", "Fila sin nombre o con precios no numéricos"]
+        if kind == "Cambio":
+            detail = []
+            if item["old_name"] != item["name"]:
+                detail.append(f"Antes: «{item['old_name']}»")
+            if item["old_barcode"] != item["barcode"]:
+                detail.append(f"Código: {item['old_barcode'] or '—'} → {item['barcode'] or '—'}")
+            return [kind, str(item["line"]), item["name"], item["barcode"] or "",
+                    _price_change(item["old_sale_price"], item["sale_price"]),
+                    _price_change(item["old_purchase_price"], item["purchase_price"]),
+                    "; ".join(detail)]
+        return [kind, str(item["line"]), item["name"], item["barcode"] or "",
+                fmt_money(item["sale_price"]), fmt_money(item["purchase_price"]), ""]
+
+
+class ImportPreviewDialog(QDialog):
+    """
+    Muestra qué haría la importación de un CSV (productos nuevos, cambios de
+    precio, códigos y nombres repetidos, filas omitidas) antes de aplicarla.
+    Aceptar (Importar) confirma la importación.
+    """
+
+    def __init__(self, preview, parent=None):
+        super().__init__(parent)
+        self.setModal(True)
+        self.setWindowTitle("Vista previa de importación")
+        self.resize(900, 560)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(16, 16, 16, 16)
+        layout.setSpacing(10)
+
+        title_label = QLabel("Vista previa de importación")
+        title_label.setObjectName("DialogTitle")
+        layout.addWidget(title_label)
+
+        warnings = len(preview["barcode_collisions"]) + len(preview["duplicate_names"])
+        summary = QLabel(
+            f"Nuevos: {len(preview['new'])}  ·  "
+            f"Con cambios: {len(preview['changed'])}  ·  "
+            f"Sin cambios: {preview['unchanged']}  ·  "
+            f"Omitidas: {len(preview['skipped'])}  ·  "
+            f"Avisos: {warnings}\n"
+            "Esta acción no elimina productos existentes."
+        )
+        summary.setObjectName("HintLabel")
+        summary.setWordWrap(True)
+        layout.addWidget(summary)
+
+        # QTableView + modelo: la tabla solo pide las filas visibles
+        self.model = ImportPreviewModel(preview, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setAlternatingRowColors(True)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(28)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setStretchLastSection(True)
+        header.resizeSection(0, 130)
+        header.resizeSection(1, 60)
+        header.resizeSection(2, 220)
+        header.resizeSection(3, 120)
+        header.resizeSection(4, 140)
+        header.resizeSection(5, 140)
+        layout.addWidget(self.table)
+
+        # === Botones Importar / Cancelar ===
+        btns = QHBoxLayout()
+        btns.addStretch()
+
+        self.btn_import = QPushButton("Importar")
+        self.btn_import.setProperty("buttonType", "primary")
+        self.btn_import.setEnabled(bool(preview["new"] or preview["changed"]))
+
+        self.btn_cancel = QPushButton("Cancelar")
+        self.btn_cancel.setProperty("buttonType", "ghost")
+
+        self.btn_import.setMinimumHeight(36)
+        self.btn_cancel.setMinimumHeight(36)
+
+        btns.addWidget(self.btn_import)
+        btns.addWidget(self.btn_cancel)
+        layout.addLayout(btns)
+
+        self.btn_import.clicked.connect(self.accept)
+        self.btn_cancel.clicked.connect(self.reject)
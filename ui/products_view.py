@@ -4,7 +4,9 @@ from PySide6.QtWidgets import (
     QTableWidget, QHeaderView, QAbstractItemView
 )
 
+from ui.export_job import ExportRunner
 from ui.products import ProductActionsMixin, ProductBackupMixin
+from ui.writer_bridge import WriterBridge
 
 
 class ProductsView(QWidget, ProductActionsMixin, ProductBackupMixin):
@@ -18,6 +20,15 @@ class ProductsView(QWidget, ProductActionsMixin, ProductBackupMixin):
     def __init__(self):
         super().__init__()
 
+        # Escrituras (CRUD e importación) por el hilo escritor de la BD
+        self.db_writer = WriterBridge(self)
+        # Importación en curso (ver ProductBackupMixin)
+        self._import_dialog = None
+        self._import_signals = None
+        self._import_job = None
+        # Exportaciones fuera del hilo de la UI
+        self.exporter = ExportRunner(self)
+
         # Layout principal
         layout = QVBoxLayout(self)
         layout.setContentsMargins(10, 10, 10, 10)
@@ -1,12 +1,80 @@
-from PySide6.QtCore import QDate, Qt
+import threading
+
+from PySide6.QtCore import QDate, QObject, QRunnable, Qt, Signal
 from PySide6.QtWidgets import QFileDialog, QMessageBox, QTableWidgetItem
 
-from core.report_service import summary, top_products
+from core import export_service
+from core.db_manager import get_read_conn
+from core.report_service import load_report, summary
 from core.utils_format import fmt_money
 from .helpers import fmt_pct, week_bounds, month_bounds, year_bounds, date_range_to_strings
 
 
+TOP_LIMIT = 10
+
+
+# Exportaciones de detalle del rango (menú "Exportar detalle"):
+# (texto del menú, reporte de export_service.REPORT_EXPORTS o None = líneas de venta, archivo)
+DETAIL_EXPORTS = [
+    ("Líneas de venta", None, "ventas_detalle"),
+    ("Totales por día", "daily", "ventas_por_dia"),
+    ("Totales por mes", "monthly", "ventas_por_mes"),
+    ("Ventas por producto y día", "products", "ventas_por_producto"),
+    ("Ventas por medio de pago y día", "pay_methods", "ventas_por_medio_pago"),
+]
+
+
+class _ReportSignals(QObject):
+    # (seq, resultado o la excepción) -> hilo de la UI (en cola)
+    done = Signal(int, object)
+
+
+class _ReportJob(QRunnable):
+    """
+    El reporte del rango (load_report: resumen y top de una misma foto de la
+    BD) en el hilo del pool; no toca widgets.
+    cancel() la descarta si aún no empezó y, si ya corre, interrumpe la
+    consulta SQL en curso (get_read_conn(cancel=...)).
+    """
+
+    def __init__(self, seq: int, date_from: str, date_to: str):
+        super().__init__()
+        self.setAutoDelete(False)   # la referencia la mantiene el mixin (_report_jobs)
+        self.seq = seq
+        self.date_from = date_from
+        self.date_to = date_to
+        self.cancelled = threading.Event()
+        self.signals = _ReportSignals()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        if self.cancelled.is_set():
+            return
+        try:
+            with get_read_conn(cancel=self.cancelled):
+                result = load_report(self.date_from, self.date_to, top_limit=TOP_LIMIT)
+        except Exception as e:
+            result = e
+        self.signals.done.emit(self.seq, result)
+
+
 class ReportActionsMixin:
+    """
+    Filtros y carga de la vista de reportes.
+
+    Asume que la clase hija (ReportsView) tiene:
+      - self.in_from, self.in_to (QDateEdit)
+      - self.lbl_total, self.lbl_profit, self.lbl_count, self.lbl_avg,
+        self.lbl_avg_margin (QLabel) y self.tbl_top (QTableWidget)
+      - self.box_summary (QGroupBox) y self.lbl_loading (QLabel)
+      - self._report_pool (QThreadPool de 1 hilo)
+      - self._report_seq, self._report_jobs (set)
+      - self.report_stats ({"served": int, "dropped": int})
+      - self.btn_export_detail y self.exporter (ExportRunner)
+    """
+
     def _set_today(self):
         today = QDate.currentDate()
         self.in_from.setDate(today)
@@ -31,10 +99,57 @@ class ReportActionsMixin:
         self.in_to.setDate(to)
         self.load_data()
 
+    # === Carga en segundo plano ===
+    # load_data() cancela el pedido anterior, sube _report_seq y lanza una
+    # _ReportJob en _report_pool. Resumen y top salen juntos de una misma foto
+    # de la BD (cuadran aunque entre una venta) y se publican si su seq sigue
+    # siendo el último. report_stats cuenta reportes servidos y descartados
+    # (cancelados antes de correr o llegados tarde).
+    # _report_jobs guarda cada trabajo lanzado hasta saber que terminó del
+    # todo (igual que las sugerencias del POS).
     def load_data(self):
-        d1, d2 = self.in_from.date(), self.in_to.date()
-        s = summary(d1, d2)
+        d1 = self.in_from.date().toString("yyyy-MM-dd")
+        d2 = self.in_to.date().toString("yyyy-MM-dd")
+
+        self._cancel_report_jobs()
+        self._report_seq += 1
+        self._set_report_loading(True)
+
+        job = _ReportJob(self._report_seq, d1, d2)
+        job.signals.done.connect(self._on_report_ready)
+        self._report_jobs.add(job)
+        self._report_pool.start(job)
+
+    def _cancel_report_jobs(self):
+        for job in list(self._report_jobs):
+            job.cancel()
+            if self._report_pool.tryTake(job):
+                self.report_stats["dropped"] += 1
+                self._report_jobs.discard(job)
+
+    def _on_report_ready(self, seq: int, result):
+        # Pool de un hilo: los trabajos anteriores a este ya terminaron
+        self._report_jobs = {job for job in self._report_jobs if job.seq >= seq}
+
+        if seq != self._report_seq:
+            self.report_stats["dropped"] += 1
+            return  # llegó tarde: ya se pidió otro rango
+
+        self._set_report_loading(False)
+        if isinstance(result, Exception):
+            QMessageBox.critical(self, "Reportes", f"No se pudo cargar el reporte:\n{result}")
+            return
+        self.report_stats["served"] += 1
+        self._show_summary(result["summary"])
+        self._show_top(result["top"])
 
+    def _set_report_loading(self, loading: bool):
+        """Atenúa el resumen y la tabla mientras se calculan (los filtros siguen activos)."""
+        self.lbl_loading.setVisible(loading)
+        self.box_summary.setEnabled(not loading)
+        self.tbl_top.setEnabled(not loading)
+
+    def _show_summary(self, s):
         total = s.get("total", 0)
         tickets = s.get("tickets", 0)
         avg = s.get("avg_ticket", 0)
@@ -47,7 +162,7 @@ class ReportActionsMixin:
         self.lbl_avg.setText(fmt_money(avg))
         self.lbl_avg_margin.setText(fmt_pct(avg_mgn))
 
-        tops = top_products(d1, d2, limit=10)
+    def _show_top(self, tops):
         self.tbl_top.setRowCount(0)
         for tp in tops:
             i = self.tbl_top.rowCount()
@@ -102,3 +217,37 @@ class ReportActionsMixin:
             QMessageBox.information(self, "Exportar", "CSV de resumen exportado correctamente.")
         except Exception as e:
             QMessageBox.critical(self, "Exportar", f"No se pudo exportar:\n{e}")
+
+    def export_detail(self, report):
+        """Exporta el detalle del rango (ver DETAIL_EXPORTS) a CSV o Excel, en streaming."""
+        label, file_name = next((lbl, fn) for lbl, r, fn in DETAIL_EXPORTS if r == report)
+        path, selected = QFileDialog.getSaveFileName(
+            self,
+            f"Exportar {label.lower()}",
+            f"{file_name}.csv",
+            "CSV (*.csv);;Excel (*.xlsx)",
+        )
+        if not path:
+            return
+        if selected.startswith("Excel") and not path.lower().endswith(".xlsx"):
+            path += ".xlsx"
+
+        d1 = self.in_from.date().toString("yyyy-MM-dd")
+        d2 = self.in_to.date().toString("yyyy-MM-dd")
+        if report is None:
+            args = (export_service.export_sale_lines, path, d1, d2)
+        else:
+            args = (export_service.export_report, path, report, d1, d2)
+
+        # Se escribe en un hilo del pool (un año de líneas tarda cientos de ms)
+        if not self.exporter.start(*args, on_done=lambda rows: self._on_detail_exported(label, rows)):
+            QMessageBox.information(self, "Exportar", "Ya hay una exportación en curso.")
+            return
+        self.btn_export_detail.setEnabled(False)
+
+    def _on_detail_exported(self, label, rows):
+        self.btn_export_detail.setEnabled(True)
+        if isinstance(rows, Exception):
+            QMessageBox.critical(self, "Exportar", f"No se pudo exportar:\n{rows}")
+            return
+        QMessageBox.information(self, "Exportar", f"{label}: {rows} filas exportadas.")
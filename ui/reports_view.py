@@ -1,13 +1,14 @@
 # ui/reports_view.py
-from PySide6.QtCore import Qt, QDate
+from PySide6.QtCore import Qt, QDate, QThreadPool
 from PySide6.QtGui import QColor
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QDateEdit,
     QTableWidget, QHeaderView, QGroupBox, QGridLayout,
-    QAbstractItemView, QToolButton, QCalendarWidget
+    QAbstractItemView, QToolButton, QCalendarWidget, QMenu
 )
 
-from ui.reports.actions import ReportActionsMixin
+from ui.export_job import ExportRunner
+from ui.reports.actions import ReportActionsMixin, DETAIL_EXPORTS
 
 
 class MonthOnlyCalendar(QCalendarWidget):
@@ -195,6 +196,14 @@ class ReportsView(QWidget, ReportActionsMixin):
         self.btn_run.clicked.connect(self.load_data)
         self.btn_export.clicked.connect(self.export_csv)
 
+        # Detalle del rango (líneas de venta y rollups), CSV o Excel
+        self.btn_export_detail = QPushButton("Exportar detalle")
+        self.btn_export_detail.setProperty("buttonType", "ghost")
+        export_menu = QMenu(self.btn_export_detail)
+        for label, report, _ in DETAIL_EXPORTS:
+            export_menu.addAction(label, lambda r=report: self.export_detail(r))
+        self.btn_export_detail.setMenu(export_menu)
+
         # Fila superior con filtros
         top = QHBoxLayout()
         top.addWidget(QLabel("Desde:"))
@@ -203,6 +212,12 @@ class ReportsView(QWidget, ReportActionsMixin):
         top.addWidget(QLabel("Hasta:"))
         top.addWidget(self.in_to)
         top.addWidget(self.btn_run)
+
+        # Aviso mientras el reporte se calcula en segundo plano
+        self.lbl_loading = QLabel("Cargando…")
+        self.lbl_loading.setObjectName("HintLabel")
+        self.lbl_loading.setVisible(False)
+        top.addWidget(self.lbl_loading)
         top.addStretch()
         top.addWidget(self.btn_today)
         top.addWidget(self.btn_week)
@@ -210,9 +225,11 @@ class ReportsView(QWidget, ReportActionsMixin):
         top.addWidget(self.btn_year)
         top.addSpacing(20)
         top.addWidget(self.btn_export)
+        top.addWidget(self.btn_export_detail)
 
         # Resumen
         box = QGroupBox("Resumen")
+        self.box_summary = box
         grid = QGridLayout()
 
         self.lbl_total = QLabel("$0")
@@ -253,6 +270,16 @@ class ReportsView(QWidget, ReportActionsMixin):
         layout.addWidget(QLabel("Top productos"))
         layout.addWidget(self.tbl_top)
 
+        # Los reportes se calculan en un hilo aparte, con una sola foto de la
+        # BD por reporte (ver ReportActionsMixin.load_data)
+        self._report_pool = QThreadPool(self)
+        self._report_pool.setMaxThreadCount(1)
+        self._report_seq = 0
+        self._report_jobs = set()
+        self.report_stats = {"served": 0, "dropped": 0}
+        # Exportaciones de detalle, también fuera del hilo de la UI
+        self.exporter = ExportRunner(self)
+
         self._tune_sizes()
         self._set_today()
 
@@ -263,7 +290,7 @@ class ReportsView(QWidget, ReportActionsMixin):
 
         for btn in [
             self.btn_today, self.btn_week, self.btn_month,
-            self.btn_year, self.btn_run, self.btn_export
+            self.btn_year, self.btn_run, self.btn_export, self.btn_export_detail
         ]:
             btn.setMinimumHeight(34)
 
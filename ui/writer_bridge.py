@@ -0,0 +1,41 @@
+# ui/writer_bridge.py
+from PySide6.QtCore import QObject, Signal, Slot
+
+from core.db_writer import get_writer
+
+
+class WriterBridge(QObject):
+    """
+    Puente entre el escritor de la BD (core.db_writer) y la interfaz.
+
+    submit() encola la escritura y, cuando termina, llama a 'on_done(future)'
+    en el hilo de la UI: la señal se emite desde el hilo escritor y, como este
+    objeto vive en el hilo de la UI, Qt la entrega en cola.
+    """
+
+    _finished = Signal(object, object)   # (Future, callback)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._finished.connect(self._deliver)
+
+    def submit(self, fn, *args, on_done=None, key=None, merge=None, **kwargs):
+        future = get_writer().submit(fn, *args, key=key, merge=merge, **kwargs)
+        if on_done is not None:
+            future.add_done_callback(lambda f: self._finished.emit(f, on_done))
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Escritura que se espera terminada (queda detrás de las encoladas).
+        Bloquea mientras tanto: desde la UI, mejor submit(..., on_done=...).
+        """
+        return get_writer().call(fn, *args, **kwargs)
+
+    def flush(self, timeout=None):
+        """Espera a que terminen las escrituras encoladas."""
+        return get_writer().flush(timeout)
+
+    @Slot(object, object)
+    def _deliver(self, future, callback):
+        callback(future)